@@ -1,7 +1,13 @@
 import os
+import base64
+import bisect
+import codecs
+import multiprocessing
 import time
 import csv
 import math
+import sys
+import random
 import re
 import threading
 from pathlib import Path
@@ -26,19 +32,29 @@ from flask_sqlalchemy import SQLAlchemy
 import pymysql
 from dotenv import load_dotenv
 from functools import wraps
-from sqlalchemy import text, or_, func
+from sqlalchemy import DDL, and_, bindparam, event, false, literal_column, select, text, or_, func, tuple_
+from sqlalchemy.dialects.mysql import match as mysql_match
 from sqlalchemy.dialects.mysql import insert as mysql_insert
-from sqlalchemy.orm import joinedload
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
 from werkzeug.utils import secure_filename
 from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 import unicodedata
 import html
 import hashlib
+import heapq
+import zlib
+from array import array
 from datetime import date, datetime, timedelta
 from uuid import uuid4
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
+from itertools import islice
+from types import MappingProxyType
+from operator import itemgetter
 from enum import Enum
-from typing import Optional, Sequence
+from typing import Callable, Iterable, Iterator, Mapping, Optional, Sequence
 from flask import make_response
 import io
 import tempfile
@@ -83,6 +99,13 @@ PASSWORD_MIN_LENGTH = int(os.getenv('PASSWORD_MIN_LENGTH', '10') or '10')
 MAX_FAILED_LOGIN_ATTEMPTS = int(os.getenv('MAX_FAILED_LOGIN_ATTEMPTS', '5') or '5')
 ACCOUNT_LOCK_MINUTES = int(os.getenv('ACCOUNT_LOCK_MINUTES', '15') or '15')
 SESSION_LIFETIME_MINUTES = int(os.getenv('SESSION_LIFETIME_MINUTES', '120') or '120')
+INSUMOS_SEARCH_TOTAL_TTL = int(os.getenv('INSUMOS_SEARCH_TOTAL_TTL', '300') or '300')
+INSUMOS_SEARCH_CACHE_TTL = int(os.getenv('INSUMOS_SEARCH_CACHE_TTL', '120') or '120')
+INSUMOS_SEARCH_CACHE_SIZE = int(os.getenv('INSUMOS_SEARCH_CACHE_SIZE', '512') or '512')
+INSUMOS_SEARCH_CACHE_URL = (os.getenv('INSUMOS_SEARCH_CACHE_URL') or '').strip()
+INSUMOS_SIMILAR_TOPK = int(os.getenv('INSUMOS_SIMILAR_TOPK', '10') or '10')
+INSUMOS_LSH_PATH = (os.getenv('INSUMOS_LSH_PATH') or '').strip() or os.path.join(app.instance_path, 'insumos_lsh.bin')
+INSUMOS_LSH_DEBOUNCE = float(os.getenv('INSUMOS_LSH_DEBOUNCE', '60') or '60')
 
 app.permanent_session_lifetime = timedelta(minutes=SESSION_LIFETIME_MINUTES)
 
@@ -455,6 +478,9 @@ class Procedimento(db.Model):
     uf = db.Column(db.String(2), nullable=True)
     # Chave estrangeira para ligar à tabela de preços
     id_tabela = db.Column(db.Integer, db.ForeignKey('tabelas.id'), nullable=False)
+    # busca (ver _SEARCH_NORM_COLUMNS)
+    codigo_norm = db.Column(db.String(100), index=True, nullable=True)
+    descricao_norm = db.Column(db.String(500), index=True, nullable=True)
 
 
 class CBHPMItem(db.Model):
@@ -491,6 +517,9 @@ class CBHPMItem(db.Model):
     subtotal = db.Column(db.Numeric(12, 2), nullable=True)
     # vínculo
     id_tabela = db.Column(db.Integer, db.ForeignKey('tabelas.id'), nullable=False)
+    # busca (ver _SEARCH_NORM_COLUMNS)
+    codigo_norm = db.Column(db.String(100), index=True, nullable=True)
+    procedimento_norm = db.Column(db.String(500), index=True, nullable=True)
 
 
 class TussRolCorrelacao(db.Model):
@@ -599,6 +628,27 @@ class Publicacao(db.Model):
     )
 
 
+# Linha de ``catalogo_versao`` incrementada a cada upsert em ``insumos_index`` (fallback da
+# busca e fonte do detalhe); não tem catálogo materializado associado.
+CATALOGO_VERSAO_INDEX = 'INSUMOS_INDEX'
+# Incrementada a cada escrita em tabelas/procedimentos/itens CBHPM (índice de sugestões).
+CATALOGO_VERSAO_PROCEDIMENTOS = 'PROCEDIMENTOS'
+
+
+class CatalogoVersao(db.Model):
+    """Versão publicada x versão materializada do catálogo vigente de cada fornecedor."""
+
+    __tablename__ = 'catalogo_versao'
+
+    fornecedor = db.Column(db.String(50), primary_key=True)
+    versao_publicada = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    versao_materializada = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    etag_publicado = db.Column(db.String(255), nullable=True)
+    etag_materializado = db.Column(db.String(255), nullable=True)
+    publicado_em = db.Column(db.TIMESTAMP, nullable=True)
+    materializado_em = db.Column(db.TIMESTAMP, nullable=True)
+
+
 class LinhaHash(db.Model):
     __tablename__ = 'linha_hash'
 
@@ -796,6 +846,7 @@ class SimproFixedStage(db.Model):
 
     __table_args__ = (
         db.Index('idx_simpro_fixed_arquivo', 'arquivo'),
+        db.Index('idx_simpro_fixed_arquivo_linha', 'arquivo', 'linha_num'),
     )
 
 
@@ -961,34 +1012,49 @@ def _resolve_simpro_field_map(map_config: dict | None) -> dict[str, str]:
     return field_map
 
 
-def _evaluate_postprocess_expr(expr: str, record: dict[str, object | None]) -> object | None:
+def _compile_postprocess_expr(expr: str) -> Callable[[dict[str, object | None]], object | None]:
     expr = (expr or '').strip()
     if not expr or expr.lower() == 'null':
-        return None
+        return lambda record: None
     match = _TERNARY_CONCAT_RE.match(expr)
-    if match:
-        left_key, right_key, true_left_key, true_right_key, false_branch = match.groups()
-        left_val = record.get(left_key)
-        right_val = record.get(right_key)
-        if left_val and right_val:
+    if not match:
+        return lambda record: record.get(expr)
+
+    left_key, right_key, true_left_key, true_right_key, false_branch = match.groups()
+    false_is_null = false_branch.lower() == 'null'
+
+    def _evaluate(record: dict[str, object | None]) -> object | None:
+        if record.get(left_key) and record.get(right_key):
             left_true = record.get(true_left_key)
             right_true = record.get(true_right_key)
             left_text = (str(left_true).strip() if left_true is not None else '')
             right_text = (str(right_true).strip() if right_true is not None else '')
             combined = left_text + right_text
             return combined or None
-        if false_branch.lower() == 'null':
+        if false_is_null:
             return None
         return record.get(false_branch)
-    return record.get(expr)
 
+    return _evaluate
 
-def _apply_simpro_postprocess(record: dict[str, object | None], postprocess_cfg: dict | None) -> None:
+
+def _evaluate_postprocess_expr(expr: str, record: dict[str, object | None]) -> object | None:
+    return _compile_postprocess_expr(expr)(record)
+
+
+@dataclass(frozen=True)
+class SimproPostprocessPlan:
+    extracts: tuple[tuple[str, re.Pattern | None, tuple[tuple[str, int | None], ...]], ...] = ()
+    derives: tuple[tuple[str, Callable[[dict[str, object | None]], object | None]], ...] = ()
+    cleanup: tuple[str, ...] = ()
+
+
+def _compile_simpro_postprocess(postprocess_cfg: dict | None) -> SimproPostprocessPlan | None:
     if not isinstance(postprocess_cfg, dict):
-        return
+        return None
 
-    extracts = postprocess_cfg.get('extract') or []
-    for spec in extracts:
+    extracts = []
+    for spec in postprocess_cfg.get('extract') or []:
         if not isinstance(spec, dict):
             continue
         source_field = spec.get('from')
@@ -996,23 +1062,51 @@ def _apply_simpro_postprocess(record: dict[str, object | None], postprocess_cfg:
         fields_map = spec.get('fields') or {}
         if not source_field or not regex_pattern or not isinstance(fields_map, dict):
             continue
+        try:
+            pattern = re.compile(regex_pattern)
+        except (re.error, TypeError):
+            pattern = None
+        fields: list[tuple[str, int | None]] = []
+        for field_name, group_index in fields_map.items():
+            try:
+                idx = int(group_index)
+            except (TypeError, ValueError):
+                idx = None
+            fields.append((field_name, idx))
+        extracts.append((source_field, pattern, tuple(fields)))
+
+    derives = []
+    for spec in postprocess_cfg.get('derive') or []:
+        if not isinstance(spec, dict):
+            continue
+        target_field = spec.get('name')
+        expr = spec.get('expr')
+        if not target_field or not isinstance(expr, str):
+            continue
+        derives.append((target_field, _compile_postprocess_expr(expr)))
+
+    cleanup = tuple(
+        field_name for field_name in (postprocess_cfg.get('cleanup') or []) if isinstance(field_name, str)
+    )
+    return SimproPostprocessPlan(extracts=tuple(extracts), derives=tuple(derives), cleanup=cleanup)
+
+
+def _run_simpro_postprocess(record: dict[str, object | None], plan: SimproPostprocessPlan | None) -> None:
+    if plan is None:
+        return
+
+    for source_field, pattern, fields in plan.extracts:
         value = record.get(source_field)
         if not isinstance(value, str):
-            for field_name in fields_map:
+            for field_name, _ in fields:
                 record.setdefault(field_name, None)
             continue
-        try:
-            pattern = re.compile(regex_pattern)
-        except re.error:
+        if pattern is None:
             continue
         match = pattern.search(value)
-        for field_name, group_index in fields_map.items():
+        for field_name, idx in fields:
             record.setdefault(field_name, None)
-            try:
-                idx = int(group_index)
-            except (TypeError, ValueError):
-                continue
-            if not match:
+            if idx is None or not match:
                 continue
             try:
                 captured = match.group(idx)
@@ -1022,20 +1116,15 @@ def _apply_simpro_postprocess(record: dict[str, object | None], postprocess_cfg:
                 captured = captured.strip() or None
             record[field_name] = captured
 
-    derives = postprocess_cfg.get('derive') or []
-    for spec in derives:
-        if not isinstance(spec, dict):
-            continue
-        target_field = spec.get('name')
-        expr = spec.get('expr')
-        if not target_field or not isinstance(expr, str):
-            continue
-        record[target_field] = _evaluate_postprocess_expr(expr, record)
+    for target_field, evaluate in plan.derives:
+        record[target_field] = evaluate(record)
 
-    cleanup_fields = postprocess_cfg.get('cleanup') or []
-    for field_name in cleanup_fields:
-        if isinstance(field_name, str):
-            record.pop(field_name, None)
+    for field_name in plan.cleanup:
+        record.pop(field_name, None)
+
+
+def _apply_simpro_postprocess(record: dict[str, object | None], postprocess_cfg: dict | None) -> None:
+    _run_simpro_postprocess(record, _compile_simpro_postprocess(postprocess_cfg))
 
 
 def _enrich_tuss_from_ean(record: dict[str, object | None]) -> None:
@@ -1182,6 +1271,8 @@ class CatalogoBrasindice(db.Model):
     edicao = db.Column(db.String(50), nullable=True)
     imported_at = db.Column(db.DateTime, nullable=True)
     etag_catalogo = db.Column(db.String(255), nullable=True)
+    descricao_norm = db.Column(db.String(500), nullable=True)
+    fabricante_norm = db.Column(db.String(255), nullable=True)
 
 
 class CatalogoSimpro(db.Model):
@@ -1210,6 +1301,8 @@ class CatalogoSimpro(db.Model):
     situacao = db.Column(db.String(40), nullable=True)
     imported_at = db.Column(db.DateTime, nullable=True)
     etag_catalogo = db.Column(db.String(255), nullable=True)
+    descricao_norm = db.Column(db.String(255), nullable=True)
+    fabricante_norm = db.Column(db.String(80), nullable=True)
 
 
 class InsumoIndex(db.Model):
@@ -1233,6 +1326,191 @@ class InsumoIndex(db.Model):
         server_default=text('CURRENT_TIMESTAMP'),
         server_onupdate=text('CURRENT_TIMESTAMP'),
     )
+    descricao_norm = db.Column(db.String(500), index=True, nullable=True)
+    fabricante_norm = db.Column(db.String(255), index=True, nullable=True)
+    tuss_norm = db.Column(db.String(50), index=True, nullable=True)
+    tiss_norm = db.Column(db.String(50), index=True, nullable=True)
+
+
+class InsumoIndexUf(db.Model):
+    """Pertinência UF → item do índice (uma linha por UF de ``insumos_index.uf_referencia``)."""
+
+    __tablename__ = 'insumos_index_uf'
+
+    uf = db.Column(db.String(2), primary_key=True)
+    origem = db.Column(db.Enum('BRAS', 'SIMPRO', name='insumo_origem'), primary_key=True)
+    item_id = db.Column(db.Integer, primary_key=True)
+
+    __table_args__ = (
+        db.ForeignKeyConstraint(
+            ['origem', 'item_id'],
+            ['insumos_index.origem', 'insumos_index.item_id'],
+            ondelete='CASCADE',
+        ),
+        db.Index('idx_insumos_index_uf_item', 'origem', 'item_id'),
+    )
+
+
+class InsumoSimilar(db.Model):
+    """Vizinhos pré-calculados de cada item do índice (ver ``_build_insumo_similar``)."""
+
+    __tablename__ = 'insumo_similar'
+
+    origem = db.Column(db.Enum('BRAS', 'SIMPRO', name='insumo_origem'), primary_key=True)
+    item_id = db.Column(db.Integer, primary_key=True)
+    posicao = db.Column(db.SmallInteger, primary_key=True)
+    similar_id = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Integer, nullable=False)
+    justificativas = db.Column(db.String(1000), nullable=True)
+    calculado_em = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('idx_insumo_similar_vizinho', 'origem', 'similar_id'),
+    )
+
+
+# Única dobra de texto da busca: usada pelas colunas *_norm, pelo SQL de importação (_sql_search_norm),
+# pela migração que preenche as colunas e pelo índice de sugestões de procedimentos.
+# Ordinais (º/ª) viram letra, como na decomposição NFKD.
+_SEARCH_FOLD_CHARS = (
+    ('ÁÀÂÃÄÅª', 'A'), ('ÉÈÊË', 'E'), ('ÍÌÎÏ', 'I'), ('ÓÒÔÕÖº', 'O'), ('ÚÙÛÜ', 'U'), ('Ç', 'C'), ('Ñ', 'N'),
+)
+_SEARCH_FOLD_TABLE = str.maketrans({ch: ascii_ch for chars, ascii_ch in _SEARCH_FOLD_CHARS for ch in chars})
+_SEARCH_NON_ALNUM_RE = re.compile(r'[^A-Z0-9]+')
+
+
+def _normalize_search_text(value: str | None) -> str | None:
+    """Maiúsculas, sem acentos e com pontuação colapsada em um espaço ("Cateter-Ú 2,5" → "CATETER U 2 5")."""
+    if not value:
+        return None
+    folded = str(value).upper().translate(_SEARCH_FOLD_TABLE)
+    return _SEARCH_NON_ALNUM_RE.sub(' ', folded).strip() or None
+
+
+def _normalize_search_code(value: str | None) -> str | None:
+    """Código só com letras/dígitos ("1.01.01.01-2" → "1010101012"), para busca por prefixo."""
+    if not value:
+        return None
+    folded = str(value).upper().translate(_SEARCH_FOLD_TABLE)
+    return _SEARCH_NON_ALNUM_RE.sub('', folded) or None
+
+
+def _sql_search_norm(expr: str, *, code: bool = False) -> str:
+    """Equivalente MySQL de ``_normalize_search_text``/``_normalize_search_code`` para os INSERT ... SELECT."""
+    folded = f'UPPER({expr})'
+    for chars, ascii_ch in _SEARCH_FOLD_CHARS:
+        for ch in chars:
+            folded = f"REPLACE({folded}, '{ch}', '{ascii_ch}')"
+    if code:
+        return f"NULLIF(REGEXP_REPLACE({folded}, '[^A-Z0-9]+', ''), '')"
+    return f"NULLIF(TRIM(REGEXP_REPLACE({folded}, '[^A-Z0-9]+', ' ')), '')"
+
+
+# coluna normalizada → (colunas de origem, normalizador), por modelo.
+_SEARCH_NORM_COLUMNS: dict[type, dict[str, tuple[tuple[str, ...], Callable[[str | None], str | None]]]] = {
+    InsumoIndex: {
+        'descricao_norm': (('descricao',), _normalize_search_text),
+        'fabricante_norm': (('fabricante',), _normalize_search_text),
+        'tuss_norm': (('tuss',), _normalize_search_code),
+        'tiss_norm': (('tiss',), _normalize_search_code),
+    },
+    CBHPMItem: {
+        'codigo_norm': (('codigo',), _normalize_search_code),
+        'procedimento_norm': (('procedimento',), _normalize_search_text),
+    },
+    Procedimento: {
+        'codigo_norm': (('codigo',), _normalize_search_code),
+        'descricao_norm': (('descricao',), _normalize_search_text),
+    },
+    CatalogoBrasindice: {
+        'descricao_norm': (('produto_nome', 'apresentacao_descricao'), _normalize_search_text),
+        'fabricante_norm': (('laboratorio_nome',), _normalize_search_text),
+    },
+    CatalogoSimpro: {
+        'descricao_norm': (('descricao',), _normalize_search_text),
+        'fabricante_norm': (('fabricante',), _normalize_search_text),
+    },
+}
+
+
+def _search_norm_values(model: type, source: Mapping[str, object]) -> dict[str, str | None]:
+    values: dict[str, str | None] = {}
+    for target, (columns, normalizer) in _SEARCH_NORM_COLUMNS[model].items():
+        parts = [str(source.get(column)) for column in columns if source.get(column)]
+        values[target] = normalizer(' '.join(parts)) if parts else None
+    return values
+
+
+def _fill_search_norm(mapper, connection, target) -> None:
+    # Gravações via ORM; o índice de insumos (SQL em lote) usa _sql_search_norm.
+    specs = _SEARCH_NORM_COLUMNS[mapper.class_]
+    source = {column: getattr(target, column) for columns, _ in specs.values() for column in columns}
+    for column, value in _search_norm_values(mapper.class_, source).items():
+        setattr(target, column, value)
+
+
+for _norm_model in _SEARCH_NORM_COLUMNS:
+    event.listen(_norm_model, 'before_insert', _fill_search_norm)
+    event.listen(_norm_model, 'before_update', _fill_search_norm)
+
+
+def _backfill_search_norm(model: type, *, batch_size: int = 2000) -> int:
+    """Recalcula as colunas normalizadas de ``model`` em lotes (bases anteriores às colunas)."""
+    table = model.__table__
+    pk_columns = list(table.primary_key.columns)
+    specs = _SEARCH_NORM_COLUMNS[model]
+    source_columns = sorted({column for columns, _ in specs.values() for column in columns})
+    statement = (
+        table.update()
+        .where(*(column == bindparam(f'pk_{column.name}') for column in pk_columns))
+        .values({target: bindparam(target) for target in specs})
+    )
+    total = 0
+    last_key = None
+    while True:
+        query = select(*pk_columns, *(table.c[column] for column in source_columns)).order_by(*pk_columns)
+        if last_key is not None:
+            query = query.where(tuple_(*pk_columns) > tuple_(*last_key))
+        rows = db.session.execute(query.limit(batch_size)).mappings().all()
+        if not rows:
+            break
+        payload = []
+        for row in rows:
+            entry = _search_norm_values(model, row)
+            entry.update({f'pk_{column.name}': row[column.name] for column in pk_columns})
+            payload.append(entry)
+        db.session.execute(statement, payload)
+        db.session.commit()
+        total += len(rows)
+        last_key = [rows[-1][column.name] for column in pk_columns]
+    return total
+
+
+def _code_prefix(code: str) -> tuple[str | None, bool]:
+    """Prefixo de busca de um código e se ele vale para o código bruto (True) ou para o ``*_norm``.
+
+    Com separadores no termo ("1.01") o prefixo fica no código bruto: sem a pontuação,
+    "101" também casaria "10.1...".
+    """
+    normalized = _normalize_search_code(code)
+    if normalized and normalized != code.strip().upper():
+        return code.strip(), True
+    return normalized, False
+
+
+def _code_prefix_filter(code_column, norm_column, code: str):
+    """Igualdade no código bruto ou prefixo (sargável) no código bruto/coluna ``*_norm``."""
+    prefix, raw = _code_prefix(code)
+    if not prefix:
+        return code_column == code
+    if raw:
+        return or_(code_column == code, code_column.startswith(prefix, autoescape=True))
+    return or_(code_column == code, norm_column.like(f"{prefix}%"))
+
+
+def _text_contains_filter(norm_column, value: str | None, *, code: bool = False):
+    normalized = (_normalize_search_code if code else _normalize_search_text)(value)
+    return norm_column.like(f"%{normalized}%") if normalized else false()
 
 
 BRAS_DEFAULT_COLUMNS = ['tuss', 'tiss', 'anvisa', 'descricao', 'preco', 'fabricante', 'aliquota']
@@ -1243,10 +1521,17 @@ SIMPRO_DEFAULT_COLUMNS = [
 ]
 DECIMAL_FIELDS = {'preco', 'aliquota'}
 DATE_FIELDS = {'data_atualizacao'}
-DEFAULT_IMPORT_ENCODINGS = ['utf-8-sig', 'utf-8', 'latin-1', 'cp1252']
 TETO_PREVIEW_DIR = Path(tempfile.gettempdir()) / 'cbhpm_teto_previews'
 INSUMO_IMPORT_ASYNC_DIR = Path(tempfile.gettempdir()) / 'insumo_async_imports'
 INSUMO_IMPORT_ASYNC_DIR.mkdir(parents=True, exist_ok=True)
+IMPORT_STAGE_BATCH_DEFAULT = 10000
+IMPORT_STAGE_BATCH_MIN = 1000
+IMPORT_STAGE_BATCH_MAX = 50000
+ENCODING_SNIFF_SAMPLE_BYTES = 64 * 1024
+ENCODING_SCAN_CHUNK_BYTES = 1024 * 1024
+IMPORT_DELTA_SCAN_BATCH = 5000
+IMPORT_DELTA_ID_CHUNK = 1000
+IMPORT_DELTA_LABEL_SUFFIX = '#delta'
 
 BRAS_RAW_DEFAULT_COLUMNS = [
     'col01', 'col02', 'col03', 'col04', 'col05', 'col06', 'col07', 'col08', 'col09', 'col10',
@@ -1328,26 +1613,71 @@ def _columns_valid_for_model(model_cls, columns: list[str]) -> bool:
     return True
 
 
-def _build_encoding_list(primary: str | None) -> list[str]:
-    ordered: list[str] = []
-    seen: set[str] = set()
+_C1_BYTES_RE = re.compile(rb'[\x80-\x9f]')
+_CP1252_UNDEFINED_RE = re.compile(rb'[\x81\x8d\x8f\x90\x9d]')
 
-    def _add(candidate: str | None) -> None:
-        if not candidate:
-            return
-        normalized = candidate.strip()
-        if not normalized:
-            return
-        key = normalized.lower()
-        if key in seen:
-            return
-        seen.add(key)
-        ordered.append(normalized)
 
-    _add(primary)
-    for fallback in DEFAULT_IMPORT_ENCODINGS:
-        _add(fallback)
-    return ordered
+def _detect_file_encoding(
+    file_path: Path,
+    preferred: str | None = None,
+    *,
+    metrics: dict | None = None,
+) -> str:
+    """Escolhe a codificação do arquivo numa única leitura dos bytes brutos.
+
+    A amostra inicial detecta BOM; o restante do arquivo é validado em blocos
+    contra UTF-8 (e contra a codificação informada, se houver). Quando o UTF-8
+    não serve, bytes na faixa 0x80-0x9F indicam Windows-1252; sem eles, Latin-1.
+    """
+    started = time.perf_counter()
+    preferred_codec = None
+    if preferred and preferred.strip():
+        try:
+            preferred_codec = codecs.lookup(preferred.strip()).name
+        except LookupError:
+            app.logger.warning('Codificação %s desconhecida; detectando automaticamente.', preferred)
+
+    decoders = {'utf-8': codecs.getincrementaldecoder('utf-8')()}
+    if preferred_codec and preferred_codec not in decoders:
+        decoders[preferred_codec] = codecs.getincrementaldecoder(preferred_codec)()
+
+    has_c1 = False
+    cp1252_invalid = False
+    with file_path.open('rb') as handle:
+        chunk = handle.read(ENCODING_SNIFF_SAMPLE_BYTES)
+        has_bom = chunk.startswith(codecs.BOM_UTF8)
+        while chunk:
+            for name, decoder in list(decoders.items()):
+                try:
+                    decoder.decode(chunk)
+                except UnicodeDecodeError:
+                    del decoders[name]
+            if not has_c1 and _C1_BYTES_RE.search(chunk):
+                has_c1 = True
+            if not cp1252_invalid and _CP1252_UNDEFINED_RE.search(chunk):
+                cp1252_invalid = True
+            chunk = handle.read(ENCODING_SCAN_CHUNK_BYTES)
+    for name, decoder in list(decoders.items()):
+        try:
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            del decoders[name]
+
+    if preferred_codec and preferred_codec in decoders:
+        codec = preferred.strip()
+    elif 'utf-8' in decoders:
+        codec = 'utf-8-sig' if has_bom else 'utf-8'
+    elif has_c1 and not cp1252_invalid:
+        codec = 'cp1252'
+    else:
+        codec = 'latin-1'
+
+    elapsed = round(time.perf_counter() - started, 4)
+    if preferred_codec and codec != preferred.strip():
+        app.logger.info('Arquivo %s não é %s; usando %s.', file_path.name, preferred, codec)
+    if metrics is not None:
+        metrics['encoding'] = {'codec': codec, 'detect_seconds': elapsed}
+    return codec
 
 
 MYSQL_CHARSET_MAP = {
@@ -1478,40 +1808,193 @@ def _bras_load_data_delimited(
         return result.rowcount or 0
 
 
+def _load_data_fixed_width(
+    *,
+    file_path: Path,
+    table_name: str,
+    encoding: str,
+    line_terminator: str | None,
+    skip_header: bool,
+    arquivo_label: str,
+    columns: Sequence[tuple[str, int, int]] = (),
+    keep_line: bool = True,
+) -> int:
+    """Carrega cada linha do arquivo inteira em ``@linha`` e fatia no SET.
+
+    ``columns`` traz (coluna, início 1-based, tamanho) já validados contra a
+    tabela de destino; ``keep_line`` grava a linha completa na coluna ``linha``.
+    """
+    charset = _encoding_to_mysql_charset(encoding)
+    file_literal = _sql_escape_literal(str(file_path))
+    arquivo_literal = _sql_escape_literal(arquivo_label)
+    line_term_lit = _sql_escape_literal(_encode_line_terminator(line_terminator))
+    ignore_clause = 'IGNORE 1 LINES\n' if skip_header else ''
+
+    line_expr = "TRIM(TRAILING '\\r' FROM @linha)"
+    set_lines: list[str] = []
+    if keep_line:
+        set_lines.append(f"linha = {line_expr}")
+    for name, start, length in columns:
+        set_lines.append(f"{name} = NULLIF(TRIM(SUBSTRING({line_expr}, {start}, {length})), '')")
+    set_lines.append(f"arquivo = {arquivo_literal}")
+    set_lines.append("linha_num = (@row := @row + 1)")
+    set_clause = ',\n        '.join(set_lines)
+
+    # Separador de campo que não ocorre em arquivos texto: a linha chega inteira em @linha.
+    load_stmt = (
+        f"LOAD DATA LOCAL INFILE {file_literal}\n"
+        f"INTO TABLE {table_name}\n"
+        f"CHARACTER SET {charset}\n"
+        "FIELDS TERMINATED BY '\x01' ESCAPED BY ''\n"
+        f"LINES TERMINATED BY {line_term_lit}\n"
+        f"{ignore_clause}"
+        "(@linha)\n"
+        f"SET {set_clause}"
+    )
+
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql('SET @row := 0')
+        result = conn.exec_driver_sql(load_stmt)
+        return result.rowcount or 0
+
+
+def _use_fixed_load_data(map_config: dict, encoding: str) -> bool:
+    if map_config.get('disable_load_data'):
+        return False
+    if db.engine.dialect.name != 'mysql':
+        return False
+    # LOAD DATA não remove o BOM da primeira linha; deixa o caminho Python tratar.
+    return encoding.lower().replace('_', '-') not in {'utf-8-sig', 'utf8-sig'}
+
+
+def _resolve_stage_batch_size(map_config: dict | None = None) -> int:
+    raw = None
+    if isinstance(map_config, dict):
+        raw = map_config.get('batch_size')
+    if raw in (None, ''):
+        raw = os.getenv('INSUMO_IMPORT_BATCH_SIZE')
+    try:
+        size = int(str(raw).strip()) if raw not in (None, '') else IMPORT_STAGE_BATCH_DEFAULT
+    except (TypeError, ValueError):
+        size = IMPORT_STAGE_BATCH_DEFAULT
+    return min(max(size, IMPORT_STAGE_BATCH_MIN), IMPORT_STAGE_BATCH_MAX)
+
+
+def _insert_stage_batches(
+    rows: Iterable[tuple[dict, ...]],
+    models: Sequence[type],
+    *,
+    batch_size: int,
+    metrics: dict | None = None,
+) -> int:
+    """Grava as linhas do gerador em lotes de tamanho fixo, com commit por lote.
+
+    Cada item de ``rows`` traz um mapeamento por modelo (na mesma ordem de
+    ``models``); apenas um lote fica em memória por vez.
+    """
+    statements = [model.__table__.insert() for model in models]
+    buffers: list[list[dict]] = [[] for _ in models]
+    batch_log = metrics.setdefault('stage_batches', []) if metrics is not None else None
+    total = 0
+
+    def _flush() -> None:
+        nonlocal total
+        started = time.perf_counter()
+        for statement, buffer in zip(statements, buffers):
+            if buffer:
+                db.session.execute(statement, buffer)
+        db.session.commit()
+        count = len(buffers[0])
+        total += count
+        if batch_log is not None:
+            batch_log.append({'rows': count, 'seconds': round(time.perf_counter() - started, 4)})
+        for buffer in buffers:
+            buffer.clear()
+
+    for mappings in rows:
+        for buffer, mapping in zip(buffers, mappings):
+            buffer.append(mapping)
+        if len(buffers[0]) >= batch_size:
+            _flush()
+    if buffers[0]:
+        _flush()
+    return total
+
+
+def _discard_partial_stage(tables: Sequence[str], arquivo_label: str, metrics: dict | None) -> None:
+    db.session.rollback()
+    for table_name in tables:
+        db.session.execute(text(f'DELETE FROM {table_name} WHERE arquivo = :arquivo'), {'arquivo': arquivo_label})
+    db.session.commit()
+    if metrics is not None:
+        metrics.pop('stage_batches', None)
+
+
+def _iter_bras_csv_rows(
+    handle,
+    *,
+    delimiter: str,
+    quotechar: str | None,
+    skip_header: bool,
+    arquivo_label: str,
+) -> Iterator[tuple[dict]]:
+    reader = csv.reader(handle, delimiter=delimiter, quotechar=quotechar or '"')
+    linha_num = 0
+    for idx, raw in enumerate(reader, start=1):
+        if skip_header and idx == 1:
+            continue
+        values = (raw or [])[:23]
+        values += [''] * (23 - len(values))
+        linha_num += 1
+        yield ({
+            'arquivo': arquivo_label,
+            'linha_num': linha_num,
+            **{f'col{pos:02d}': (val.strip() or None) if isinstance(val, str) else None for pos, val in enumerate(values, start=1)}
+        },)
+
+
 def _bras_csv_fallback(
     *,
     file_path: Path,
     delimiter: str,
     quotechar: str | None,
     skip_header: bool,
-    encodings: list[str],
+    encoding: str,
     arquivo_label: str,
+    batch_size: int | None = None,
+    metrics: dict | None = None,
 ) -> int:
-    for enc in encodings:
-        try:
-            with file_path.open('r', encoding=enc, newline='') as handle:
-                reader = csv.reader(handle, delimiter=delimiter, quotechar=quotechar or '"')
-                rows: list[dict] = []
-                for idx, raw in enumerate(reader, start=1):
-                    if skip_header and idx == 1:
-                        continue
-                    values = (raw or [])[:23]
-                    values += [''] * (23 - len(values))
-                    mapping = {
-                        'arquivo': arquivo_label,
-                        'linha_num': len(rows) + 1,
-                        **{f'col{pos:02d}': (val.strip() or None) if isinstance(val, str) else None for pos, val in enumerate(values, start=1)}
-                    }
-                    rows.append(mapping)
-            if rows:
-                db.session.bulk_insert_mappings(BrasRaw, rows)
-                db.session.commit()
-                return len(rows)
-            return 0
-        except UnicodeDecodeError:
-            db.session.rollback()
+    batch_size = batch_size or _resolve_stage_batch_size()
+    try:
+        with file_path.open('r', encoding=encoding, newline='') as handle:
+            return _insert_stage_batches(
+                _iter_bras_csv_rows(
+                    handle,
+                    delimiter=delimiter,
+                    quotechar=quotechar,
+                    skip_header=skip_header,
+                    arquivo_label=arquivo_label,
+                ),
+                [BrasRaw],
+                batch_size=batch_size,
+                metrics=metrics,
+            )
+    except UnicodeDecodeError as exc:
+        _discard_partial_stage(['bras_raw'], arquivo_label, metrics)
+        raise click.ClickException(f'Não foi possível decodificar o arquivo como {encoding}.') from exc
+
+
+def _iter_simpro_fixed_rows(handle, *, skip_header: bool, arquivo_label: str) -> Iterator[tuple[dict]]:
+    logical_idx = 0
+    for raw_idx, raw_line in enumerate(handle, start=1):
+        if skip_header and raw_idx == 1:
             continue
-    raise click.ClickException('Não foi possível decodificar o arquivo com as codificações testadas.')
+        logical_idx += 1
+        yield ({
+            'arquivo': arquivo_label,
+            'linha_num': logical_idx,
+            'linha': raw_line.rstrip('\r\n'),
+        },)
 
 
 def _stage_simpro_fixed(
@@ -1520,35 +2003,39 @@ def _stage_simpro_fixed(
     map_config: dict,
     encoding: str | None,
     arquivo_label: str,
+    metrics: dict | None = None,
 ) -> tuple[int, str]:
-    encodings = _build_encoding_list(encoding)
+    encoding = _detect_file_encoding(file_path, encoding, metrics=metrics)
     skip_header = bool(map_config.get('skip_header'))
-    inserted = 0
-    for enc in encodings:
+    if _use_fixed_load_data(map_config, encoding):
         try:
-            rows: list[dict] = []
-            with file_path.open('r', encoding=enc, newline='') as handle:
-                logical_idx = 0
-                for raw_idx, raw_line in enumerate(handle, start=1):
-                    if skip_header and raw_idx == 1:
-                        continue
-                    line = raw_line.rstrip('\r\n')
-                    logical_idx += 1
-                    rows.append({
-                        'arquivo': arquivo_label,
-                        'linha_num': logical_idx,
-                        'linha': line,
-                    })
-            if rows:
-                db.session.bulk_insert_mappings(SimproFixedStage, rows)
-                db.session.commit()
-                inserted = len(rows)
-                break
-        except UnicodeDecodeError:
-            db.session.rollback()
-            continue
+            inserted = _load_data_fixed_width(
+                file_path=file_path,
+                table_name='simpro_fixed_stage',
+                encoding=encoding,
+                line_terminator=map_config.get('lines_terminated') or map_config.get('line_terminator'),
+                skip_header=skip_header,
+                arquivo_label=arquivo_label,
+            )
+            if inserted:
+                return inserted, 'load_data_fixed'
+        except Exception as exc:  # noqa: BLE001
+            app.logger.warning('LOAD DATA (SIMPRO largura fixa) falhou (%s); usando fallback Python.', exc)
+        _discard_partial_stage(['simpro_fixed_stage'], arquivo_label, metrics)
+
+    try:
+        with file_path.open('r', encoding=encoding, newline='') as handle:
+            inserted = _insert_stage_batches(
+                _iter_simpro_fixed_rows(handle, skip_header=skip_header, arquivo_label=arquivo_label),
+                [SimproFixedStage],
+                batch_size=_resolve_stage_batch_size(map_config),
+                metrics=metrics,
+            )
+    except UnicodeDecodeError as exc:
+        _discard_partial_stage(['simpro_fixed_stage'], arquivo_label, metrics)
+        raise click.ClickException('Não foi possível decodificar o arquivo de largura fixa do SIMPRO.') from exc
     if not inserted:
-        raise click.ClickException('Não foi possível decodificar o arquivo de largura fixa do SIMPRO.')
+        raise click.ClickException('Arquivo de largura fixa do SIMPRO não possui linhas.')
     return inserted, 'python_fixed'
 
 
@@ -1586,13 +2073,112 @@ def _auto_scale_decimal(value: Decimal | None, *, min_fraction_digits: int = 2)
         return value
 
 
-def _materialize_simpro_items(
-    *,
-    arquivo_label: str,
-    map_config: dict,
-    versao: str,
-    uf_default: str | None,
-) -> int:
+_DECIMAL_RESCALE_THRESHOLD = Decimal('10000000')
+_DECIMAL_RESCALE_FACTOR = Decimal('1000000')
+_DECIMAL_RESCALE_MIN = Decimal('0.01')
+_DECIMAL_QUANTUM = Decimal('0.0000')
+
+_SIMPRO_NORM_INSERT_COLUMNS: tuple[str, ...] = tuple(column.name for column in SimproItemNormalized.__table__.columns)
+_SIMPRO_NORM_EMPTY_ROW: dict[str, None] = dict.fromkeys(_SIMPRO_NORM_INSERT_COLUMNS)
+
+
+def _decimal_column_converter(divisor: Decimal) -> Callable[[str], Decimal | None]:
+    def _convert(value: str) -> Decimal | None:
+        if value.isascii() and value.isdigit():
+            scaled = Decimal(value) / divisor
+        else:
+            coerced = _coerce_decimal(DECIMAL_SANITIZE_RE.sub('', value))
+            if coerced is None:
+                return None
+            scaled = Decimal(coerced) / divisor
+        if scaled >= _DECIMAL_RESCALE_THRESHOLD:
+            adjusted = scaled / _DECIMAL_RESCALE_FACTOR
+            if adjusted >= _DECIMAL_RESCALE_MIN:
+                scaled = adjusted
+        try:
+            return scaled.quantize(_DECIMAL_QUANTUM)
+        except InvalidOperation:
+            return scaled
+
+    return _convert
+
+
+def _date_column_converter(date_fmt: str | None) -> Callable[[str], date | None]:
+    fmt = (date_fmt or 'DDMMYYYY').upper()
+    python_fmt = fmt.replace('YYYY', '%Y').replace('YY', '%y').replace('MM', '%m').replace('DD', '%d')
+
+    def _slow(value: str) -> date | None:
+        try:
+            return datetime.strptime(value, python_fmt).date()
+        except ValueError:
+            return None
+
+    # Formatos só com DD/MM/YYYY (ou YY) e separadores fixos são fatiados
+    # diretamente; qualquer valor fora do padrão cai no strptime.
+    positions: dict[str, tuple[int, int]] = {}
+    literals: list[tuple[int, str]] = []
+    idx = 0
+    while idx < len(fmt):
+        for token, key in (('YYYY', 'Y'), ('YY', 'y'), ('MM', 'm'), ('DD', 'd')):
+            if fmt.startswith(token, idx):
+                if key in positions or (key in 'Yy' and ('Y' in positions or 'y' in positions)):
+                    return _slow
+                positions[key] = (idx, idx + len(token))
+                idx += len(token)
+                break
+        else:
+            if fmt[idx].isalnum():
+                return _slow
+            literals.append((idx, fmt[idx]))
+            idx += 1
+    if 'd' not in positions or 'm' not in positions or not ({'Y', 'y'} & positions.keys()):
+        return _slow
+
+    expected_len = len(fmt)
+    day_slice = slice(*positions['d'])
+    month_slice = slice(*positions['m'])
+    short_year = 'y' in positions
+    year_slice = slice(*positions['y' if short_year else 'Y'])
+
+    def _convert(value: str) -> date | None:
+        if len(value) != expected_len or any(value[pos] != ch for pos, ch in literals):
+            return _slow(value)
+        day_text, month_text, year_text = value[day_slice], value[month_slice], value[year_slice]
+        if not (day_text + month_text + year_text).isascii() or not (day_text + month_text + year_text).isdigit():
+            return _slow(value)
+        year = int(year_text)
+        if short_year:
+            year += 1900 if year >= 69 else 2000
+        try:
+            return date(year, int(month_text), int(day_text))
+        except ValueError:
+            return None
+
+    return _convert
+
+
+def _int_column_converter(value: str) -> int | None:
+    if value.isascii() and value.isdigit():
+        return int(value)
+    digits = ''.join(ch for ch in value if ch.isdigit() or ch == '-')
+    try:
+        return int(digits) if digits else None
+    except ValueError:
+        return None
+
+
+@dataclass(frozen=True)
+class SimproColumnPlan:
+    """Mapa SIMPRO pré-compilado: fatias, conversores e regras de pós-processamento."""
+
+    getter: Callable[[str], tuple[str, ...]]
+    steps: tuple[tuple[str, int | None, tuple[str, ...], Callable[[str], object] | None], ...]
+    postprocess: SimproPostprocessPlan | None
+    field_map: dict[str, str]
+    field_pairs: tuple[tuple[str, str], ...]
+
+
+def _compile_simpro_column_plan(map_config: dict) -> SimproColumnPlan:
     columns_cfg = map_config.get('columns') or []
     if not columns_cfg:
         raise click.ClickException('Mapa SIMPRO precisa definir "columns".')
@@ -1604,101 +2190,221 @@ def _materialize_simpro_items(
     if not decimal_divisor:
         decimal_divisor = Decimal('1')
 
+    slices: list[slice] = []
+    steps = []
+    for cfg in columns_cfg:
+        if not isinstance(cfg, dict):
+            continue
+        name = (cfg.get('name') or '').strip()
+        if not name:
+            continue
+        start = max(int(cfg.get('start', 1)) - 1, 0)
+        length = max(int(cfg.get('length', 0)), 0)
+        if length <= 0:
+            steps.append((name, None, (), None))
+            continue
+
+        strip_chars: tuple[str, ...] = ()
+        if cfg.get('strip') and isinstance(cfg['strip'], (list, tuple)):
+            strip_chars = tuple(str(ch) for ch in cfg['strip'])
+
+        value_type = (cfg.get('type') or '').strip().lower()
+        converter: Callable[[str], object] | None = None
+        if value_type == 'decimal':
+            divisor_raw = cfg.get('divide_by', decimal_divisor)
+            try:
+                divisor = Decimal(str(divisor_raw or '1'))
+            except (InvalidOperation, ValueError):
+                divisor = Decimal('1')
+            if not divisor:
+                divisor = Decimal('1')
+            converter = _decimal_column_converter(divisor)
+        elif value_type == 'date':
+            converter = _date_column_converter(cfg.get('date_fmt'))
+        elif value_type == 'int':
+            converter = _int_column_converter
+
+        steps.append((name, len(slices), strip_chars, converter))
+        slices.append(slice(start, start + length))
+
+    if len(slices) == 1:
+        single = slices[0]
+        getter = lambda line: (line[single],)  # noqa: E731
+    elif slices:
+        getter = itemgetter(*slices)
+    else:
+        getter = lambda line: ()  # noqa: E731
+
     postprocess_cfg = map_config.get('postprocess') if isinstance(map_config.get('postprocess'), dict) else None
     field_map = _resolve_simpro_field_map(map_config)
-
-    rows = (
-        SimproFixedStage.query
-        .filter_by(arquivo=arquivo_label)
-        .order_by(SimproFixedStage.linha_num.asc())
-        .all()
+    return SimproColumnPlan(
+        getter=getter,
+        steps=tuple(steps),
+        postprocess=_compile_simpro_postprocess(postprocess_cfg),
+        field_map=field_map,
+        field_pairs=tuple(
+            (source, target) for source, target in field_map.items() if target in _SIMPRO_ALLOWED_COLUMNS
+        ),
     )
 
-    parsed_rows: list[dict] = []
-    for stage in rows:
-        line = stage.linha or ''
-        record: dict[str, object | None] = {
-            'id': stage.id,
-            'arquivo': stage.arquivo,
-            'linha_num': stage.linha_num,
-            'versao': versao,
-            'uf_referencia': uf_default,
-            'imported_at': stage.imported_at,
-        }
-        for cfg in columns_cfg:
-            if not isinstance(cfg, dict):
-                continue
-            name = (cfg.get('name') or '').strip()
-            if not name:
-                continue
-            start = max(int(cfg.get('start', 1)) - 1, 0)
-            length = max(int(cfg.get('length', 0)), 0)
-            if length <= 0:
-                record[name] = None
-                continue
-            raw_value = line[start:start + length]
-            if cfg.get('strip') and isinstance(cfg['strip'], (list, tuple)):
-                for ch in cfg['strip']:
-                    raw_value = raw_value.replace(str(ch), '')
-            if cfg.get('rtrim'):
-                raw_value = raw_value.rstrip()
-            value = raw_value.strip()
-            if not value:
-                record[name] = None
-                continue
 
-            value_type = (cfg.get('type') or '').strip().lower()
-            if value_type == 'decimal':
-                coerced = _coerce_decimal(_sanitize_numeric(value))
-                if coerced is None:
-                    record[name] = None
-                else:
-                    divisor_raw = cfg.get('divide_by', decimal_divisor)
-                    try:
-                        divisor = Decimal(str(divisor_raw or '1'))
-                    except (InvalidOperation, ValueError):
-                        divisor = Decimal('1')
-                    if not divisor:
-                        divisor = Decimal('1')
-                    scaled = Decimal(coerced) / divisor
-                    if scaled >= Decimal('10000000'):
-                        adjusted = scaled / Decimal('1000000')
-                        if adjusted >= Decimal('0.01'):
-                            scaled = adjusted
-                    record[name] = _auto_scale_decimal(scaled)
-            elif value_type == 'date':
-                record[name] = _parse_fixed_date(value, cfg.get('date_fmt'))
-            elif value_type == 'int':
-                digits = ''.join(ch for ch in value if ch.isdigit() or ch == '-')
-                try:
-                    record[name] = int(digits) if digits else None
-                except ValueError:
-                    record[name] = None
-            else:
-                record[name] = value
+def _normalize_simpro_line(
+    plan: SimproColumnPlan,
+    line: str,
+    base: dict[str, object | None],
+) -> tuple[object | None, ...]:
+    record: dict[str, object | None] = dict(base)
+    raw_values = plan.getter(line)
+    for name, position, strip_chars, converter in plan.steps:
+        if position is None:
+            record[name] = None
+            continue
+        raw_value = raw_values[position]
+        for ch in strip_chars:
+            raw_value = raw_value.replace(ch, '')
+        value = raw_value.strip()
+        if not value:
+            record[name] = None
+        elif converter is None:
+            record[name] = value
+        else:
+            record[name] = converter(value)
 
-        _apply_simpro_postprocess(record, postprocess_cfg)
-        _enrich_tuss_from_ean(record)
-        _ensure_tuss_from_line(record, line)
-        _ensure_tuss_field(record)
+    _run_simpro_postprocess(record, plan.postprocess)
+    _enrich_tuss_from_ean(record)
+    _ensure_tuss_from_line(record, line)
+    _ensure_tuss_field(record)
 
-        payload = {
-            'id': stage.id,
-            'arquivo': stage.arquivo,
-            'linha_num': stage.linha_num,
+    payload = dict(_SIMPRO_NORM_EMPTY_ROW)
+    payload.update(base)
+    for source, target in plan.field_pairs:
+        if source not in record:
+            continue
+        value = record[source]
+        if target == 'codigo':
+            value = _format_tuss_display(value, record.get('tuss_numero'))
+        payload[target] = value
+
+    if payload['codigo'] in (None, '') and record.get('tuss_numero'):
+        payload['codigo'] = record.get('tuss_numero')
+    if payload['codigo'] in (None, '') and record.get('codigo_interno'):
+        payload['codigo'] = record.get('codigo_interno')
+    return tuple(payload.values())
+
+
+def _iter_simpro_stage_batches(arquivo_label: str, batch_size: int) -> Iterator[list[tuple]]:
+    last_linha = None
+    while True:
+        query = (
+            db.session.query(
+                SimproFixedStage.id,
+                SimproFixedStage.arquivo,
+                SimproFixedStage.linha_num,
+                SimproFixedStage.linha,
+                SimproFixedStage.imported_at,
+            )
+            .filter(SimproFixedStage.arquivo == arquivo_label)
+        )
+        if last_linha is not None:
+            query = query.filter(SimproFixedStage.linha_num > last_linha)
+        batch = [tuple(row) for row in query.order_by(SimproFixedStage.linha_num.asc()).limit(batch_size).all()]
+        if not batch:
+            return
+        yield batch
+        last_linha = batch[-1][2]
+
+
+def _normalize_simpro_rows(
+    plan: SimproColumnPlan,
+    rows: Iterable[tuple],
+    versao: str,
+    uf_default: str | None,
+) -> Iterator[tuple[object | None, ...]]:
+    for stage_id, arquivo, linha_num, linha, imported_at in rows:
+        base = {
+            'id': stage_id,
+            'arquivo': arquivo,
+            'linha_num': linha_num,
             'versao': versao,
             'uf_referencia': uf_default,
-            'imported_at': stage.imported_at,
+            'imported_at': imported_at,
         }
-        payload.update(_build_simpro_payload(record, field_map))
-        parsed_rows.append(payload)
+        yield _normalize_simpro_line(plan, linha or '', base)
+
+
+_SIMPRO_WORKER_PLAN: SimproColumnPlan | None = None
+
+
+def _init_simpro_normalize_worker(map_config: dict) -> None:
+    global _SIMPRO_WORKER_PLAN
+    _SIMPRO_WORKER_PLAN = _compile_simpro_column_plan(map_config)
+    # O processo filho herda o pool de conexões do pai; descarta sem fechar.
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def _normalize_simpro_shard(rows: list[tuple], versao: str, uf_default: str | None) -> list[tuple]:
+    return list(_normalize_simpro_rows(_SIMPRO_WORKER_PLAN, rows, versao, uf_default))
+
+
+def _resolve_simpro_workers(map_config: dict | None, workers: int | None = None) -> int:
+    raw = workers
+    if raw is None and isinstance(map_config, dict):
+        raw = map_config.get('workers')
+    try:
+        value = int(raw) if raw not in (None, '') else 1
+    except (TypeError, ValueError):
+        value = 1
+    return min(max(value, 1), os.cpu_count() or 1)
+
+
+def _materialize_simpro_items(
+    *,
+    arquivo_label: str,
+    map_config: dict,
+    versao: str,
+    uf_default: str | None,
+    workers: int | None = None,
+) -> int:
+    plan = _compile_simpro_column_plan(map_config)
+    batch_size = _resolve_stage_batch_size(map_config)
+    workers = _resolve_simpro_workers(map_config, workers)
+
+    def _as_mappings(rows: Iterable[tuple]) -> Iterator[tuple[dict]]:
+        for values in rows:
+            yield (dict(zip(_SIMPRO_NORM_INSERT_COLUMNS, values)),)
+
+    if workers <= 1:
+        stage_rows = (row for batch in _iter_simpro_stage_batches(arquivo_label, batch_size) for row in batch)
+        normalized = _normalize_simpro_rows(plan, stage_rows, versao, uf_default)
+        return _insert_stage_batches(_as_mappings(normalized), [SimproItemNormalized], batch_size=batch_size)
+
+    # Cada lote de linha_num vira um shard; no máximo 2 shards por processo
+    # ficam em voo para manter a memória limitada.
+    mp_context = None
+    if 'fork' in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context('fork')
+    inserted = 0
+    pending: deque = deque()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp_context,
+        initializer=_init_simpro_normalize_worker,
+        initargs=(map_config,),
+    ) as pool:
+        for shard in _iter_simpro_stage_batches(arquivo_label, batch_size):
+            pending.append(pool.submit(_normalize_simpro_shard, shard, versao, uf_default))
+            if len(pending) >= workers * 2:
+                inserted += _insert_stage_batches(
+                    _as_mappings(pending.popleft().result()), [SimproItemNormalized], batch_size=batch_size
+                )
+        while pending:
+            inserted += _insert_stage_batches(
+                _as_mappings(pending.popleft().result()), [SimproItemNormalized], batch_size=batch_size
+            )
+    return inserted
 
-    if not parsed_rows:
-        return 0
 
-    db.session.bulk_insert_mappings(SimproItemNormalized, parsed_rows)
-    db.session.commit()
-    return len(parsed_rows)
 def _stage_bras_delimited(
     *,
     file_path: Path,
@@ -1709,8 +2415,10 @@ def _stage_bras_delimited(
     encoding: str | None,
     arquivo_label: str,
     use_load_data: bool,
+    batch_size: int | None = None,
+    metrics: dict | None = None,
 ) -> tuple[int, str]:
-    encodings = _build_encoding_list(encoding)
+    encoding = _detect_file_encoding(file_path, encoding, metrics=metrics)
     inserted = 0
     strategy = 'load_data'
     if use_load_data:
@@ -1721,7 +2429,7 @@ def _stage_bras_delimited(
                 quotechar=quotechar,
                 line_terminator=line_terminator,
                 skip_header=skip_header,
-                encoding=encodings[0],
+                encoding=encoding,
                 arquivo_label=arquivo_label,
             )
         except Exception as exc:
@@ -1736,13 +2444,30 @@ def _stage_bras_delimited(
             delimiter=delimiter,
             quotechar=quotechar,
             skip_header=skip_header,
-            encodings=encodings,
+            encoding=encoding,
             arquivo_label=arquivo_label,
+            batch_size=batch_size,
+            metrics=metrics,
         )
         strategy = 'python'
     return inserted, strategy
 
 
+def _iter_bras_fixed_rows(handle, *, columns_cfg: list, arquivo_label: str) -> Iterator[tuple[dict, dict]]:
+    for idx, raw_line in enumerate(handle, start=1):
+        line = raw_line.rstrip('\r\n')
+        mapping = {'arquivo': arquivo_label, 'linha_num': idx}
+        for col in columns_cfg:
+            name = col.get('name')
+            start = int(col.get('start', 1)) - 1
+            length = int(col.get('length', 0))
+            if not name or length <= 0:
+                continue
+            snippet = line[start:start + length]
+            mapping[name] = snippet.strip() or None
+        yield {'arquivo': arquivo_label, 'linha_num': idx, 'linha': line}, mapping
+
+
 def _stage_bras_fixed(
     *,
     file_path: Path,
@@ -1750,43 +2475,60 @@ def _stage_bras_fixed(
     encoding: str | None,
     line_terminator: str,
     arquivo_label: str,
+    metrics: dict | None = None,
 ) -> tuple[int, str]:
     columns_cfg = map_config.get('columns') or []
     if not columns_cfg:
         raise click.ClickException('Arquivo de mapeamento precisa definir "columns".')
 
-    encodings = _build_encoding_list(encoding)
-    inserted = 0
-    for enc in encodings:
+    encoding = _detect_file_encoding(file_path, encoding, metrics=metrics)
+    if _use_fixed_load_data(map_config, encoding):
+        raw_columns = {column.name for column in BrasRaw.__table__.columns} - {'id', 'arquivo', 'linha_num', 'imported_at'}
+        split_columns: list[tuple[str, int, int]] = []
+        for col in columns_cfg:
+            name = col.get('name')
+            start = int(col.get('start', 1))
+            length = int(col.get('length', 0))
+            if name in raw_columns and length > 0:
+                split_columns.append((name, max(start, 1), length))
         try:
-            rows_stage: list[dict] = []
-            rows_raw: list[dict] = []
-            with file_path.open('r', encoding=enc, newline='') as handle:
-                for idx, raw_line in enumerate(handle, start=1):
-                    line = raw_line.rstrip('\r\n')
-                    rows_stage.append({'arquivo': arquivo_label, 'linha_num': idx, 'linha': line})
-                    mapping = {'arquivo': arquivo_label, 'linha_num': idx}
-                    for col in columns_cfg:
-                        name = col.get('name')
-                        start = int(col.get('start', 1)) - 1
-                        length = int(col.get('length', 0))
-                        if not name or length <= 0:
-                            continue
-                        snippet = line[start:start + length]
-                        mapping[name] = snippet.strip() or None
-                    rows_raw.append(mapping)
-            if rows_stage:
-                db.session.bulk_insert_mappings(BrasFixedStage, rows_stage)
-            if rows_raw:
-                db.session.bulk_insert_mappings(BrasRaw, rows_raw)
-            db.session.commit()
-            inserted = len(rows_raw)
-            break
-        except UnicodeDecodeError:
-            db.session.rollback()
-            continue
+            inserted = _load_data_fixed_width(
+                file_path=file_path,
+                table_name='bras_fixed_stage',
+                encoding=encoding,
+                line_terminator=line_terminator,
+                skip_header=False,
+                arquivo_label=arquivo_label,
+            )
+            if inserted:
+                _load_data_fixed_width(
+                    file_path=file_path,
+                    table_name='bras_raw',
+                    encoding=encoding,
+                    line_terminator=line_terminator,
+                    skip_header=False,
+                    arquivo_label=arquivo_label,
+                    columns=split_columns,
+                    keep_line=False,
+                )
+                return inserted, 'load_data_fixed'
+        except Exception as exc:  # noqa: BLE001
+            app.logger.warning('LOAD DATA (Brasíndice largura fixa) falhou (%s); usando fallback Python.', exc)
+        _discard_partial_stage(['bras_fixed_stage', 'bras_raw'], arquivo_label, metrics)
+
+    try:
+        with file_path.open('r', encoding=encoding, newline='') as handle:
+            inserted = _insert_stage_batches(
+                _iter_bras_fixed_rows(handle, columns_cfg=columns_cfg, arquivo_label=arquivo_label),
+                [BrasFixedStage, BrasRaw],
+                batch_size=_resolve_stage_batch_size(map_config),
+                metrics=metrics,
+            )
+    except UnicodeDecodeError as exc:
+        _discard_partial_stage(['bras_fixed_stage', 'bras_raw'], arquivo_label, metrics)
+        raise click.ClickException('Não foi possível decodificar o arquivo de largura fixa.') from exc
     if not inserted:
-        raise click.ClickException('Não foi possível decodificar o arquivo de largura fixa.')
+        raise click.ClickException('Arquivo de largura fixa não possui linhas.')
     return inserted, 'python_fixed'
 
 
@@ -1922,12 +2664,109 @@ def _sql_clamp_decimal(expr: str, *, integer_digits: int = 8, scale: int = 4) ->
     )
 
 
+def _uf_membership_statements(origem: str, scope_sql: str) -> list:
+    """DELETE + INSERT que refazem ``insumos_index_uf`` para os itens de ``scope_sql``.
+
+    Usa o mesmo critério do antigo filtro (igualdade ou ``LIKE '%|UF|%'``) sobre
+    ``uf_referencia``, então o resultado das buscas por UF não muda.
+    """
+    uf_rows = ' UNION ALL '.join(f"SELECT '{uf}' AS uf, '%|{uf}|%' AS padrao" for uf in BR_UFS)
+    return [
+        text(
+            f"DELETE FROM insumos_index_uf WHERE origem = '{origem}' AND item_id IN ({scope_sql})"
+        ),
+        text(
+            f"""
+            INSERT INTO insumos_index_uf (uf, origem, item_id)
+            SELECT u.uf, i.origem, i.item_id
+              FROM insumos_index i
+              JOIN ({uf_rows}) u
+                ON UPPER(i.uf_referencia) = u.uf OR UPPER(i.uf_referencia) LIKE u.padrao
+             WHERE i.origem = '{origem}' AND i.item_id IN ({scope_sql})
+            """
+        ),
+    ]
+
+
+# No upsert, ``updated_at`` só avança quando muda o cadastro do item (não preço/versão): é o sinal
+# de _changed_similar_items. Vem antes das demais atribuições porque o MySQL as avalia em ordem.
+_INDEX_UPDATED_AT_SQL = (
+    "IF(descricao <=> VALUES(descricao) AND fabricante <=> VALUES(fabricante) AND anvisa <=> VALUES(anvisa) "
+    "AND tuss <=> VALUES(tuss) AND tiss <=> VALUES(tiss), updated_at, VALUES(updated_at))"
+)
+
+
+def _execute_index_upsert(
+    statement,
+    params: dict,
+    item_ids: Sequence[int] | None,
+    *,
+    origem: str | None = None,
+    scope_sql: str | None = None,
+) -> None:
+    statements = [statement]
+    if origem and scope_sql:
+        statements.extend(_uf_membership_statements(origem, scope_sql))
+    if item_ids is None:
+        for current in statements:
+            db.session.execute(current, params)
+    else:
+        statements = [current.bindparams(bindparam('item_ids', expanding=True)) for current in statements]
+        id_list = list(item_ids)
+        for start in range(0, len(id_list), IMPORT_DELTA_ID_CHUNK):
+            chunk_params = {**params, 'item_ids': id_list[start:start + IMPORT_DELTA_ID_CHUNK]}
+            for current in statements:
+                db.session.execute(current, chunk_params)
+    _bump_catalogo_versao(CATALOGO_VERSAO_INDEX)
+    db.session.commit()
+    if origem:
+        _schedule_similar_rebuild(origem)
+
+
+def _index_uf_members(uf_referencia: str | None) -> list[str]:
+    """Equivalente Python do critério de ``_uf_membership_statements``."""
+    value = (uf_referencia or '').upper()
+    return [uf for uf in BR_UFS if value == uf or f'|{uf}|' in value]
+
+
+@event.listens_for(InsumoIndex, 'after_insert')
+@event.listens_for(InsumoIndex, 'after_update')
+def _sync_index_uf_rows(mapper, connection, target) -> None:
+    # Escritas via ORM (o caminho de importação usa SQL em lote e os statements acima).
+    if not db.inspect(target).attrs.uf_referencia.history.has_changes():
+        return
+    table = InsumoIndexUf.__table__
+    connection.execute(
+        table.delete().where(table.c.origem == target.origem, table.c.item_id == target.item_id)
+    )
+    members = _index_uf_members(target.uf_referencia)
+    if members:
+        connection.execute(
+            table.insert(),
+            [{'uf': uf, 'origem': target.origem, 'item_id': target.item_id} for uf in members],
+        )
+
+
+def _rebuild_insumo_index_ufs(origem: str | None = None) -> int:
+    """Refaz ``insumos_index_uf`` a partir de ``uf_referencia`` (backfill/CLI)."""
+    total = 0
+    for current in ([origem] if origem else ['BRAS', 'SIMPRO']):
+        scope_sql = f"SELECT item_id FROM insumos_index WHERE origem = '{current}'"
+        db.session.execute(text(f"DELETE FROM insumos_index_uf WHERE origem = '{current}'"))
+        _, insert_statement = _uf_membership_statements(current, scope_sql)
+        total += db.session.execute(insert_statement).rowcount or 0
+    _bump_catalogo_versao(CATALOGO_VERSAO_INDEX)
+    db.session.commit()
+    return total
+
+
 def _sync_bras_insumo_index(
     arquivo_label: str | None,
     *,
     uf_default: str | None = None,
     uf_values: Sequence[str] | None = None,
     aliquota_default: Decimal | None = None,
+    item_ids: Sequence[int] | None = None,
 ) -> None:
     target_ufs = list(dict.fromkeys([*(uf_values or []), *( [uf_default] if uf_default else [] )]))
     uf_codes = _normalize_uf_codes(target_ufs, uf_default=uf_default)
@@ -1942,25 +2781,41 @@ def _sync_bras_insumo_index(
     if arquivo_label:
         params_base['arquivo'] = arquivo_label
         where_clause = 'WHERE arquivo = :arquivo'
+    if item_ids is not None:
+        if not item_ids:
+            return
+        where_clause = f"{where_clause} AND n.id IN :item_ids" if where_clause else 'WHERE n.id IN :item_ids'
 
     preco_expr = "COALESCE(n.preco_pmc_unit, n.preco_pmc_pacote, n.preco_pfb_unit, n.preco_pfb_pacote)"
     preco_sql = _sql_clamp_decimal(preco_expr)
     aliquota_expr = "COALESCE(n.aliquota_ou_ipi, :aliquota_default)"
     aliquota_sql = _sql_clamp_decimal(aliquota_expr, integer_digits=4, scale=4)
+    descricao_sql = "TRIM(CONCAT_WS(' • ', NULLIF(n.produto_nome, ''), NULLIF(n.apresentacao_descricao, '')))"
+    replacements = {
+        '{where_clause}': where_clause,
+        '{updated_at_sql}': _INDEX_UPDATED_AT_SQL,
+        '{preco_sql}': preco_sql,
+        '{aliquota_sql}': aliquota_sql,
+        '{descricao_sql}': descricao_sql,
+        '{descricao_norm_sql}': _sql_search_norm(descricao_sql),
+        '{fabricante_norm_sql}': _sql_search_norm('n.laboratorio_nome'),
+        '{tuss_norm_sql}': _sql_search_norm('n.produto_codigo', code=True),
+        '{tiss_norm_sql}': _sql_search_norm('n.apresentacao_codigo', code=True),
+    }
 
-    upsert_template = text(
-        """
+    upsert_sql = """
         INSERT INTO insumos_index (
             origem, item_id, tuss, tiss, descricao, preco, aliquota,
             fabricante, anvisa, versao_tabela, data_atualizacao,
-            uf_referencia, updated_at
+            uf_referencia, updated_at,
+            descricao_norm, fabricante_norm, tuss_norm, tiss_norm
         )
         SELECT
             'BRAS' AS origem,
             n.id AS item_id,
             n.produto_codigo AS tuss,
             n.apresentacao_codigo AS tiss,
-            TRIM(CONCAT_WS(' • ', NULLIF(n.produto_nome, ''), NULLIF(n.apresentacao_descricao, ''))) AS descricao,
+            {descricao_sql} AS descricao,
             {preco_sql} AS preco,
             {aliquota_sql} AS aliquota,
             n.laboratorio_nome AS fabricante,
@@ -1968,10 +2823,15 @@ def _sync_bras_insumo_index(
             COALESCE(n.edicao, n.arquivo) AS versao_tabela,
             NULL AS data_atualizacao,
             COALESCE(:uf_storage, :uf_default) AS uf_referencia,
-            NOW() AS updated_at
+            NOW() AS updated_at,
+            {descricao_norm_sql} AS descricao_norm,
+            {fabricante_norm_sql} AS fabricante_norm,
+            {tuss_norm_sql} AS tuss_norm,
+            {tiss_norm_sql} AS tiss_norm
         FROM bras_item_n n
         {where_clause}
         ON DUPLICATE KEY UPDATE
+            updated_at = {updated_at_sql},
             tuss = VALUES(tuss),
             tiss = VALUES(tiss),
             descricao = VALUES(descricao),
@@ -1982,13 +2842,23 @@ def _sync_bras_insumo_index(
             versao_tabela = VALUES(versao_tabela),
             data_atualizacao = VALUES(data_atualizacao),
             uf_referencia = VALUES(uf_referencia),
-            updated_at = VALUES(updated_at)
-        """.replace('{where_clause}', where_clause).replace('{preco_sql}', preco_sql).replace('{aliquota_sql}', aliquota_sql)
+            descricao_norm = VALUES(descricao_norm),
+            fabricante_norm = VALUES(fabricante_norm),
+            tuss_norm = VALUES(tuss_norm),
+            tiss_norm = VALUES(tiss_norm)
+        """
+    for placeholder, expr in replacements.items():
+        upsert_sql = upsert_sql.replace(placeholder, expr)
+    upsert_template = text(upsert_sql)
+
+    _execute_index_upsert(
+        upsert_template,
+        params_base,
+        item_ids,
+        origem='BRAS',
+        scope_sql=f'SELECT n.id FROM bras_item_n n {where_clause}',
     )
 
-    db.session.execute(upsert_template, params_base)
-    db.session.commit()
-
 
 def _sync_simpro_insumo_index(
     arquivo_label: str | None,
@@ -1996,6 +2866,7 @@ def _sync_simpro_insumo_index(
     uf_default: str | None = None,
     uf_values: Sequence[str] | None = None,
     aliquota_default: Decimal | None = None,
+    item_ids: Sequence[int] | None = None,
 ) -> None:
     target_ufs = list(dict.fromkeys([*(uf_values or []), *( [uf_default] if uf_default else [] )]))
     uf_codes = _normalize_uf_codes(target_ufs, uf_default=uf_default)
@@ -2010,26 +2881,40 @@ def _sync_simpro_insumo_index(
     if arquivo_label:
         params_base['arquivo'] = arquivo_label
         where_clause = 'WHERE arquivo = :arquivo'
+    if item_ids is not None:
+        if not item_ids:
+            return
+        where_clause = f"{where_clause} AND n.id IN :item_ids" if where_clause else 'WHERE n.id IN :item_ids'
 
     preco_expr = "COALESCE(n.preco2, n.preco1, n.preco3, n.preco4)"
     preco_sql = _sql_clamp_decimal(preco_expr)
     aliquota_sql = _sql_clamp_decimal(":aliquota_default", integer_digits=4, scale=4)
+    tuss_sql = (
+        "COALESCE(NULLIF(n.tuss_numero, ''), NULLIF(REGEXP_REPLACE(COALESCE(n.codigo, ''), '[^0-9]', ''), ''), n.codigo)"
+    )
+    replacements = {
+        '{where_clause}': where_clause,
+        '{updated_at_sql}': _INDEX_UPDATED_AT_SQL,
+        '{preco_sql}': preco_sql,
+        '{aliquota_sql}': aliquota_sql,
+        '{tuss_sql}': tuss_sql,
+        '{descricao_norm_sql}': _sql_search_norm('n.descricao'),
+        '{fabricante_norm_sql}': _sql_search_norm('n.fabricante'),
+        '{tuss_norm_sql}': _sql_search_norm(tuss_sql, code=True),
+        '{tiss_norm_sql}': _sql_search_norm('n.codigo_alt', code=True),
+    }
 
-    upsert_template = text(
-        """
+    upsert_sql = """
         INSERT INTO insumos_index (
             origem, item_id, tuss, tiss, descricao, preco, aliquota,
             fabricante, anvisa, versao_tabela, data_atualizacao,
-            uf_referencia, updated_at
+            uf_referencia, updated_at,
+            descricao_norm, fabricante_norm, tuss_norm, tiss_norm
         )
         SELECT
             'SIMPRO' AS origem,
             n.id AS item_id,
-            COALESCE(
-                NULLIF(n.tuss_numero, ''),
-                NULLIF(REGEXP_REPLACE(COALESCE(n.codigo, ''), '[^0-9]', ''), ''),
-                n.codigo
-            ) AS tuss,
+            {tuss_sql} AS tuss,
             n.codigo_alt AS tiss,
             n.descricao AS descricao,
             {preco_sql} AS preco,
@@ -2039,10 +2924,15 @@ def _sync_simpro_insumo_index(
             COALESCE(n.versao, n.arquivo) AS versao_tabela,
             n.data_ref AS data_atualizacao,
             COALESCE(:uf_storage, n.uf_referencia, :uf_default) AS uf_referencia,
-            NOW() AS updated_at
+            NOW() AS updated_at,
+            {descricao_norm_sql} AS descricao_norm,
+            {fabricante_norm_sql} AS fabricante_norm,
+            {tuss_norm_sql} AS tuss_norm,
+            {tiss_norm_sql} AS tiss_norm
         FROM simpro_item_norm n
         {where_clause}
         ON DUPLICATE KEY UPDATE
+            updated_at = {updated_at_sql},
             tuss = VALUES(tuss),
             tiss = VALUES(tiss),
             descricao = VALUES(descricao),
@@ -2053,13 +2943,163 @@ def _sync_simpro_insumo_index(
             versao_tabela = VALUES(versao_tabela),
             data_atualizacao = VALUES(data_atualizacao),
             uf_referencia = VALUES(uf_referencia),
-            updated_at = VALUES(updated_at)
-        """.replace('{where_clause}', where_clause).replace('{preco_sql}', preco_sql).replace('{aliquota_sql}', aliquota_sql)
+            descricao_norm = VALUES(descricao_norm),
+            fabricante_norm = VALUES(fabricante_norm),
+            tuss_norm = VALUES(tuss_norm),
+            tiss_norm = VALUES(tiss_norm)
+        """
+    for placeholder, expr in replacements.items():
+        upsert_sql = upsert_sql.replace(placeholder, expr)
+    upsert_template = text(upsert_sql)
+
+    _execute_index_upsert(
+        upsert_template,
+        params_base,
+        item_ids,
+        origem='SIMPRO',
+        scope_sql=f'SELECT n.id FROM simpro_item_norm n {where_clause}',
     )
 
-    db.session.execute(upsert_template, params_base)
+
+def _iter_label_rows(table, arquivo_label: str, fields: Sequence[str], *, session=None) -> Iterator:
+    """Percorre as linhas de um rótulo em ordem de id, em lotes por keyset, lendo só ``fields``."""
+    session = session or db.session
+    columns = [table.c.id, table.c.linha_num, *(table.c[name] for name in fields)]
+    last_id = None
+    while True:
+        statement = select(*columns).where(table.c.arquivo == arquivo_label)
+        if last_id is not None:
+            statement = statement.where(table.c.id > last_id)
+        batch = session.execute(statement.order_by(table.c.id).limit(IMPORT_DELTA_SCAN_BATCH)).all()
+        if not batch:
+            return
+        yield from batch
+        last_id = batch[-1].id
+
+
+def _delta_content_hash(row, hash_fields: Sequence[str]) -> str:
+    payload_json = json.dumps(
+        _serialize_row(row, hash_fields), ensure_ascii=False, sort_keys=True, default=_json_default
+    )
+    return hashlib.sha256(payload_json.encode('utf-8')).hexdigest()
+
+
+def _apply_import_delta(
+    config: 'SupplierConfig',
+    *,
+    arquivo_label: str,
+    staging_label: str,
+    stage_tables: Sequence[str],
+    metrics: dict | None = None,
+) -> tuple[dict[str, int], list[int]]:
+    """Aplica em ``arquivo_label`` apenas as diferenças do arquivo normalizado em ``staging_label``.
+
+    Os itens são pareados pela chave de ``LinhaHash`` e comparados por todas as
+    colunas copiadas (``config.delta_fields``); itens inalterados mantêm id e
+    entrada no índice.
+    Retorna as contagens e os ids que precisam de novo upsert em ``insumos_index``.
+    """
+    started = time.perf_counter()
+    table = config.model.__table__
+    delta_fields = config.delta_fields
+    fields = list(dict.fromkeys([*config.item_key_fields, *delta_fields]))
+
+    baseline: dict[str, deque] = {}
+    for row in _iter_label_rows(table, arquivo_label, fields):
+        item_key = _build_item_key(row, config.item_key_fields)
+        baseline.setdefault(item_key, deque()).append(
+            (row.id, row.linha_num, _delta_content_hash(row, delta_fields))
+        )
+
+    inserted_ids: list[int] = []
+    updated_pairs: list[tuple[int, int]] = []
+    realign: list[dict[str, int]] = []
+    unchanged = 0
+    for row in _iter_label_rows(table, staging_label, fields):
+        candidates = baseline.get(_build_item_key(row, config.item_key_fields))
+        if not candidates:
+            inserted_ids.append(row.id)
+            continue
+        old_id, old_linha, old_hash = candidates.popleft()
+        if old_hash == _delta_content_hash(row, delta_fields):
+            unchanged += 1
+            if old_linha != row.linha_num:
+                realign.append({'b_id': old_id, 'b_linha': row.linha_num})
+        else:
+            updated_pairs.append((old_id, row.id))
+    deleted_ids = [entry[0] for candidates in baseline.values() for entry in candidates]
+    baseline.clear()
+
+    copy_columns = [column.name for column in table.columns if column.name not in {'id', 'arquivo'}]
+    update_stmt = (
+        table.update()
+        .where(table.c.id == bindparam('b_id'))
+        .values({name: bindparam(f'v_{name}') for name in copy_columns})
+    )
+    for start in range(0, len(updated_pairs), IMPORT_DELTA_ID_CHUNK):
+        chunk = dict((staged_id, old_id) for old_id, staged_id in updated_pairs[start:start + IMPORT_DELTA_ID_CHUNK])
+        staged_rows = db.session.execute(select(table).where(table.c.id.in_(list(chunk)))).mappings().all()
+        db.session.execute(
+            update_stmt,
+            [
+                {'b_id': chunk[staged['id']], **{f'v_{name}': staged[name] for name in copy_columns}}
+                for staged in staged_rows
+            ],
+        )
+    if realign:
+        db.session.execute(
+            table.update().where(table.c.id == bindparam('b_id')).values(linha_num=bindparam('b_linha')),
+            realign,
+        )
+
+    index_table = InsumoIndex.__table__
+    for start in range(0, len(deleted_ids), IMPORT_DELTA_ID_CHUNK):
+        chunk = deleted_ids[start:start + IMPORT_DELTA_ID_CHUNK]
+        db.session.execute(
+            index_table.delete().where(index_table.c.origem == config.origem, index_table.c.item_id.in_(chunk))
+        )
+        db.session.execute(table.delete().where(table.c.id.in_(chunk)))
+    for start in range(0, len(inserted_ids), IMPORT_DELTA_ID_CHUNK):
+        chunk = inserted_ids[start:start + IMPORT_DELTA_ID_CHUNK]
+        db.session.execute(table.update().where(table.c.id.in_(chunk)).values(arquivo=arquivo_label))
+    db.session.execute(table.delete().where(table.c.arquivo == staging_label))
+
+    # O stage bruto do arquivo novo passa a ser o do rótulo; linha_num já foi realinhado acima.
+    stage_params = {'arquivo': arquivo_label, 'staging': staging_label}
+    for stage_table in stage_tables:
+        db.session.execute(text(f'DELETE FROM {stage_table} WHERE arquivo = :arquivo'), stage_params)
+        db.session.execute(text(f'UPDATE {stage_table} SET arquivo = :arquivo WHERE arquivo = :staging'), stage_params)
     db.session.commit()
 
+    counts = {
+        'inserted': len(inserted_ids),
+        'updated': len(updated_pairs),
+        'deleted': len(deleted_ids),
+        'unchanged': unchanged,
+    }
+    if metrics is not None:
+        metrics.setdefault('delta', {})[arquivo_label] = {
+            **counts,
+            'seconds': round(time.perf_counter() - started, 4),
+        }
+    app.logger.info('Delta %s aplicado em %s: %s', config.origem, arquivo_label, counts)
+    return counts, [old_id for old_id, _ in updated_pairs] + inserted_ids
+
+
+def _format_delta_counts(counts: dict[str, int]) -> str:
+    return (
+        f"Delta: {counts.get('inserted', 0)} novos, {counts.get('updated', 0)} alterados, "
+        f"{counts.get('deleted', 0)} removidos, {counts.get('unchanged', 0)} inalterados."
+    )
+
+
+def _sum_delta_counts(parts: Iterable[dict[str, int]]) -> dict[str, int]:
+    total = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+    for counts in parts:
+        for key in total:
+            total[key] += counts.get(key, 0)
+    return total
+
 
 def _import_bras(
     *,
@@ -2078,13 +3118,17 @@ def _import_bras(
     uf_values: Sequence[str] | None = None,
     aliquota_default: Decimal | None = None,
     arquivo_label_override: str | None = None,
+    metrics: dict | None = None,
+    incremental: bool = False,
 ) -> dict:
     del data_ref
     arquivo_label_base = arquivo_label_override or map_config.get('arquivo') or versao or file_path.name
-    arquivo_label = arquivo_label_base
+    target_label = arquivo_label_base
     if uf_default:
-        arquivo_label = f"{arquivo_label}_{uf_default.upper()}"
+        target_label = f"{target_label}_{uf_default.upper()}"
 
+    incremental = bool(incremental or map_config.get('incremental')) and not truncate
+    arquivo_label = target_label + IMPORT_DELTA_LABEL_SUFFIX if incremental else target_label
     _delete_existing_bras_records(arquivo_label, truncate)
 
     inserted = 0
@@ -2099,6 +3143,8 @@ def _import_bras(
             encoding=encoding,
             arquivo_label=arquivo_label,
             use_load_data=not map_config.get('disable_load_data', False),
+            batch_size=_resolve_stage_batch_size(map_config),
+            metrics=metrics,
         )
     else:
         inserted, stage_strategy = _stage_bras_fixed(
@@ -2107,22 +3153,38 @@ def _import_bras(
             encoding=encoding,
             line_terminator=line_terminator,
             arquivo_label=arquivo_label,
+            metrics=metrics,
         )
 
     materialized = _materialize_bras_items(arquivo_label if not truncate else None)
+    delta = None
+    item_ids = None
+    if incremental:
+        config = _SUPPLIER_CONFIGS['BRASINDICE']
+        delta, item_ids = _apply_import_delta(
+            config,
+            arquivo_label=target_label,
+            staging_label=arquivo_label,
+            stage_tables=('bras_raw', 'bras_fixed_stage'),
+            metrics=metrics,
+        )
     _sync_bras_insumo_index(
-        arquivo_label if not truncate else None,
+        target_label if not truncate else None,
         uf_default=uf_default,
         uf_values=uf_values,
         aliquota_default=aliquota_default,
+        item_ids=item_ids,
     )
 
-    return {
-        'arquivo': arquivo_label,
+    result = {
+        'arquivo': target_label,
         'linhas_raw': inserted,
         'linhas_materializadas': materialized,
         'load_strategy': stage_strategy,
     }
+    if delta is not None:
+        result['delta'] = delta
+    return result
 
 
 def _import_simpro(
@@ -2137,15 +3199,20 @@ def _import_simpro(
     uf_values: Sequence[str] | None = None,
     aliquota_default: Decimal | None,
     arquivo_label_override: str | None = None,
+    metrics: dict | None = None,
+    workers: int | None = None,
+    incremental: bool = False,
 ) -> dict:
     if fmt != 'fixed':
         raise click.ClickException('Importação SIMPRO suporta apenas formato de largura fixa no momento.')
 
     arquivo_label_base = arquivo_label_override or map_config.get('arquivo') or versao or file_path.name
-    arquivo_label = arquivo_label_base
+    target_label = arquivo_label_base
     if uf_default:
-        arquivo_label = f"{arquivo_label}_{uf_default.upper()}"
+        target_label = f"{target_label}_{uf_default.upper()}"
 
+    incremental = bool(incremental or map_config.get('incremental')) and not truncate
+    arquivo_label = target_label + IMPORT_DELTA_LABEL_SUFFIX if incremental else target_label
     _delete_existing_simpro_records(arquivo_label, truncate)
 
     inserted, stage_strategy = _stage_simpro_fixed(
@@ -2153,6 +3220,7 @@ def _import_simpro(
         map_config=map_config,
         encoding=encoding,
         arquivo_label=arquivo_label,
+        metrics=metrics,
     )
 
     materialized = _materialize_simpro_items(
@@ -2160,21 +3228,112 @@ def _import_simpro(
         map_config=map_config,
         versao=versao,
         uf_default=uf_default,
+        workers=workers,
     )
 
+    delta = None
+    item_ids = None
+    if incremental:
+        config = _SUPPLIER_CONFIGS['SIMPRO']
+        delta, item_ids = _apply_import_delta(
+            config,
+            arquivo_label=target_label,
+            staging_label=arquivo_label,
+            stage_tables=('simpro_fixed_stage',),
+            metrics=metrics,
+        )
     _sync_simpro_insumo_index(
-        arquivo_label if not truncate else None,
+        target_label if not truncate else None,
         uf_default=uf_default,
         uf_values=uf_values,
         aliquota_default=aliquota_default,
+        item_ids=item_ids,
     )
 
-    return {
-        'arquivo': arquivo_label,
+    result = {
+        'arquivo': target_label,
         'linhas_raw': inserted,
         'linhas_materializadas': materialized,
         'load_strategy': stage_strategy,
     }
+    if delta is not None:
+        result['delta'] = delta
+    return result
+
+
+def _import_simpro_multi_uf(
+    *,
+    file_path: Path,
+    versao: str,
+    fmt: str,
+    map_config: dict,
+    encoding: str | None,
+    truncate: bool,
+    base_label: str,
+    target_ufs: Sequence[str | None],
+    aliquota_default: Decimal | None,
+    metrics: dict | None = None,
+    incremental: bool = False,
+) -> dict:
+    """Importa o arquivo SIMPRO uma única vez para todas as UFs selecionadas.
+
+    Stage, itens normalizados e ``insumos_index`` ficam numa única cópia; só os
+    campos que dependem da UF são distribuídos: ``uf_referencia``/``insumos_index_uf``
+    no índice e, na consolidação, a alíquota atribuída a cada UF.
+    """
+    ufs = [uf for uf in dict.fromkeys((uf or '').strip().upper() or None for uf in target_ufs) if uf]
+    # As cópias por UF de importações anteriores (<base>_<UF>) só são removidas depois que o
+    # lote do rótulo compartilhado é publicado (_purge_legacy_simpro_uf_labels).
+    result = _import_simpro(
+        file_path=file_path,
+        versao=versao,
+        fmt=fmt,
+        map_config=map_config,
+        encoding=encoding,
+        truncate=truncate,
+        uf_default=ufs[0] if len(ufs) == 1 else None,
+        uf_values=ufs,
+        aliquota_default=aliquota_default,
+        arquivo_label_override=base_label,
+        metrics=metrics,
+        incremental=incremental,
+    )
+    result['ufs'] = ufs
+    return result
+
+
+def _current_published_labels(fornecedor: str) -> set[str]:
+    """Rótulos dos lotes vigentes (última publicação de cada alíquota, como em vw_canon_*)."""
+    latest = (
+        db.session.query(Publicacao.aliquota_bp, func.max(Publicacao.publicado_em).label('publicado_em'))
+        .filter(Publicacao.fornecedor == fornecedor)
+        .group_by(Publicacao.aliquota_bp)
+        .subquery()
+    )
+    rows = (
+        db.session.query(Lote.arquivo_label)
+        .join(Publicacao, Publicacao.lote_id == Lote.id)
+        .join(
+            latest,
+            and_(latest.c.aliquota_bp == Publicacao.aliquota_bp, latest.c.publicado_em == Publicacao.publicado_em),
+        )
+        .filter(Publicacao.fornecedor == fornecedor)
+        .all()
+    )
+    return {row.arquivo_label for row in rows}
+
+
+def _purge_legacy_simpro_uf_labels(base_label: str, ufs: Sequence[str]) -> list[str]:
+    """Remove as cópias por UF (<base>_<UF>) de importações anteriores que nenhuma publicação vigente usa."""
+    vigentes = _current_published_labels('SIMPRO')
+    removed = []
+    for uf in ufs:
+        for legacy_label in (f"{base_label}_{uf}", f"{base_label}_{uf}{IMPORT_DELTA_LABEL_SUFFIX}"):
+            if legacy_label in vigentes:
+                continue
+            _delete_existing_simpro_records(legacy_label, False)
+            removed.append(legacy_label)
+    return removed
 
 
 DECIMAL_SANITIZE_RE = re.compile(r'[^0-9,\.-]')
@@ -2421,36 +3580,34 @@ def _discard_teto_preview(token: str) -> None:
 
 
 def _read_teto_rows_from_csv(file_path: Path) -> list[tuple[int, dict[str, object]]]:
-    encodings = DEFAULT_IMPORT_ENCODINGS + ['utf-8']
-    for enc in encodings:
-        try:
-            with file_path.open('r', encoding=enc, newline='') as handle:
-                first_line = handle.readline()
-                if not first_line:
-                    return []
-                delimiter = ';' if first_line.count(';') >= first_line.count(',') else ','
-                handle.seek(0)
-                reader = csv.reader(handle, delimiter=delimiter)
-                try:
-                    header = next(reader)
-                except StopIteration:
-                    return []
-                headers_norm = [_norm_header(h) for h in header]
-                rows: list[tuple[int, dict[str, object]]] = []
-                for row_idx, raw_row in enumerate(reader, start=2):
-                    values: dict[str, object] = {}
-                    for col_idx, key in enumerate(headers_norm):
-                        if not key:
-                            continue
-                        value = raw_row[col_idx] if col_idx < len(raw_row) else ''
-                        if isinstance(value, str):
-                            value = value.strip()
-                        values[key] = value
-                    rows.append((row_idx, values))
-                return rows
-        except UnicodeDecodeError:
-            continue
-    raise click.ClickException('Não foi possível decodificar o arquivo CSV (UTF-8/Latin-1).')
+    encoding = _detect_file_encoding(file_path)
+    try:
+        with file_path.open('r', encoding=encoding, newline='') as handle:
+            first_line = handle.readline()
+            if not first_line:
+                return []
+            delimiter = ';' if first_line.count(';') >= first_line.count(',') else ','
+            handle.seek(0)
+            reader = csv.reader(handle, delimiter=delimiter)
+            try:
+                header = next(reader)
+            except StopIteration:
+                return []
+            headers_norm = [_norm_header(h) for h in header]
+            rows: list[tuple[int, dict[str, object]]] = []
+            for row_idx, raw_row in enumerate(reader, start=2):
+                values: dict[str, object] = {}
+                for col_idx, key in enumerate(headers_norm):
+                    if not key:
+                        continue
+                    value = raw_row[col_idx] if col_idx < len(raw_row) else ''
+                    if isinstance(value, str):
+                        value = value.strip()
+                    values[key] = value
+                rows.append((row_idx, values))
+            return rows
+    except UnicodeDecodeError as exc:
+        raise click.ClickException('Não foi possível decodificar o arquivo CSV (UTF-8/Latin-1).') from exc
 
 
 def _read_teto_rows_from_xlsx(file_path: Path) -> list[tuple[int, dict[str, object]]]:
@@ -2557,6 +3714,17 @@ class SupplierConfig:
     hash_fields: Sequence[str]
     item_key_fields: Sequence[str]
 
+    @property
+    def delta_fields(self) -> tuple[str, ...]:
+        """Todas as colunas copiadas pelo delta; qualquer diferença marca o item como alterado."""
+        return tuple(
+            column.name
+            for column in self.model.__table__.columns
+            if column.name not in _DELTA_IGNORED_COLUMNS
+        )
+
+
+_DELTA_IGNORED_COLUMNS = frozenset({'id', 'arquivo', 'linha_num', 'imported_at'})
 
 _SUPPLIER_CONFIGS: dict[str, SupplierConfig] = {
     'BRASINDICE': SupplierConfig(
@@ -2660,6 +3828,17 @@ def _compute_file_hash(path: Path) -> str:
     return hasher.hexdigest()
 
 
+def _save_upload_with_hash(upload, destination: Path) -> str:
+    """Grava o upload em disco calculando o SHA-256 na mesma passada."""
+    hasher = hashlib.sha256()
+    upload.stream.seek(0)
+    with destination.open('wb') as handle:
+        for chunk in iter(lambda: upload.stream.read(65536), b''):
+            hasher.update(chunk)
+            handle.write(chunk)
+    return hasher.hexdigest()
+
+
 def _json_default(value):
     if isinstance(value, Decimal):
         return format(value, 'f')
@@ -2700,8 +3879,10 @@ def ingestir_arquivo(
     *,
     arquivo_path: Path | None = None,
     arquivo_bytes: bytes | None = None,
+    hash_arquivo: str | None = None,
     commit: bool = True,
     session=None,
+    metrics: dict | None = None,
 ) -> Lote:
     session = session or db.session
     config = _resolve_supplier_config(fornecedor, origem)
@@ -2712,32 +3893,14 @@ def ingestir_arquivo(
     if not arquivo_label:
         raise AliquotaIngestionError('arquivo_label é obrigatório para correlacionar os itens normalizados.')
 
-    rows = session.query(config.model).filter(config.model.arquivo == arquivo_label).all()
-    if not rows:
+    first_row = session.query(config.model.id).filter(config.model.arquivo == arquivo_label).first()
+    if first_row is None:
         raise AliquotaIngestionError(f'Nenhum item carregado encontrado para arquivo "{arquivo_label}".')
 
     if arquivo_bytes is not None:
         hash_arquivo = hashlib.sha256(arquivo_bytes).hexdigest()
     elif arquivo_path is not None:
         hash_arquivo = _compute_file_hash(arquivo_path)
-    else:
-        hash_arquivo = None
-
-    aggregator = hashlib.sha256()
-    line_entries: list[tuple[str, str, str]] = []
-    for row in rows:
-        payload = _serialize_row(row, config.hash_fields)
-        payload['linha_num'] = getattr(row, 'linha_num', None)
-        payload['arquivo'] = getattr(row, 'arquivo', None)
-        item_key = _build_item_key(row, config.item_key_fields)
-        payload_json = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=_json_default)
-        line_hash = hashlib.sha256(payload_json.encode('utf-8')).hexdigest()
-        aggregator.update(item_key.encode('utf-8'))
-        aggregator.update(line_hash.encode('utf-8'))
-        line_entries.append((item_key, line_hash, payload_json))
-
-    if hash_arquivo is None:
-        hash_arquivo = aggregator.hexdigest()
 
     fornecedor_norm = _normalize_fornecedor(fornecedor)
     lote = (
@@ -2764,13 +3927,32 @@ def ingestir_arquivo(
     else:
         lote.arquivo_label = arquivo_label
 
-    lote.hash_arquivo = hash_arquivo
-    lote.total_itens = len(line_entries)
+    # As linhas são lidas só com as colunas do hash, em ordem de id, e seguem direto para o upsert.
+    aggregator = hashlib.sha256()
+    total_itens = 0
+    fields = list(dict.fromkeys([*config.item_key_fields, *config.hash_fields]))
+
+    def _line_entries() -> Iterator[tuple[str, str, str]]:
+        nonlocal total_itens
+        for row in _iter_label_rows(config.model.__table__, arquivo_label, fields, session=session):
+            payload = _serialize_row(row, config.hash_fields)
+            payload['linha_num'] = row.linha_num
+            payload['arquivo'] = arquivo_label
+            item_key = _build_item_key(row, config.item_key_fields)
+            payload_json = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=_json_default)
+            line_hash = hashlib.sha256(payload_json.encode('utf-8')).hexdigest()
+            aggregator.update(item_key.encode('utf-8'))
+            aggregator.update(line_hash.encode('utf-8'))
+            total_itens += 1
+            yield item_key, line_hash, payload_json
+
+    _upsert_linha_hashes(lote, _line_entries(), session=session, metrics=metrics)
+
+    lote.hash_arquivo = hash_arquivo if hash_arquivo is not None else aggregator.hexdigest()
+    lote.total_itens = total_itens
     lote.status = LoteStatus.VALIDADO
     lote.validado_em = datetime.utcnow()
 
-    _upsert_linha_hashes(lote, line_entries, session=session)
-
     if commit:
         session.commit()
     else:
@@ -2782,38 +3964,125 @@ def ingestir_arquivo(
         aliquota_bp_norm,
         periodo_norm,
         sequencia_norm,
-        len(line_entries),
+        total_itens,
     )
     return lote
 
 
-def _upsert_linha_hashes(lote: Lote, entries: Sequence[tuple[str, str, str]], *, session=None) -> None:
+_LINHA_HASH_TMP_TABLE = 'tmp_linha_hash'
+LINHA_HASH_BATCH_SIZE = 5000
+
+
+def _linha_hash_upsert_sql(dialect_name: str) -> dict[str, str]:
+    tmp = _LINHA_HASH_TMP_TABLE
+    if dialect_name == 'mysql':
+        return {
+            'create': (
+                f"CREATE TEMPORARY TABLE {tmp} ("
+                "item_chave VARCHAR(255) NOT NULL PRIMARY KEY, "
+                "hash_linha VARCHAR(128) NOT NULL, "
+                "payload_snapshot LONGTEXT NULL)"
+            ),
+            'drop': f"DROP TEMPORARY TABLE IF EXISTS {tmp}",
+            'load': (
+                f"INSERT INTO {tmp} (item_chave, hash_linha, payload_snapshot) "
+                "VALUES (:item_chave, :hash_linha, :payload_snapshot) "
+                "ON DUPLICATE KEY UPDATE hash_linha = VALUES(hash_linha), payload_snapshot = VALUES(payload_snapshot)"
+            ),
+            'upsert': (
+                "INSERT INTO linha_hash (lote_id, item_chave, hash_linha, payload_snapshot) "
+                f"SELECT :lote_id, t.item_chave, t.hash_linha, t.payload_snapshot FROM {tmp} t "
+                "ON DUPLICATE KEY UPDATE "
+                "updated_at = IF(linha_hash.hash_linha = VALUES(hash_linha), linha_hash.updated_at, CURRENT_TIMESTAMP), "
+                "hash_linha = VALUES(hash_linha), "
+                "payload_snapshot = VALUES(payload_snapshot)"
+            ),
+        }
+    # PostgreSQL e SQLite: ON CONFLICT; o WHERE no SELECT evita a ambiguidade do parser do SQLite.
+    return {
+        'create': (
+            f"CREATE TEMPORARY TABLE {tmp} ("
+            "item_chave VARCHAR(255) NOT NULL PRIMARY KEY, "
+            "hash_linha VARCHAR(128) NOT NULL, "
+            "payload_snapshot TEXT NULL)"
+        ),
+        'drop': f"DROP TABLE IF EXISTS {tmp}",
+        'load': (
+            f"INSERT INTO {tmp} (item_chave, hash_linha, payload_snapshot) "
+            "VALUES (:item_chave, :hash_linha, :payload_snapshot) "
+            "ON CONFLICT (item_chave) DO UPDATE SET "
+            "hash_linha = excluded.hash_linha, payload_snapshot = excluded.payload_snapshot"
+        ),
+        'upsert': (
+            "INSERT INTO linha_hash (lote_id, item_chave, hash_linha, payload_snapshot) "
+            f"SELECT :lote_id, t.item_chave, t.hash_linha, t.payload_snapshot FROM {tmp} t WHERE 1 = 1 "
+            "ON CONFLICT (lote_id, item_chave) DO UPDATE SET "
+            "hash_linha = excluded.hash_linha, "
+            "payload_snapshot = excluded.payload_snapshot, "
+            "updated_at = CURRENT_TIMESTAMP "
+            "WHERE linha_hash.hash_linha <> excluded.hash_linha"
+        ),
+    }
+
+
+def _upsert_linha_hashes(
+    lote: Lote,
+    entries: Iterable[tuple[str, str, str]],
+    *,
+    session=None,
+    metrics: dict | None = None,
+) -> int:
+    """Sincroniza ``linha_hash`` do lote com ``entries`` via tabela temporária.
+
+    As entradas são carregadas em lotes de ``LINHA_HASH_BATCH_SIZE``; inclusão,
+    atualização e remoção rodam como um comando SQL cada. Retorna o total de
+    itens distintos recebidos.
+    """
     session = session or db.session
     if lote.id is None:
         session.flush()
-    existing = {
-        row.item_chave: row for row in session.query(LinhaHash).filter_by(lote_id=lote.id).all()
-    }
-    new_keys = set()
-    for item_key, line_hash, payload_json in entries:
-        new_keys.add(item_key)
-        row = existing.get(item_key)
-        if row:
-            if row.hash_linha != line_hash or row.payload_snapshot != payload_json:
-                row.hash_linha = line_hash
-                row.payload_snapshot = payload_json
-        else:
-            session.add(
-                LinhaHash(
-                    lote_id=lote.id,
-                    item_chave=item_key,
-                    hash_linha=line_hash,
-                    payload_snapshot=payload_json,
-                )
-            )
-    for key, row in existing.items():
-        if key not in new_keys:
-            session.delete(row)
+    started = time.perf_counter()
+    statements = _linha_hash_upsert_sql(session.get_bind().dialect.name)
+    load_stmt = text(statements['load'])
+
+    session.flush()
+    session.execute(text(statements['drop']))
+    session.execute(text(statements['create']))
+    try:
+        iterator = iter(entries)
+        while True:
+            batch = [
+                {'item_chave': item_key, 'hash_linha': line_hash, 'payload_snapshot': payload_json}
+                for item_key, line_hash, payload_json in islice(iterator, LINHA_HASH_BATCH_SIZE)
+            ]
+            if not batch:
+                break
+            session.execute(load_stmt, batch)
+        load_seconds = time.perf_counter() - started
+
+        total = session.execute(text(f"SELECT COUNT(*) FROM {_LINHA_HASH_TMP_TABLE}")).scalar() or 0
+        upserted = session.execute(text(statements['upsert']), {'lote_id': lote.id}).rowcount
+        deleted = session.execute(
+            text(
+                "DELETE FROM linha_hash WHERE lote_id = :lote_id AND NOT EXISTS ("
+                f"SELECT 1 FROM {_LINHA_HASH_TMP_TABLE} t WHERE t.item_chave = linha_hash.item_chave)"
+            ),
+            {'lote_id': lote.id},
+        ).rowcount
+    finally:
+        session.execute(text(statements['drop']))
+    # Os objetos LinhaHash eventualmente carregados na sessão ficaram desatualizados.
+    session.expire_all()
+
+    if metrics is not None:
+        metrics.setdefault('linha_hash', {})[lote.arquivo_label] = {
+            'itens': total,
+            'upsert_rowcount': upserted,
+            'removidos': deleted,
+            'load_seconds': round(load_seconds, 4),
+            'seconds': round(time.perf_counter() - started, 4),
+        }
+    return total
 
 
 def publicar_lote(
@@ -2824,6 +4093,7 @@ def publicar_lote(
     *,
     session=None,
     commit: bool = True,
+    refresh: bool = True,
 ) -> Publicacao:
     session = session or db.session
     fornecedor_norm = _normalize_fornecedor(fornecedor)
@@ -2874,16 +4144,314 @@ def publicar_lote(
         etag_versao=etag,
     )
     session.add(publication)
+    _bump_catalogo_versao(fornecedor_norm, etag, session=session)
+    if refresh:
+        _refresh_catalog_after_commit(fornecedor_norm, session=session)
 
     if commit:
         session.commit()
     else:
         session.flush()
-
-    _refresh_materialized_catalogs(fornecedor_norm)
     return publication
 
 
+def _bump_catalogo_versao(fornecedor: str, etag: str | None = None, *, session=None) -> CatalogoVersao:
+    """Marca o catálogo do fornecedor como desatualizado (nova versão publicada)."""
+    session = session or db.session
+    if session.get(CatalogoVersao, fornecedor) is None:
+        # Cria a linha antes do FOR UPDATE (que não trava linha inexistente); a corrida com
+        # outra transação termina na chave primária e a linha dela é usada.
+        # INSERT direto (não session.add): não depende de um flush posterior.
+        try:
+            with session.begin_nested():
+                session.execute(
+                    CatalogoVersao.__table__.insert().values(
+                        fornecedor=fornecedor, versao_publicada=0, versao_materializada=0
+                    )
+                )
+        except IntegrityError:
+            pass
+    versao = session.get(CatalogoVersao, fornecedor, with_for_update=True)
+    versao.versao_publicada = (versao.versao_publicada or 0) + 1
+    if etag:
+        versao.etag_publicado = etag
+    versao.publicado_em = datetime.utcnow()
+    return versao
+
+
+def _mark_catalogs_stale(fornecedores: Sequence[str], *, session=None) -> None:
+    """Registra nova versão (ex.: alíquota por UF alterada) e agenda a reconstrução."""
+    session = session or db.session
+    for fornecedor in fornecedores:
+        _bump_catalogo_versao(fornecedor, session=session)
+        _refresh_catalog_after_commit(fornecedor, session=session)
+    session.commit()
+
+
+def _refresh_catalog_if_stale(fornecedor: str, *, force: bool = False) -> bool:
+    """Reconstrói o catálogo quando a versão publicada difere da materializada.
+
+    A versão lida antes da reconstrução é a registrada como materializada; se
+    outra publicação ocorrer no meio, o catálogo continua marcado como
+    desatualizado e é reconstruído de novo.
+    """
+    rebuilt = False
+    while True:
+        with Session(db.engine) as session:
+            versao = session.get(CatalogoVersao, fornecedor)
+            alvo = versao.versao_publicada if versao is not None else 0
+            etag = versao.etag_publicado if versao is not None else None
+            if not force and (versao is None or versao.versao_materializada == alvo):
+                return rebuilt
+        _refresh_materialized_catalogs(fornecedor)
+        rebuilt = True
+        force = False
+        with Session(db.engine) as session:
+            versao = session.get(CatalogoVersao, fornecedor, with_for_update=True)
+            if versao is None:
+                versao = CatalogoVersao(fornecedor=fornecedor, versao_publicada=alvo, versao_materializada=0)
+                session.add(versao)
+            if (versao.versao_materializada or 0) < alvo:
+                versao.versao_materializada = alvo
+                versao.etag_materializado = etag
+            versao.materializado_em = datetime.utcnow()
+            session.commit()
+
+
+_catalog_refresh_pending: set[str] = set()
+_catalog_refresh_lock = threading.Lock()
+_CATALOG_REFRESH_SESSION_KEY = 'catalog_refresh_pending'
+
+
+def _refresh_catalog_after_commit(fornecedor: str, *, session=None) -> None:
+    """Agenda a reconstrução para depois do commit da sessão (a versão nova precisa estar visível)."""
+    session = session or db.session
+    session.info.setdefault(_CATALOG_REFRESH_SESSION_KEY, set()).add(fornecedor)
+
+
+@event.listens_for(Session, 'after_commit')
+def _run_catalog_refresh_after_commit(session) -> None:
+    for fornecedor in sorted(session.info.pop(_CATALOG_REFRESH_SESSION_KEY, None) or ()):
+        _schedule_catalog_refresh(fornecedor)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_catalog_refresh_on_rollback(session) -> None:
+    session.info.pop(_CATALOG_REFRESH_SESSION_KEY, None)
+
+
+def _schedule_catalog_refresh(fornecedor: str) -> None:
+    """Reconstrói o catálogo numa thread; pedidos repetidos se agrupam.
+
+    Dentro de uma requisição a thread segue em segundo plano. Fora dela (CLI,
+    job de importação) ou com ``CATALOG_REFRESH_BACKGROUND_DISABLE`` a chamada
+    espera a thread terminar, para o processo não encerrar no meio da reconstrução.
+    """
+    disable_env = (os.getenv('CATALOG_REFRESH_BACKGROUND_DISABLE') or '').strip().lower()
+    background = has_request_context() and disable_env not in {'1', 'true', 'yes', 'on'}
+
+    with _catalog_refresh_lock:
+        if background and fornecedor in _catalog_refresh_pending:
+            return
+        _catalog_refresh_pending.add(fornecedor)
+
+    def _runner():
+        # Libera o agendamento antes de ler a versão: uma publicação posterior
+        # agenda outra reconstrução em vez de se perder.
+        with _catalog_refresh_lock:
+            _catalog_refresh_pending.discard(fornecedor)
+        try:
+            with app.app_context():
+                try:
+                    _refresh_catalog_if_stale(fornecedor)
+                finally:
+                    db.session.remove()
+        except Exception as exc:  # noqa: BLE001
+            app.logger.exception('Falha na reconstrução assíncrona do catálogo %s', fornecedor, exc_info=exc)
+
+    # A thread usa sessão própria, então pode ser aguardada mesmo de dentro do after_commit.
+    thread = threading.Thread(target=_runner, name=f'CatalogRefresh-{fornecedor}', daemon=background)
+    thread.start()
+    if not background:
+        thread.join()
+
+
+_MYSQL_CATALOG_LATEST_PUBLICATION = """
+FROM uf_aliquota ua
+JOIN publicacao p ON p.aliquota_bp = ua.aliquota_bp AND p.fornecedor = :fornecedor
+JOIN (
+    SELECT aliquota_bp, MAX(publicado_em) AS publicado_em
+      FROM publicacao
+     WHERE fornecedor = :fornecedor
+     GROUP BY aliquota_bp
+) ult ON ult.aliquota_bp = p.aliquota_bp AND ult.publicado_em = p.publicado_em
+JOIN lote l ON l.id = p.lote_id
+"""
+
+_MYSQL_CATALOG_TABLES: dict[str, dict[str, str]] = {
+    'BRASINDICE': {
+        'table': 'mv_catalogo_vigente_brasindice',
+        'ddl': """
+            uf CHAR(2) NOT NULL,
+            aliquota_bp INT NOT NULL,
+            valid_from DATE NULL,
+            valid_to DATE NULL,
+            periodo CHAR(6) NULL,
+            sequencia SMALLINT NULL,
+            etag_versao VARCHAR(128) NULL,
+            item_id BIGINT NOT NULL,
+            produto_codigo VARCHAR(50) NULL,
+            apresentacao_codigo VARCHAR(50) NULL,
+            produto_nome VARCHAR(255) NULL,
+            apresentacao_descricao VARCHAR(255) NULL,
+            ean VARCHAR(20) NULL,
+            registro_anvisa VARCHAR(50) NULL,
+            preco_pmc_unit DECIMAL(15,4) NULL,
+            preco_pfb_unit DECIMAL(15,4) NULL,
+            preco_pmc_pacote DECIMAL(15,4) NULL,
+            preco_pfb_pacote DECIMAL(15,4) NULL,
+            laboratorio_nome VARCHAR(255) NULL,
+            edicao VARCHAR(50) NULL,
+            imported_at DATETIME NULL,
+            etag_catalogo VARCHAR(255) NULL,
+            descricao_norm VARCHAR(500) NULL,
+            fabricante_norm VARCHAR(255) NULL,
+            KEY idx_mv_bras_uf_item (uf, item_id),
+            KEY idx_mv_bras_nome (produto_nome, item_id),
+            KEY idx_mv_bras_uf_nome (uf, produto_nome, item_id),
+            KEY idx_mv_bras_produto (produto_codigo),
+            KEY idx_mv_bras_apresentacao (apresentacao_codigo),
+            KEY idx_mv_bras_anvisa (registro_anvisa),
+            KEY idx_mv_bras_aliquota (aliquota_bp),
+            KEY idx_mv_bras_periodo (periodo),
+            KEY idx_mv_bras_descricao_norm (descricao_norm),
+            KEY idx_mv_bras_fabricante_norm (fabricante_norm),
+            FULLTEXT KEY ft_mv_catalogo_vigente_brasindice (produto_nome, apresentacao_descricao, ean, registro_anvisa) WITH PARSER ngram
+        """,
+        'columns': (
+            'uf, aliquota_bp, valid_from, valid_to, periodo, sequencia, etag_versao, item_id, '
+            'produto_codigo, apresentacao_codigo, produto_nome, apresentacao_descricao, ean, registro_anvisa, '
+            'preco_pmc_unit, preco_pfb_unit, preco_pmc_pacote, preco_pfb_pacote, laboratorio_nome, edicao, '
+            'imported_at, etag_catalogo, descricao_norm, fabricante_norm'
+        ),
+        'select': """
+            SELECT ua.uf, p.aliquota_bp, ua.valid_from, ua.valid_to, p.periodo, p.sequencia, p.etag_versao, b.id,
+                   b.produto_codigo, b.apresentacao_codigo, b.produto_nome, b.apresentacao_descricao, b.ean,
+                   b.registro_anvisa, b.preco_pmc_unit, b.preco_pfb_unit, b.preco_pmc_pacote, b.preco_pfb_pacote,
+                   b.laboratorio_nome, b.edicao, b.imported_at,
+                   CONCAT(:fornecedor, ':', ua.uf, ':', p.etag_versao),
+                   """ + _sql_search_norm("CONCAT_WS(' ', b.produto_nome, b.apresentacao_descricao)") + """,
+                   """ + _sql_search_norm('b.laboratorio_nome') + """
+        """ + _MYSQL_CATALOG_LATEST_PUBLICATION + """
+            JOIN bras_item_n b ON b.arquivo COLLATE utf8mb4_unicode_ci = l.arquivo_label
+            WHERE ua.is_current = 1
+        """,
+    },
+    'SIMPRO': {
+        'table': 'mv_catalogo_vigente_simpro',
+        'ddl': """
+            uf CHAR(2) NOT NULL,
+            aliquota_bp INT NOT NULL,
+            valid_from DATE NULL,
+            valid_to DATE NULL,
+            periodo CHAR(6) NULL,
+            sequencia SMALLINT NULL,
+            etag_versao VARCHAR(128) NULL,
+            item_id BIGINT NOT NULL,
+            codigo VARCHAR(20) NULL,
+            codigo_alt VARCHAR(20) NULL,
+            descricao VARCHAR(255) NULL,
+            data_ref DATE NULL,
+            preco1 DECIMAL(15,4) NULL,
+            preco2 DECIMAL(15,4) NULL,
+            preco3 DECIMAL(15,4) NULL,
+            preco4 DECIMAL(15,4) NULL,
+            qtd_unidade INT NULL,
+            fabricante VARCHAR(80) NULL,
+            anvisa VARCHAR(20) NULL,
+            validade_anvisa DATE NULL,
+            ean VARCHAR(32) NULL,
+            situacao VARCHAR(40) NULL,
+            imported_at DATETIME NULL,
+            etag_catalogo VARCHAR(255) NULL,
+            descricao_norm VARCHAR(255) NULL,
+            fabricante_norm VARCHAR(80) NULL,
+            KEY idx_mv_simpro_uf_item (uf, item_id),
+            KEY idx_mv_simpro_desc (descricao, item_id),
+            KEY idx_mv_simpro_uf_desc (uf, descricao, item_id),
+            KEY idx_mv_simpro_codigo (codigo),
+            KEY idx_mv_simpro_codigo_alt (codigo_alt),
+            KEY idx_mv_simpro_anvisa (anvisa),
+            KEY idx_mv_simpro_aliquota (aliquota_bp),
+            KEY idx_mv_simpro_periodo (periodo),
+            KEY idx_mv_simpro_descricao_norm (descricao_norm),
+            KEY idx_mv_simpro_fabricante_norm (fabricante_norm),
+            FULLTEXT KEY ft_mv_catalogo_vigente_simpro (descricao, codigo, ean) WITH PARSER ngram
+        """,
+        'columns': (
+            'uf, aliquota_bp, valid_from, valid_to, periodo, sequencia, etag_versao, item_id, '
+            'codigo, codigo_alt, descricao, data_ref, preco1, preco2, preco3, preco4, qtd_unidade, '
+            'fabricante, anvisa, validade_anvisa, ean, situacao, imported_at, etag_catalogo, '
+            'descricao_norm, fabricante_norm'
+        ),
+        'select': """
+            SELECT ua.uf, p.aliquota_bp, ua.valid_from, ua.valid_to, p.periodo, p.sequencia, p.etag_versao, s.id,
+                   s.codigo, s.codigo_alt, s.descricao, s.data_ref, s.preco1, s.preco2, s.preco3, s.preco4,
+                   s.qtd_unidade, s.fabricante, s.anvisa, s.validade_anvisa, s.ean, s.situacao, s.imported_at,
+                   CONCAT(:fornecedor, ':', ua.uf, ':', p.etag_versao),
+                   """ + _sql_search_norm('s.descricao') + """,
+                   """ + _sql_search_norm('s.fabricante') + """
+        """ + _MYSQL_CATALOG_LATEST_PUBLICATION + """
+            JOIN simpro_item_norm s ON s.arquivo COLLATE utf8mb4_unicode_ci = l.arquivo_label
+            WHERE ua.is_current = 1
+        """,
+    },
+}
+
+
+def _rebuild_mysql_catalog_table(fornecedor: str) -> int:
+    """Reconstrói o catálogo vigente numa tabela sombra e troca com ``RENAME TABLE`` atômico."""
+    spec = _MYSQL_CATALOG_TABLES[fornecedor]
+    target = spec['table']
+    shadow = f'{target}__shadow'
+    previous = f'{target}__old'
+    with db.engine.connect() as conn:
+        if not conn.execute(text('SELECT GET_LOCK(:name, 60)'), {'name': shadow}).scalar():
+            raise RuntimeError(f'Outro processo está reconstruindo {target}.')
+        try:
+            conn.execute(text(f'DROP TABLE IF EXISTS {shadow}, {previous}'))
+            conn.execute(text(
+                f"CREATE TABLE {shadow} ({spec['ddl']}) "
+                'ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci'
+            ))
+            inserted = conn.execute(
+                text(f"INSERT INTO {shadow} ({spec['columns']}) {spec['select']}"),
+                {'fornecedor': fornecedor},
+            ).rowcount
+            conn.commit()
+
+            table_type = conn.execute(
+                text(
+                    'SELECT TABLE_TYPE FROM information_schema.TABLES '
+                    'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :name'
+                ),
+                {'name': target},
+            ).scalar()
+            if table_type == 'VIEW':
+                # Conversão única da view antiga (sql/aliquota_catalog_mysql.sql) para tabela.
+                conn.execute(text(f'DROP VIEW {target}'))
+                conn.execute(text(f'RENAME TABLE {shadow} TO {target}'))
+            elif table_type:
+                conn.execute(text(f'RENAME TABLE {target} TO {previous}, {shadow} TO {target}'))
+                conn.execute(text(f'DROP TABLE {previous}'))
+            else:
+                conn.execute(text(f'RENAME TABLE {shadow} TO {target}'))
+            conn.commit()
+        finally:
+            conn.execute(text('SELECT RELEASE_LOCK(:name)'), {'name': shadow})
+    return inserted or 0
+
+
 def _refresh_materialized_catalogs(fornecedor: str) -> None:
     bind = db.session.get_bind()
     dialect = getattr(bind, 'dialect', None) if bind is not None else None
@@ -2897,6 +4465,19 @@ def _refresh_materialized_catalogs(fornecedor: str) -> None:
     if not targets:
         return
 
+    if dialect_name == 'mysql':
+        started = time.perf_counter()
+        try:
+            total = _rebuild_mysql_catalog_table(fornecedor)
+        except Exception as exc:  # noqa: BLE001
+            app.logger.warning('Falha ao reconstruir catálogo %s (%s).', fornecedor, exc)
+            return
+        _clear_search_cache()
+        app.logger.info(
+            'Catálogo %s reconstruído (%s linhas em %.2fs).', fornecedor, total, time.perf_counter() - started
+        )
+        return
+
     if dialect_name != 'postgresql':
         app.logger.debug(
             'Ignorando refresh de materialized view para %s (dialeto=%s).',
@@ -2906,13 +4487,28 @@ def _refresh_materialized_catalogs(fornecedor: str) -> None:
         return
 
     for view_name in targets:
-        try:
-            db.session.execute(text(f'REFRESH MATERIALIZED VIEW IF EXISTS {view_name}'))
-            db.session.commit()
+        populated = db.session.execute(
+            text('SELECT ispopulated FROM pg_matviews WHERE matviewname = :name'), {'name': view_name}
+        ).scalar()
+        if populated is None:
+            app.logger.debug('Materialized view %s inexistente; refresh ignorado.', view_name)
+            continue
+        # CONCURRENTLY mantém a view legível durante o refresh; exige índice único e
+        # uma primeira carga normal (views criadas WITH NO DATA).
+        statements = [f'REFRESH MATERIALIZED VIEW {view_name}']
+        if populated:
+            statements.insert(0, f'REFRESH MATERIALIZED VIEW CONCURRENTLY {view_name}')
+        for statement in statements:
+            try:
+                db.session.execute(text(statement))
+                db.session.commit()
+            except Exception as exc:  # noqa: BLE001
+                db.session.rollback()
+                app.logger.warning('Falha ao atualizar view %s (%s).', view_name, exc)
+                continue
+            _clear_search_cache()
             app.logger.info('Materialized view %s atualizada.', view_name)
-        except Exception as exc:  # noqa: BLE001
-            db.session.rollback()
-            app.logger.warning('Falha ao atualizar view %s (%s).', view_name, exc)
+            break
 
 
 def _normalize_periodo_from_label(label: str | None) -> str | None:
@@ -2951,19 +4547,83 @@ def _assign_uf_aliquota(ufs: Sequence[str], aliquota_bp: int) -> None:
     db.session.commit()
 
 
-def _post_catalog_ingest(*, origem: str, arquivo_label: str, versao: str, sequencia_input: str | None, aliquota_value: Decimal | None, uf_values: Sequence[str]) -> None:
+def _catalog_periodo_for_versao(versao: str | None) -> str:
+    return _normalize_periodo_from_label(versao) or datetime.utcnow().strftime('%Y%m')
+
+
+def _import_target_labels(origem: str, base_label: str, *, uf_default: str | None, uf_values: Sequence[str] | None) -> list[str]:
+    if origem == 'BRAS':
+        return [f"{base_label}_{uf_default.upper()}" if uf_default else base_label]
+    target_ufs = [*(uf_values or []), *([uf_default] if uf_default else [])]
+    ufs = [uf for uf in dict.fromkeys((uf or '').strip().upper() for uf in target_ufs) if uf]
+    # Várias UFs compartilham uma única cópia normalizada no rótulo base.
+    return [f"{base_label}_{ufs[0]}" if len(ufs) == 1 else base_label]
+
+
+def _find_unchanged_import(
+    origem: str,
+    hash_arquivo: str,
+    *,
+    versao: str | None,
+    aliquota_value: Decimal | None,
+    arquivo_labels: Sequence[str],
+) -> Lote | None:
+    """Lote publicado mais recente com o mesmo hash de arquivo, se os rótulos ainda estiverem carregados."""
+    if not hash_arquivo or aliquota_value is None:
+        return None
+    config = _SUPPLIER_CONFIGS['BRASINDICE' if origem == 'BRAS' else 'SIMPRO']
+    try:
+        aliquota_bp = _normalize_aliquota_bp(aliquota_value)
+    except AliquotaIngestionError:
+        return None
+    lote = (
+        Lote.query
+        .filter_by(
+            fornecedor=config.fornecedor_key,
+            periodo=_catalog_periodo_for_versao(versao),
+            aliquota_bp=aliquota_bp,
+            status=LoteStatus.PUBLICADO,
+        )
+        .order_by(Lote.publicado_em.desc(), Lote.sequencia.desc())
+        .first()
+    )
+    if lote is None or lote.hash_arquivo != hash_arquivo or lote.arquivo_label not in arquivo_labels:
+        return None
+    for label in arquivo_labels:
+        if db.session.query(config.model.id).filter(config.model.arquivo == label).first() is None:
+            return None
+    return lote
+
+
+def _unchanged_import_message(lote: Lote) -> str:
+    return (
+        f'Nenhuma alteração: arquivo idêntico ao lote {lote.id} já publicado '
+        f'({lote.fornecedor} {lote.periodo}, sequência {lote.sequencia}).'
+    )
+
+
+def _post_catalog_ingest(
+    *,
+    origem: str,
+    arquivo_label: str,
+    versao: str,
+    sequencia_input: str | None,
+    aliquota_value: Decimal | None,
+    uf_values: Sequence[str],
+    hash_arquivo: str | None = None,
+    metrics: dict | None = None,
+) -> Publicacao | None:
+    """Gera e publica o lote do arquivo importado; devolve a publicação (None quando não publicou)."""
     if aliquota_value is None:
-        return
+        return None
     fornecedor = 'BRASINDICE' if origem == 'BRAS' else 'SIMPRO'
     try:
         aliquota_bp = _normalize_aliquota_bp(aliquota_value)
     except AliquotaIngestionError as exc:
         _safe_flash(f'Falha ao validar alíquota: {exc}', 'warning')
-        return
+        return None
 
-    periodo_norm = _normalize_periodo_from_label(versao)
-    if not periodo_norm:
-        periodo_norm = datetime.utcnow().strftime('%Y%m')
+    periodo_norm = _catalog_periodo_for_versao(versao)
 
     try:
         sequencia_norm = _normalize_sequencia(sequencia_input or 1)
@@ -2979,21 +4639,125 @@ def _post_catalog_ingest(*, origem: str, arquivo_label: str, versao: str, sequen
             periodo=periodo_norm,
             sequencia=sequencia_norm,
             arquivo_label=arquivo_label,
+            hash_arquivo=hash_arquivo,
+            metrics=metrics,
         )
-        publicar_lote(
+        publicacao = publicar_lote(
             fornecedor=fornecedor,
             aliquota_bp=aliquota_bp,
             periodo=periodo_norm,
             sequencia=sequencia_norm,
+            refresh=not uf_values,
         )
         if uf_values:
             _assign_uf_aliquota(uf_values, aliquota_bp)
+            _mark_catalogs_stale([fornecedor])
         app.logger.info('Lote %s consolidado para %s/%s (seq %s)', lote.id, fornecedor, periodo_norm, sequencia_norm)
+        return publicacao
     except AliquotaIngestionError as exc:
         _safe_flash(f'Falha ao consolidar o catálogo por alíquota: {exc}', 'warning')
     except Exception as exc:  # noqa: BLE001
         app.logger.exception('Falha ao consolidar catálogo por alíquota', exc_info=exc)
         _safe_flash('Falha ao consolidar catálogo por alíquota. Verifique os logs.', 'warning')
+    return None
+
+
+_FULLTEXT_COLUMNS: dict[str, tuple[str, ...]] = {
+    'insumos_index': ('descricao', 'fabricante', 'tuss', 'tiss', 'anvisa'),
+    'mv_catalogo_vigente_brasindice': ('produto_nome', 'apresentacao_descricao', 'ean', 'registro_anvisa'),
+    'mv_catalogo_vigente_simpro': ('descricao', 'codigo', 'ean'),
+}
+# Menor token servido pelo índice: ngram do MySQL (ngram_token_size=2) e trigram do FTS5.
+_FULLTEXT_MIN_TOKEN = {'mysql': 2, 'sqlite': 3}
+
+
+def _sqlite_fts_ddl(table_name: str, columns: Sequence[str]) -> list[str]:
+    fts = f'{table_name}_fts'
+    cols = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table_name}', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table_name} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.rowid, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table_name} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.rowid, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table_name} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.rowid, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.rowid, {new_values}); END",
+    ]
+
+
+def _mysql_fulltext_ddl(table_name: str, columns: Sequence[str]) -> str:
+    return f"ALTER TABLE {table_name} ADD FULLTEXT INDEX ft_{table_name} ({', '.join(columns)}) WITH PARSER ngram"
+
+
+for _ft_model in (InsumoIndex, CatalogoBrasindice, CatalogoSimpro):
+    _ft_table = _ft_model.__table__
+    _ft_columns = _FULLTEXT_COLUMNS[_ft_table.name]
+    for _ft_statement in _sqlite_fts_ddl(_ft_table.name, _ft_columns):
+        event.listen(_ft_table, 'after_create', DDL(_ft_statement).execute_if(dialect='sqlite'))
+    event.listen(_ft_table, 'before_drop', DDL(f'DROP TABLE IF EXISTS {_ft_table.name}_fts').execute_if(dialect='sqlite'))
+    event.listen(
+        _ft_table, 'after_create', DDL(_mysql_fulltext_ddl(_ft_table.name, _ft_columns)).execute_if(dialect='mysql')
+    )
+
+
+def _ensure_sqlite_fulltext() -> None:
+    """Cria (e popula) as tabelas FTS5 em bases SQLite anteriores ao índice full-text."""
+    if db.engine.dialect.name != 'sqlite':
+        return
+    for table_name, columns in _FULLTEXT_COLUMNS.items():
+        exists = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': f'{table_name}_fts'}
+        ).first()
+        if exists:
+            continue
+        for statement in _sqlite_fts_ddl(table_name, columns):
+            db.session.execute(text(statement))
+        db.session.execute(text(f"INSERT INTO {table_name}_fts({table_name}_fts) VALUES ('rebuild')"))
+    db.session.commit()
+
+
+def _apply_fulltext_tokens(query, model, tokens: Sequence[str], like_columns: Sequence) -> object:
+    """Filtra ``query`` pelos tokens usando o índice full-text do dialeto, ordenando por relevância.
+
+    Tokens curtos demais para o índice (ou dialetos sem backend) continuam no
+    ``LIKE`` sobre ``like_columns`` (colunas ``*_norm``/códigos, sem função por linha).
+    """
+    dialect_name = db.engine.dialect.name
+    table_name = model.__tablename__
+    min_chars = _FULLTEXT_MIN_TOKEN.get(dialect_name)
+    indexed = [token for token in tokens if min_chars and len(token) >= min_chars]
+    for token in tokens:
+        if token in indexed:
+            continue
+        normalized = _normalize_search_text(token)
+        if not normalized:
+            continue
+        pattern = f"%{normalized}%"
+        query = query.filter(or_(*(column.like(pattern) for column in like_columns)))
+    if not indexed:
+        return query
+
+    columns = [model.__table__.c[name] for name in _FULLTEXT_COLUMNS[table_name]]
+    if dialect_name == 'mysql':
+        against = ' '.join('+"{}"'.format(token.replace('"', ' ')) for token in indexed)
+        relevance = mysql_match(*columns, against=against).in_boolean_mode()
+        return query.filter(relevance).order_by(relevance.desc())
+
+    fts_name = f'{table_name}_fts'
+    fts_query = ' '.join('"{}"'.format(token.replace('"', '""')) for token in indexed)
+    fts = (
+        select(literal_column('rowid').label('fts_rowid'), literal_column('rank').label('fts_rank'))
+        .select_from(text(fts_name))
+        .where(text(f'{fts_name} MATCH :fts_query').bindparams(fts_query=fts_query))
+        .subquery()
+    )
+    return (
+        query.join(fts, fts.c.fts_rowid == literal_column(f'{table_name}.rowid'))
+        .order_by(fts.c.fts_rank.asc())
+    )
 
 
 def _catalogo_filter_bras(query, filters: dict):
@@ -3006,24 +4770,20 @@ def _catalogo_filter_bras(query, filters: dict):
     if filters.get('anvisa'):
         query = query.filter(CatalogoBrasindice.registro_anvisa == filters['anvisa'])
     if filters.get('fabricante'):
-        fabricante = filters['fabricante'].lower()
-        query = query.filter(func.lower(CatalogoBrasindice.laboratorio_nome).like(f"%{{fabricante}}%"))
+        fabricante = _normalize_search_text(filters['fabricante']) or ''
+        query = query.filter(CatalogoBrasindice.fabricante_norm.like(f"%{fabricante}%"))
     if filters.get('versao_tabela'):
         query = query.filter(CatalogoBrasindice.periodo == filters['versao_tabela'])
     if filters.get('aliquota') is not None:
         target_bp = int((filters['aliquota'] * Decimal('100')).to_integral_value(rounding=ROUND_HALF_UP))
         query = query.filter(CatalogoBrasindice.aliquota_bp == target_bp)
     tokens = filters.get('tokens') or []
-    for token in tokens:
-        pattern = f"%{{token}}%"
-        query = query.filter(
-            or_(
-                func.lower(func.coalesce(CatalogoBrasindice.produto_nome, '')).like(pattern),
-                func.lower(func.coalesce(CatalogoBrasindice.apresentacao_descricao, '')).like(pattern),
-                func.lower(func.coalesce(CatalogoBrasindice.ean, '')).like(pattern),
-                func.lower(func.coalesce(CatalogoBrasindice.registro_anvisa, '')).like(pattern),
-            )
-        )
+    if tokens:
+        query = _apply_fulltext_tokens(query, CatalogoBrasindice, tokens, (
+            CatalogoBrasindice.descricao_norm,
+            CatalogoBrasindice.ean,
+            CatalogoBrasindice.registro_anvisa,
+        ))
     return query
 
 
@@ -3037,23 +4797,20 @@ def _catalogo_filter_simpro(query, filters: dict):
     if filters.get('anvisa'):
         query = query.filter(CatalogoSimpro.anvisa == filters['anvisa'])
     if filters.get('fabricante'):
-        fabricante = filters['fabricante'].lower()
-        query = query.filter(func.lower(CatalogoSimpro.fabricante).like(f"%{{fabricante}}%"))
+        fabricante = _normalize_search_text(filters['fabricante']) or ''
+        query = query.filter(CatalogoSimpro.fabricante_norm.like(f"%{fabricante}%"))
     if filters.get('versao_tabela'):
         query = query.filter(CatalogoSimpro.periodo == filters['versao_tabela'])
     if filters.get('aliquota') is not None:
         target_bp = int((filters['aliquota'] * Decimal('100')).to_integral_value(rounding=ROUND_HALF_UP))
         query = query.filter(CatalogoSimpro.aliquota_bp == target_bp)
     tokens = filters.get('tokens') or []
-    for token in tokens:
-        pattern = f"%{{token}}%"
-        query = query.filter(
-            or_(
-                func.lower(func.coalesce(CatalogoSimpro.descricao, '')).like(pattern),
-                func.lower(func.coalesce(CatalogoSimpro.codigo, '')).like(pattern),
-                func.lower(func.coalesce(CatalogoSimpro.ean, '')).like(pattern),
-            )
-        )
+    if tokens:
+        query = _apply_fulltext_tokens(query, CatalogoSimpro, tokens, (
+            CatalogoSimpro.descricao_norm,
+            CatalogoSimpro.codigo,
+            CatalogoSimpro.ean,
+        ))
     return query
 
 
@@ -3107,57 +4864,329 @@ def _serialize_catalogo_simpro(row: CatalogoSimpro) -> dict:
     }
 
 
-def _catalogo_search(filters: dict, page: int, per_page: int) -> dict:
-    include_bras = filters.get('origem') in (None, 'BRAS')
-    include_simpro = filters.get('origem') in (None, 'SIMPRO')
+# Ordem estável de cada fonte da busca: (nome, item_id[, uf]). A UF desempata as
+# linhas do catálogo vigente, cuja chave é (uf, item_id).
+_CATALOGO_SEARCH_SORT = {
+    'BRAS_VIEW': (CatalogoBrasindice.produto_nome, CatalogoBrasindice.item_id, CatalogoBrasindice.uf),
+    'SIMPRO_VIEW': (CatalogoSimpro.descricao, CatalogoSimpro.item_id, CatalogoSimpro.uf),
+    'BRAS_INDEX': (InsumoIndex.descricao, InsumoIndex.item_id),
+    'SIMPRO_INDEX': (InsumoIndex.descricao, InsumoIndex.item_id),
+}
+SEARCH_TOTAL_MODES = ('exact', 'cached', 'none')
+
+
+class SearchResultCache:
+    """LRU com TTL em memória, opcionalmente apoiado num Redis compartilhado.
+
+    As chaves já embutem a versão publicada/materializada dos catálogos, então
+    entradas antigas simplesmente deixam de ser consultadas e expiram.
+    """
+
+    def __init__(self, max_entries: int, ttl: int, shared_url: str | None = None) -> None:
+        self.max_entries = max(max_entries, 1)
+        self.ttl = max(ttl, 1)
+        self._entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._shared = None
+        self.shared_url = shared_url or None
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        if shared_url:
+            try:
+                import redis  # type: ignore
+            except ImportError:
+                app.logger.warning('INSUMOS_SEARCH_CACHE_URL definido, mas o pacote redis não está instalado.')
+            else:
+                self._shared = redis.Redis.from_url(shared_url)
+
+    def get(self, key: str):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+        if self._shared is not None:
+            try:
+                raw = self._shared.get(key)
+            except Exception as exc:  # noqa: BLE001
+                app.logger.warning('Cache compartilhado da busca indisponível (%s).', exc)
+                raw = None
+            if raw is not None:
+                value = json.loads(raw)
+                self._store_local(key, value, self.ttl)
+                with self._lock:
+                    self.shared_hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value, ttl: int | None = None) -> None:
+        ttl = ttl or self.ttl
+        self._store_local(key, value, ttl)
+        if self._shared is not None:
+            try:
+                self._shared.set(key, json.dumps(value, default=str), ex=ttl)
+            except Exception as exc:  # noqa: BLE001
+                app.logger.warning('Cache compartilhado da busca indisponível (%s).', exc)
+
+    def _store_local(self, key: str, value, ttl: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_ratio': round((self.hits + self.shared_hits) / lookups, 4) if lookups else None,
+                'shared_backend': 'redis' if self._shared is not None else None,
+            }
+
+
+search_cache = SearchResultCache(INSUMOS_SEARCH_CACHE_SIZE, INSUMOS_SEARCH_CACHE_TTL, INSUMOS_SEARCH_CACHE_URL)
+
+
+def _catalogo_sources(filters: dict, *, count: bool = True) -> list[tuple[str, str, object, int | None]]:
+    """Monta as fontes da busca (catálogo vigente ou ``insumos_index`` como fallback).
+
+    Com ``count=False`` a escolha entre catálogo e fallback usa só um teste de
+    existência (``LIMIT 1``) e o total de cada fonte fica ``None``.
+    """
+    def _size(query) -> int:
+        if count:
+            return query.order_by(None).count()
+        return 1 if query.limit(1).first() is not None else 0
+
+    sources: list[tuple[str, str, object, int | None]] = []
+    for origin_key, view_kind, model, filter_fn, name_column in (
+        ('BRAS', 'BRAS_VIEW', CatalogoBrasindice, _catalogo_filter_bras, CatalogoBrasindice.produto_nome),
+        ('SIMPRO', 'SIMPRO_VIEW', CatalogoSimpro, _catalogo_filter_simpro, CatalogoSimpro.descricao),
+    ):
+        if filters.get('origem') not in (None, origin_key):
+            continue
+        # Catálogo vazio para o filtro é resultado normal (ex.: termo sem ocorrências);
+        # a reconstrução só acontece via versão publicada (_schedule_catalog_refresh).
+        view_query = filter_fn(model.query, filters).order_by(name_column.asc(), model.item_id.asc())
+        view_total = _size(view_query)
+        if view_total > 0:
+            sources.append((view_kind, origin_key, view_query, view_total if count else None))
+            continue
+        fallback_filters = dict(filters)
+        fallback_filters['origem'] = origin_key
+        fallback_query = _apply_insumo_filters(InsumoIndex.query, fallback_filters)
+        fallback_query = fallback_query.order_by(InsumoIndex.descricao.asc(), InsumoIndex.item_id.asc())
+        fallback_total = _size(fallback_query)
+        if fallback_total > 0:
+            sources.append((f'{origin_key}_INDEX', origin_key, fallback_query, fallback_total if count else None))
+    return sources
+
+
+def _serialize_search_rows(source_kind: str, rows: list) -> list[dict]:
+    if source_kind == 'BRAS_VIEW':
+        return [_serialize_catalogo_bras(row) for row in rows]
+    if source_kind == 'SIMPRO_VIEW':
+        return [_serialize_catalogo_simpro(row) for row in rows]
+    return _serialize_insumo_indexes(rows)
+
+
+def _encode_search_cursor(source_kind: str, row) -> str:
+    key = [getattr(row, column.key) for column in _CATALOGO_SEARCH_SORT[source_kind]]
+    payload = json.dumps({'s': source_kind, 'k': key}, separators=(',', ':'), ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_search_cursor(token: str) -> tuple[str, list]:
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        source_kind = payload['s']
+        key = list(payload['k'])
+    except (ValueError, KeyError, TypeError, UnicodeError) as exc:
+        raise ValueError('Cursor de paginação inválido.') from exc
+    if source_kind not in _CATALOGO_SEARCH_SORT or len(key) != len(_CATALOGO_SEARCH_SORT[source_kind]):
+        raise ValueError('Cursor de paginação inválido.')
+    return source_kind, key
+
+
+def _seek_query(query, source_kind: str, key: list | None):
+    """Reordena a fonte pela chave estável e posiciona após ``key`` (keyset).
+
+    A ordenação usa a coluna de nome crua (indexável); nomes nulos vêm antes no
+    MySQL/SQLite e depois no PostgreSQL, e o filtro trata esse grupo à parte.
+    """
+    name_column, *tie_columns = _CATALOGO_SEARCH_SORT[source_kind]
+    query = query.order_by(None).order_by(name_column.asc(), *(column.asc() for column in tie_columns))
+    if key is None:
+        return query
+    name_key, *tie_key = key
+    # Expande (b, c) > (y, z) em OR/AND: funciona em todos os dialetos e usa o índice.
+    tie_clauses = []
+    for position in range(len(tie_columns)):
+        equals = [tie_columns[idx] == tie_key[idx] for idx in range(position)]
+        tie_clauses.append(and_(*equals, tie_columns[position] > tie_key[position]))
+    after_ties = or_(*tie_clauses)
+
+    nulls_last = db.session.get_bind().dialect.name == 'postgresql'
+    if name_key is None:
+        clauses = [and_(name_column.is_(None), after_ties)]
+        if not nulls_last:
+            clauses.append(name_column.isnot(None))
+    else:
+        clauses = [name_column > name_key, and_(name_column == name_key, after_ties)]
+        if nulls_last:
+            clauses.append(name_column.is_(None))
+    return query.filter(or_(*clauses))
+
+
+def _catalog_cache_versions() -> list:
+    """Estado publicado/materializado dos catálogos, usado nas chaves do cache da busca."""
+    rows = (
+        db.session.query(
+            CatalogoVersao.fornecedor,
+            CatalogoVersao.versao_publicada,
+            CatalogoVersao.versao_materializada,
+            CatalogoVersao.etag_publicado,
+        )
+        .filter(CatalogoVersao.fornecedor != CATALOGO_VERSAO_PROCEDIMENTOS)
+        .order_by(CatalogoVersao.fornecedor)
+        .all()
+    )
+    return [list(row) for row in rows]
+
+
+def _search_cache_key(kind: str, filters: dict, **extra) -> str:
+    relevant = {key: value for key, value in filters.items() if key != 'raw_q'}
+    payload = json.dumps(
+        {'filters': relevant, 'versions': _catalog_cache_versions(), **extra}, sort_keys=True, default=str
+    )
+    return f"insumos:{kind}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+def _cached_search_total(filters: dict, sources: list) -> int:
+    cache_key = _search_cache_key('total', filters)
+    total = search_cache.get(cache_key)
+    if total is not None:
+        return total
+    total = sum(query.order_by(None).count() for _, _, query, _ in sources)
+    search_cache.set(cache_key, total, ttl=INSUMOS_SEARCH_TOTAL_TTL)
+    return total
+
+
+def _clear_search_cache() -> None:
+    search_cache.clear()
+
+
+def _catalogo_search_cursor(filters: dict, per_page: int, cursor: str | None, total_mode: str) -> dict:
+    """Página por keyset: cada fonte é lida a partir da chave do último item entregue."""
+    position = _decode_search_cursor(cursor) if cursor else None
+    sources = _catalogo_sources(filters, count=False)
+    kinds = [source_kind for source_kind, _, _, _ in sources]
+    # A fonte do cursor pode sumir (ex.: catálogo republicado); a leitura recomeça e o cliente é avisado.
+    reset = position is not None and position[0] not in kinds
+    started = position is None or reset
+
+    serialized: list[dict] = []
+    remaining = per_page
+    next_cursor: str | None = None
+    has_more = False
+    for source_kind, _, query, _ in sources:
+        key = None
+        if not started:
+            if source_kind != position[0]:
+                continue
+            started = True
+            key = position[1]
+        rows = _seek_query(query, source_kind, key).limit(remaining + 1).all()
+        taken = rows[:remaining]
+        if taken:
+            serialized.extend(_serialize_search_rows(source_kind, taken))
+            next_cursor = _encode_search_cursor(source_kind, taken[-1])
+            remaining -= len(taken)
+        if len(rows) > len(taken):
+            has_more = True
+            break
+
+    if total_mode == 'exact':
+        total: int | None = sum(query.order_by(None).count() for _, _, query, _ in sources)
+    elif total_mode == 'cached':
+        total = _cached_search_total(filters, sources) if sources else 0
+    else:
+        total = None
+    return {
+        'items': serialized,
+        'pagination': {
+            'per_page': per_page,
+            'cursor': cursor,
+            'next_cursor': next_cursor if has_more else None,
+            'has_more': has_more,
+            'reset': reset,
+            'total': total,
+            'total_mode': total_mode,
+            'pages': math.ceil(total / per_page) if total is not None and per_page else None,
+        }
+    }
+
+
+def _catalogo_search(
+    filters: dict,
+    page: int,
+    per_page: int,
+    *,
+    cursor: str | None = None,
+    total_mode: str | None = None,
+    use_cache: bool = True,
+) -> dict:
+    """Busca paginada no catálogo vigente.
+
+    Sem ``cursor`` mantém a paginação por ``page``/``per_page`` (OFFSET). Com
+    ``cursor`` (vazio = primeira página) usa keyset, exceto em buscas com termos,
+    que seguem por página para manter a ordem por relevância; ``total_mode`` escolhe entre
+    contagem exata, contagem em cache (``INSUMOS_SEARCH_TOTAL_TTL``) ou nenhuma.
+    As páginas ficam em ``search_cache`` por filtros + versão dos catálogos.
+    """
+    if not use_cache:
+        return _catalogo_search_page(filters, page, per_page, cursor=cursor, total_mode=total_mode)
+    cache_key = _search_cache_key(
+        'page', filters, page=page, per_page=per_page, cursor=cursor, total_mode=total_mode
+    )
+    payload = search_cache.get(cache_key)
+    if payload is None:
+        payload = _catalogo_search_page(filters, page, per_page, cursor=cursor, total_mode=total_mode)
+        search_cache.set(cache_key, payload)
+    return payload
 
-    totals = {'BRAS': 0, 'SIMPRO': 0}
-    sources: list[tuple[str, str, any, int]] = []
-
-    if include_bras:
-        bras_query = _catalogo_filter_bras(CatalogoBrasindice.query, filters)
-        bras_query = bras_query.order_by(CatalogoBrasindice.produto_nome.asc(), CatalogoBrasindice.item_id.asc())
-        bras_total = bras_query.count()
-        if bras_total <= 0:
-            _refresh_materialized_catalogs('BRASINDICE')
-            bras_query = _catalogo_filter_bras(CatalogoBrasindice.query, filters)
-            bras_query = bras_query.order_by(CatalogoBrasindice.produto_nome.asc(), CatalogoBrasindice.item_id.asc())
-            bras_total = bras_query.count()
-        if bras_total > 0:
-            sources.append(('BRAS_VIEW', 'BRAS', bras_query, bras_total))
-        if bras_total <= 0:
-            fallback_filters = dict(filters)
-            fallback_filters['origem'] = 'BRAS'
-            fallback_query = _apply_insumo_filters(InsumoIndex.query, fallback_filters)
-            fallback_query = fallback_query.order_by(InsumoIndex.descricao.asc(), InsumoIndex.item_id.asc())
-            fallback_total = fallback_query.count()
-            if fallback_total > 0:
-                sources.append(('BRAS_INDEX', 'BRAS', fallback_query, fallback_total))
-                bras_total = fallback_total
-        totals['BRAS'] = bras_total
-
-    if include_simpro:
-        simpro_query = _catalogo_filter_simpro(CatalogoSimpro.query, filters)
-        simpro_query = simpro_query.order_by(CatalogoSimpro.descricao.asc(), CatalogoSimpro.item_id.asc())
-        simpro_total = simpro_query.count()
-        if simpro_total <= 0:
-            _refresh_materialized_catalogs('SIMPRO')
-            simpro_query = _catalogo_filter_simpro(CatalogoSimpro.query, filters)
-            simpro_query = simpro_query.order_by(CatalogoSimpro.descricao.asc(), CatalogoSimpro.item_id.asc())
-            simpro_total = simpro_query.count()
-        if simpro_total > 0:
-            sources.append(('SIMPRO_VIEW', 'SIMPRO', simpro_query, simpro_total))
-        if simpro_total <= 0:
-            fallback_filters = dict(filters)
-            fallback_filters['origem'] = 'SIMPRO'
-            fallback_query = _apply_insumo_filters(InsumoIndex.query, fallback_filters)
-            fallback_query = fallback_query.order_by(InsumoIndex.descricao.asc(), InsumoIndex.item_id.asc())
-            fallback_total = fallback_query.count()
-            if fallback_total > 0:
-                sources.append(('SIMPRO_INDEX', 'SIMPRO', fallback_query, fallback_total))
-                simpro_total = fallback_total
-        totals['SIMPRO'] = simpro_total
 
+def _catalogo_search_page(
+    filters: dict,
+    page: int,
+    per_page: int,
+    *,
+    cursor: str | None = None,
+    total_mode: str | None = None,
+) -> dict:
+    # O keyset ordena só por nome; com termos a ordem é a relevância do full-text.
+    if cursor is not None and not filters.get('tokens'):
+        return _catalogo_search_cursor(filters, per_page, cursor or None, total_mode or 'cached')
+
+    sources = _catalogo_sources(filters)
     if not sources:
         return {
             'items': [],
@@ -3175,11 +5204,7 @@ def _catalogo_search(filters: dict, page: int, per_page: int) -> dict:
     consumed = 0
     serialized: list[dict] = []
 
-    for source_kind, origin_key, query, origin_total in sources:
-        origin_total = origin_total or totals.get(origin_key, 0)
-        if origin_total <= 0:
-            consumed += origin_total
-            continue
+    for source_kind, _, query, origin_total in sources:
         if start >= consumed + origin_total:
             consumed += origin_total
             continue
@@ -3187,12 +5212,7 @@ def _catalogo_search(filters: dict, page: int, per_page: int) -> dict:
         fetch_count = min(remaining, origin_total - local_offset)
         if fetch_count > 0:
             rows = query.offset(local_offset).limit(fetch_count).all()
-            if source_kind == 'BRAS_VIEW':
-                serialized.extend(_serialize_catalogo_bras(row) for row in rows)
-            elif source_kind == 'SIMPRO_VIEW':
-                serialized.extend(_serialize_catalogo_simpro(row) for row in rows)
-            else:
-                serialized.extend(_serialize_insumo_index(row) for row in rows)
+            serialized.extend(_serialize_search_rows(source_kind, rows))
             remaining -= fetch_count
         consumed += origin_total
         if remaining <= 0:
@@ -3240,45 +5260,107 @@ def _catalogo_fetch_all(filters: dict, limit: int | None = None) -> list[dict]:
 
 
 
-def _serialize_insumo_index(item: 'InsumoIndex', *, preco_pmc: Decimal | None = None, preco_pfb: Decimal | None = None) -> dict:
+def _prefetch_insumo_prices(items: Sequence['InsumoIndex']) -> dict[tuple[str, int], dict]:
+    """Carrega em lote os preços brutos/normalizados usados por ``_serialize_insumo_index``.
+
+    Uma consulta ``IN`` por tabela (``BrasRaw`` é agrupado por arquivo), em vez
+    de duas consultas por linha.
+    """
+    bras_ids = sorted({item.item_id for item in items if item.origem == 'BRAS'})
+    simpro_ids = sorted({item.item_id for item in items if item.origem == 'SIMPRO'})
+    prices: dict[tuple[str, int], dict] = {}
+
+    if bras_ids:
+        bras_rows = (
+            BrasItemNormalized.query
+            .with_entities(BrasItemNormalized.id, BrasItemNormalized.arquivo, BrasItemNormalized.linha_num)
+            .filter(BrasItemNormalized.id.in_(bras_ids))
+            .all()
+        )
+        linhas_por_arquivo: dict[str, set[int]] = {}
+        for row in bras_rows:
+            if row.arquivo and row.linha_num is not None:
+                linhas_por_arquivo.setdefault(row.arquivo, set()).add(row.linha_num)
+        raw_by_key: dict[tuple[str, int], tuple] = {}
+        for arquivo, linhas in linhas_por_arquivo.items():
+            raw_rows = (
+                BrasRaw.query
+                .with_entities(BrasRaw.linha_num, BrasRaw.col07, BrasRaw.col08)
+                .filter(BrasRaw.arquivo == arquivo, BrasRaw.linha_num.in_(sorted(linhas)))
+                .order_by(BrasRaw.id.asc())
+                .all()
+            )
+            for raw in raw_rows:
+                raw_by_key.setdefault((arquivo, raw.linha_num), (raw.col07, raw.col08))
+        for row in bras_rows:
+            raw = raw_by_key.get((row.arquivo, row.linha_num))
+            if raw is not None:
+                prices[('BRAS', row.id)] = {'raw_pmc': raw[0], 'raw_pfb': raw[1]}
+
+    if simpro_ids:
+        simpro_rows = (
+            SimproItemNormalized.query
+            .with_entities(
+                SimproItemNormalized.id,
+                SimproItemNormalized.preco1,
+                SimproItemNormalized.preco2,
+                SimproItemNormalized.preco3,
+                SimproItemNormalized.preco4,
+            )
+            .filter(SimproItemNormalized.id.in_(simpro_ids))
+            .all()
+        )
+        for row in simpro_rows:
+            preco_candidates = [row.preco2, row.preco1, row.preco3, row.preco4]
+            prices[('SIMPRO', row.id)] = {
+                'preco_effective': next((p for p in preco_candidates if p is not None), None),
+            }
+
+    return prices
+
+
+def _serialize_insumo_indexes(items: Sequence['InsumoIndex']) -> list[dict]:
+    prices = _prefetch_insumo_prices(items)
+    return [_serialize_insumo_index(item, prices=prices) for item in items]
+
+
+def _serialize_insumo_index(
+    item: 'InsumoIndex',
+    *,
+    preco_pmc: Decimal | None = None,
+    preco_pfb: Decimal | None = None,
+    prices: dict[tuple[str, int], dict] | None = None,
+) -> dict:
     uf_codes = _decode_uf_codes(item.uf_referencia)
     uf_display = ', '.join(uf_codes) if uf_codes else item.uf_referencia
     preco_pmc_value: Decimal | None = preco_pmc if preco_pmc is not None else item.preco
     preco_pfb_value: Decimal | None = preco_pfb if preco_pfb is not None else item.preco
     preco_display_value: Decimal | None = item.preco
 
-    if item.origem == 'BRAS':
-        bras_row = BrasItemNormalized.query.get(item.item_id)
-        if bras_row and bras_row.arquivo and bras_row.linha_num is not None:
-            raw_row = (
-                BrasRaw.query
-                .with_entities(BrasRaw.col07, BrasRaw.col08)
-                .filter_by(arquivo=bras_row.arquivo, linha_num=bras_row.linha_num)
-                .first()
-            )
-            if raw_row is not None:
-                raw_pmc = _coerce_decimal(raw_row.col07)
-                raw_pfb = _coerce_decimal(raw_row.col08)
-                if raw_pmc is not None:
-                    try:
-                        preco_pmc_value = Decimal(raw_pmc)
-                    except (InvalidOperation, ValueError):
-                        pass
-                if raw_pfb is not None:
-                    try:
-                        preco_pfb_value = Decimal(raw_pfb)
-                    except (InvalidOperation, ValueError):
-                        pass
-
-    elif item.origem == 'SIMPRO':
-        simpro_row = SimproItemNormalized.query.get(item.item_id)
-        if simpro_row:
-            preco_candidates = [simpro_row.preco2, simpro_row.preco1, simpro_row.preco3, simpro_row.preco4]
-            preco_effective = next((p for p in preco_candidates if p is not None), None)
-            if preco_effective is not None:
-                preco_pmc_value = preco_effective
-                preco_pfb_value = preco_effective
-                preco_display_value = preco_effective
+    if prices is None:
+        prices = _prefetch_insumo_prices([item])
+    price_info = prices.get((item.origem, item.item_id))
+
+    if item.origem == 'BRAS' and price_info is not None:
+        raw_pmc = _coerce_decimal(price_info['raw_pmc'])
+        raw_pfb = _coerce_decimal(price_info['raw_pfb'])
+        if raw_pmc is not None:
+            try:
+                preco_pmc_value = Decimal(raw_pmc)
+            except (InvalidOperation, ValueError):
+                pass
+        if raw_pfb is not None:
+            try:
+                preco_pfb_value = Decimal(raw_pfb)
+            except (InvalidOperation, ValueError):
+                pass
+
+    elif item.origem == 'SIMPRO' and price_info is not None:
+        preco_effective = price_info['preco_effective']
+        if preco_effective is not None:
+            preco_pmc_value = preco_effective
+            preco_pfb_value = preco_effective
+            preco_display_value = preco_effective
 
     tuss_display = _format_tuss_display(item.tuss)
     return {
@@ -3486,6 +5568,26 @@ def _extract_insumo_filters(args) -> dict:
     return filters
 
 
+def _filter_index_uf(query, uf_target: str):
+    """Restringe ``insumos_index`` à UF via join indexado em ``insumos_index_uf``."""
+    if uf_target not in BR_UFS:
+        pattern = f"%|{uf_target}|%"
+        return query.filter(
+            or_(
+                func.upper(InsumoIndex.uf_referencia) == uf_target,
+                func.upper(func.coalesce(InsumoIndex.uf_referencia, '')).like(pattern)
+            )
+        )
+    return query.join(
+        InsumoIndexUf,
+        and_(
+            InsumoIndexUf.uf == uf_target,
+            InsumoIndexUf.origem == InsumoIndex.origem,
+            InsumoIndexUf.item_id == InsumoIndex.item_id,
+        ),
+    )
+
+
 def _apply_insumo_filters(query, filters: dict):
     origem = filters.get('origem')
     if origem:
@@ -3498,34 +5600,24 @@ def _apply_insumo_filters(query, filters: dict):
     if filters.get('anvisa'):
         query = query.filter(InsumoIndex.anvisa == filters['anvisa'])
     if filters.get('fabricante'):
-        fabricante = filters['fabricante'].lower()
-        query = query.filter(func.lower(InsumoIndex.fabricante).like(f"%{fabricante}%"))
+        fabricante = _normalize_search_text(filters['fabricante']) or ''
+        query = query.filter(InsumoIndex.fabricante_norm.like(f"%{fabricante}%"))
     if filters.get('versao_tabela'):
         query = query.filter(InsumoIndex.versao_tabela == filters['versao_tabela'])
     if filters.get('uf_referencia'):
-        uf_target = filters['uf_referencia']
-        pattern = f"%|{uf_target}|%"
-        query = query.filter(
-            or_(
-                func.upper(InsumoIndex.uf_referencia) == uf_target,
-                func.upper(func.coalesce(InsumoIndex.uf_referencia, '')).like(pattern)
-            )
-        )
+        query = _filter_index_uf(query, filters['uf_referencia'])
     if filters.get('aliquota') is not None:
         query = query.filter(InsumoIndex.aliquota == filters['aliquota'])
 
     tokens = filters.get('tokens') or []
-    for token in tokens:
-        pattern = f"%{token}%"
-        query = query.filter(
-            or_(
-                func.lower(InsumoIndex.descricao).like(pattern),
-                func.lower(InsumoIndex.fabricante).like(pattern),
-                func.lower(func.coalesce(InsumoIndex.tuss, '')).like(pattern),
-                func.lower(func.coalesce(InsumoIndex.tiss, '')).like(pattern),
-                func.lower(func.coalesce(InsumoIndex.anvisa, '')).like(pattern),
-            )
-        )
+    if tokens:
+        query = _apply_fulltext_tokens(query, InsumoIndex, tokens, (
+            InsumoIndex.descricao_norm,
+            InsumoIndex.fabricante_norm,
+            InsumoIndex.tuss_norm,
+            InsumoIndex.tiss_norm,
+            InsumoIndex.anvisa,
+        ))
 
     return query
 
@@ -3644,80 +5736,56 @@ def _load_data_local_infile(engine, table_name: str, columns: list[str], file_pa
 
 def _fallback_delimited(model_cls, columns: list[str], file_path: Path, delimiter: str, quotechar: str | None,
                         skip_header: bool, extra_assignments: dict[str, object | None],
-                        encodings: list[str]) -> int:
+                        encoding: str) -> int:
     delimiter = delimiter or ';'
     quotechar = quotechar or '"'
-    tried: list[str] = []
 
-    for encoding in encodings:
-        try:
-            created = 0
-            with file_path.open('r', encoding=encoding, newline='') as fh:
-                reader = csv.reader(fh, delimiter=delimiter, quotechar=quotechar)
-                if skip_header:
-                    next(reader, None)
-                rows = []
-                for raw_row in reader:
-                    record: dict[str, object | None] = {}
-                    for idx, col in enumerate(columns):
-                        value = raw_row[idx] if idx < len(raw_row) else ''
-                        value = value.strip() if isinstance(value, str) else value
-                        if not value:
-                            record[col] = None
-                        elif col in DECIMAL_FIELDS:
-                            coerced = _coerce_decimal(value)
-                            record[col] = Decimal(coerced) if coerced is not None else None
-                        elif col in DATE_FIELDS:
-                            record[col] = _coerce_date(value)
-                        else:
-                            record[col] = value
-                    record.update(extra_assignments)
-                    rows.append(model_cls(**record))
-                if rows:
-                    db.session.bulk_save_objects(rows)
-                    db.session.commit()
-                    created = len(rows)
-            return created
-        except UnicodeDecodeError:
-            tried.append(encoding)
-            db.session.rollback()
-            continue
-
-    tried_display = ', '.join(tried) if tried else 'utf-8'
-    raise click.ClickException(
-        f'Não foi possível decodificar o arquivo com as codificações testadas ({tried_display}). '
-        'Informe a codificação correta ou converta o arquivo para UTF-8.'
-    )
+    rows = []
+    with file_path.open('r', encoding=encoding, newline='') as fh:
+        reader = csv.reader(fh, delimiter=delimiter, quotechar=quotechar)
+        if skip_header:
+            next(reader, None)
+        for raw_row in reader:
+            record: dict[str, object | None] = {}
+            for idx, col in enumerate(columns):
+                value = raw_row[idx] if idx < len(raw_row) else ''
+                value = value.strip() if isinstance(value, str) else value
+                if not value:
+                    record[col] = None
+                elif col in DECIMAL_FIELDS:
+                    coerced = _coerce_decimal(value)
+                    record[col] = Decimal(coerced) if coerced is not None else None
+                elif col in DATE_FIELDS:
+                    record[col] = _coerce_date(value)
+                else:
+                    record[col] = value
+            record.update(extra_assignments)
+            rows.append(model_cls(**record))
+    if rows:
+        db.session.bulk_save_objects(rows)
+        db.session.commit()
+    return len(rows)
 
 
 def _handle_delimited_import(*, model_cls, table_name: str, file_path: Path, versao: str,
                              data_ref: date | None, delimiter: str, quotechar: str | None,
                              columns_cfg: list[str] | None, skip_header: bool, use_load_data: bool,
                              truncate: bool, encoding: str | None,
-                             extra_assignments: dict[str, object | None]) -> int:
+                             extra_assignments: dict[str, object | None],
+                             metrics: dict | None = None) -> int:
     if truncate:
         db.session.query(model_cls).delete(synchronize_session=False)
         db.session.commit()
 
-    encodings = _build_encoding_list(encoding)
-    chosen_encoding = encodings[0] if encodings else 'utf-8-sig'
+    chosen_encoding = _detect_file_encoding(file_path, encoding, metrics=metrics)
     header: list[str] | None = None
     if skip_header:
         effective_delimiter = delimiter or ';'
         effective_quotechar = (quotechar or '"') if quotechar is not None else '"'
-        raw_header: list[str] = []
         try:
-            for encoding_option in encodings:
-                try:
-                    with file_path.open('r', encoding=encoding_option, newline='') as fh:
-                        reader = csv.reader(fh, delimiter=effective_delimiter, quotechar=effective_quotechar)
-                        raw_header = next(reader, [])
-                        chosen_encoding = encoding_option
-                        break
-                except UnicodeDecodeError:
-                    db.session.rollback()
-                    raw_header = []
-                    continue
+            with file_path.open('r', encoding=chosen_encoding, newline='') as fh:
+                reader = csv.reader(fh, delimiter=effective_delimiter, quotechar=effective_quotechar)
+                raw_header = next(reader, [])
         except Exception:
             raw_header = []
 
@@ -3760,7 +5828,7 @@ def _handle_delimited_import(*, model_cls, table_name: str, file_path: Path, ver
             quotechar,
             skip_header,
             extra_assignments,
-            encodings,
+            chosen_encoding,
         )
     return inserted
 
@@ -3822,7 +5890,8 @@ def _handle_fixed_import(*, model_cls, file_path: Path, versao: str, data_ref: d
 def _run_insumo_import(resource: str, model_cls, table_name: str, file_path: Path, versao: str,
                        data_str: str | None, fmt: str, delimiter: str, quotechar: str | None,
                        map_path: Path | None, no_header: bool, truncate: bool, encoding: str | None,
-                       uf_referencia: str | None, aliquota: Decimal | None) -> None:
+                       uf_referencia: str | None, aliquota: Decimal | None,
+                       metrics: dict | None = None) -> None:
     file_path = file_path.resolve()
     if not file_path.exists():
         raise click.ClickException(f'Arquivo não encontrado: {file_path}')
@@ -3892,6 +5961,7 @@ def _run_insumo_import(resource: str, model_cls, table_name: str, file_path: Pat
             truncate=truncate,
             encoding=encoding,
             extra_assignments=merged_assignments,
+            metrics=metrics,
         )
     else:
         if not map_path:
@@ -3908,6 +5978,9 @@ def _run_insumo_import(resource: str, model_cls, table_name: str, file_path: Pat
 
 
 def _common_import_options(func):
+    func = click.option('--incremental', is_flag=True, default=False, help='Aplica apenas inclusões, alterações e exclusões em relação à carga anterior do mesmo arquivo.')(func)
+    func = click.option('--publicar', is_flag=True, default=False, help='Gera e publica o lote da alíquota (grava o hash do arquivo); exige --aliquota.')(func)
+    func = click.option('--force', is_flag=True, default=False, help='Reimporta mesmo que o arquivo já esteja publicado com o mesmo hash.')(func)
     func = click.option('--truncate', is_flag=True, default=False, help='Limpa a tabela antes de importar.')(func)
     func = click.option('--no-header', is_flag=True, default=False, help='Arquivo sem cabeçalho (delimited).')(func)
     func = click.option('--map', 'map_path', type=click.Path(exists=True, dir_okay=False, path_type=Path), help='Arquivo JSON com configuração.')(func)
@@ -3924,12 +5997,47 @@ def _common_import_options(func):
     return func
 
 
+def _find_unchanged_cli_import(origem: str, file_path: Path, file_hash: str | None, *, versao: str,
+                               map_config: dict, aliquota_value: Decimal | None,
+                               uf_value: str | None) -> Lote | None:
+    if aliquota_value is None or not file_hash:
+        return None
+    base_label = map_config.get('arquivo') or versao or file_path.name
+    return _find_unchanged_import(
+        origem,
+        file_hash,
+        versao=versao,
+        aliquota_value=aliquota_value,
+        arquivo_labels=_import_target_labels(origem, base_label, uf_default=uf_value, uf_values=None),
+    )
+
+
+def _finish_cli_import(origem: str, result: dict, *, versao: str, aliquota_value: Decimal | None,
+                       uf_value: str | None, file_hash: str | None, publicar: bool) -> None:
+    """Com ``--publicar`` gera e publica o lote (gravando o hash do arquivo).
+
+    O índice LSH não é refeito aqui (reconstrução completa): fica com ``flask insumos:lsh``.
+    """
+    click.echo('Índice LSH não reconstruído; rode flask insumos:lsh para atualizar as equivalências.')
+    if not publicar or aliquota_value is None:
+        return
+    _post_catalog_ingest(
+        origem=origem,
+        arquivo_label=result['arquivo'],
+        versao=versao,
+        sequencia_input=None,
+        aliquota_value=aliquota_value,
+        uf_values=[uf_value] if uf_value else [],
+        hash_arquivo=file_hash,
+    )
+
+
 @app.cli.command('bras:import')
 @_common_import_options
 def bras_import(file_path: Path, versao: str, data_str: str | None, fmt: str, delimiter: str,
                 quotechar: str, map_path: Path | None, no_header: bool, truncate: bool,
-                encoding: str | None, uf_referencia: str | None, aliquota: str | None,
-                lines_terminated: str) -> None:
+                force: bool, publicar: bool, incremental: bool, encoding: str | None,
+                uf_referencia: str | None, aliquota: str | None, lines_terminated: str) -> None:
     """Importa arquivo da Brasíndice (pipeline staging + materialização)."""
     uf_value = (uf_referencia or '').strip().upper() or None
     aliquota_value: Decimal | None = None
@@ -3938,6 +6046,8 @@ def bras_import(file_path: Path, versao: str, data_str: str | None, fmt: str, de
         if aliquota_str is None:
             raise click.ClickException('Valor de alíquota inválido.')
         aliquota_value = Decimal(aliquota_str)
+    if publicar and aliquota_value is None:
+        raise click.ClickException('--publicar exige --aliquota.')
 
     file_path = file_path.resolve()
     if not file_path.exists():
@@ -3970,6 +6080,15 @@ def bras_import(file_path: Path, versao: str, data_str: str | None, fmt: str, de
     skip_header_cfg = map_config.get('skip_header') if 'skip_header' in map_config else None
     skip_header = bool(skip_header_cfg) if skip_header_cfg is not None else (not no_header)
 
+    file_hash = _compute_file_hash(file_path) if aliquota_value is not None else None
+    if not force and not truncate:
+        unchanged_lote = _find_unchanged_cli_import('BRAS', file_path, file_hash, versao=versao,
+                                                    map_config=map_config, aliquota_value=aliquota_value,
+                                                    uf_value=uf_value)
+        if unchanged_lote is not None:
+            click.echo(f'{_unchanged_import_message(unchanged_lote)} Use --force para reimportar.')
+            return
+
     result = _import_bras(
         file_path=file_path,
         versao=versao,
@@ -3985,17 +6104,25 @@ def bras_import(file_path: Path, versao: str, data_str: str | None, fmt: str, de
         uf_default=uf_value,
         uf_values=[uf_value] if uf_value else None,
         aliquota_default=aliquota_value,
+        incremental=incremental,
     )
 
     click.echo(f"Brasíndice importado: arquivo={result['arquivo']} linhas_raw={result['linhas_raw']} materializadas={result['linhas_materializadas']}")
+    if result.get('delta'):
+        click.echo(_format_delta_counts(result['delta']))
+    _finish_cli_import('BRAS', result, versao=versao, aliquota_value=aliquota_value,
+                       uf_value=uf_value, file_hash=file_hash, publicar=publicar)
 
 
 @app.cli.command('simpro:import')
 @_common_import_options
+@click.option('--workers', type=click.IntRange(min=1), default=None,
+              help='Processos para normalizar as linhas em paralelo (padrão: 1).')
 def simpro_import(file_path: Path, versao: str, data_str: str | None, fmt: str, delimiter: str,
                   quotechar: str, map_path: Path | None, no_header: bool, truncate: bool,
-                  encoding: str | None, uf_referencia: str | None, aliquota: str | None,
-                  lines_terminated: str) -> None:
+                  force: bool, publicar: bool, incremental: bool, encoding: str | None,
+                  uf_referencia: str | None, aliquota: str | None, lines_terminated: str,
+                  workers: int | None) -> None:
     """Importa arquivo do SIMPRO."""
     del lines_terminated
     uf_value = (uf_referencia or '').strip().upper() or None
@@ -4005,6 +6132,8 @@ def simpro_import(file_path: Path, versao: str, data_str: str | None, fmt: str,
         if aliquota_str is None:
             raise click.ClickException('Valor de alíquota inválido.')
         aliquota_value = Decimal(aliquota_str)
+    if publicar and aliquota_value is None:
+        raise click.ClickException('--publicar exige --aliquota.')
 
     if fmt != 'fixed':
         raise click.ClickException('Importação SIMPRO suporta apenas arquivos de largura fixa.')
@@ -4028,6 +6157,15 @@ def simpro_import(file_path: Path, versao: str, data_str: str | None, fmt: str,
     if isinstance(encoding_cfg, str) and encoding_cfg.strip():
         encoding = encoding_cfg.strip()
 
+    file_hash = _compute_file_hash(file_path) if aliquota_value is not None else None
+    if not force and not truncate:
+        unchanged_lote = _find_unchanged_cli_import('SIMPRO', file_path, file_hash, versao=versao,
+                                                    map_config=map_config, aliquota_value=aliquota_value,
+                                                    uf_value=uf_value)
+        if unchanged_lote is not None:
+            click.echo(f'{_unchanged_import_message(unchanged_lote)} Use --force para reimportar.')
+            return
+
     result = _import_simpro(
         file_path=file_path,
         versao=versao,
@@ -4038,12 +6176,18 @@ def simpro_import(file_path: Path, versao: str, data_str: str | None, fmt: str,
         uf_default=uf_value,
         uf_values=[uf_value] if uf_value else None,
         aliquota_default=aliquota_value,
+        workers=workers,
+        incremental=incremental,
     )
 
     click.echo(
         f"Importação SIMPRO concluída: arquivo={result['arquivo']} linhas_raw={result['linhas_raw']} "
         f"materializadas={result['linhas_materializadas']}"
     )
+    if result.get('delta'):
+        click.echo(_format_delta_counts(result['delta']))
+    _finish_cli_import('SIMPRO', result, versao=versao, aliquota_value=aliquota_value,
+                       uf_value=uf_value, file_hash=file_hash, publicar=publicar)
 
 
 @app.cli.command('aliquota:ingest')
@@ -4086,6 +6230,53 @@ def cli_aliquota_publicar(fornecedor, aliquota_bp, periodo, sequencia):
     )
 
 
+@app.cli.command('catalogo:refresh')
+@click.option('--fornecedor', type=click.Choice(['BRASINDICE', 'SIMPRO']), multiple=True,
+              help='Fornecedor a reconstruir (padrão: ambos).')
+@click.option('--if-stale', is_flag=True, help='Só reconstrói quando a versão publicada difere da materializada.')
+def cli_catalogo_refresh(fornecedor, if_stale):
+    """Reconstrói os catálogos vigentes (tabelas no MySQL, materialized views no PostgreSQL)."""
+    for item in fornecedor or ('BRASINDICE', 'SIMPRO'):
+        if _refresh_catalog_if_stale(item, force=not if_stale):
+            click.echo(f'Catálogo {item} atualizado.')
+        else:
+            click.echo(f'Catálogo {item} já está na versão publicada.')
+
+
+@app.cli.command('insumos:reindex-uf')
+@click.option('--origem', type=click.Choice(['BRAS', 'SIMPRO']), default=None, help='Origem a reprocessar (padrão: ambas).')
+def cli_insumos_reindex_uf(origem):
+    """Reconstrói insumos_index_uf a partir de insumos_index.uf_referencia."""
+    total = _rebuild_insumo_index_ufs(origem)
+    click.echo(f'insumos_index_uf reconstruída ({total} vínculos UF/item).')
+
+
+@app.cli.command('insumos:similares')
+@click.option('--origem', type=click.Choice(['BRAS', 'SIMPRO']), default=None, help='Origem a recalcular (padrão: ambas).')
+@click.option('--full', is_flag=True, help='Recalcula todos os itens em vez de só os alterados.')
+def cli_insumos_similares(origem, full):
+    """Recalcula insumo_similar (vizinhos pré-calculados exibidos no detalhe do insumo)."""
+    for current in ([origem] if origem else ['BRAS', 'SIMPRO']):
+        total = _rebuild_insumo_similar(current, full=full)
+        click.echo(f'{current}: {total} vizinhos gravados em insumo_similar.')
+
+
+@app.cli.command('insumos:lsh')
+def cli_insumos_lsh():
+    """Reconstrói o índice MinHash/LSH de equivalências e grava em INSUMOS_LSH_PATH."""
+    started = time.perf_counter()
+    index = _rebuild_insumo_lsh_index()
+    click.echo(f'Índice LSH: {len(index)} itens em {time.perf_counter() - started:.1f}s ({INSUMOS_LSH_PATH}).')
+
+
+@app.cli.command('busca:reindex')
+def cli_busca_reindex():
+    """Recalcula as colunas normalizadas de busca (*_norm) de índice de insumos, CBHPM e procedimentos."""
+    for model in (InsumoIndex, CBHPMItem, Procedimento):
+        total = _backfill_search_norm(model)
+        click.echo(f'{model.__tablename__}: {total} linhas normalizadas.')
+
+
 @app.cli.command('insumos-import-worker')
 @click.option('--poll-interval', default=5, type=int, show_default=True, help='Tempo em segundos entre cada verificação de jobs pendentes.')
 @click.option('--run-once', is_flag=True, help='Processa apenas um job e encerra.')
@@ -4106,6 +6297,10 @@ class CBHPMRuleSet(db.Model):
     regras = db.Column(db.JSON, nullable=False, default=dict)
     criado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     atualizado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Incrementado pelo ORM a cada UPDATE; chave do cache de regras (o MySQL trunca atualizado_em no segundo).
+    revisao = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    __mapper_args__ = {'version_id_col': revisao}
 
 
 DEFAULT_CBHPM_RULES = {
@@ -4438,13 +6633,14 @@ def consulta_comparar():
                 elif q:
                     if search_code:
                         qv = qv.filter(or_(
-                            CBHPMItem.codigo == search_code,
-                            CBHPMItem.codigo.ilike(f"{search_code}%"),
-                            (CBHPMItem.procedimento.ilike(f"%{search_text}%") if search_text else False)
+                            _code_prefix_filter(CBHPMItem.codigo, CBHPMItem.codigo_norm, search_code),
+                            _text_contains_filter(CBHPMItem.procedimento_norm, search_text)
                         ))
                     else:
-                        like = f"%{q}%"
-                        qv = qv.filter(or_(CBHPMItem.codigo.ilike(like), CBHPMItem.procedimento.ilike(like)))
+                        qv = qv.filter(or_(
+                            _text_contains_filter(CBHPMItem.codigo_norm, q, code=True),
+                            _text_contains_filter(CBHPMItem.procedimento_norm, q)
+                        ))
 
                 for cod, desc, sub, tp, vp, tu, u, tf, f in qv.all():
                     v = sub or tp or vp or tu or u or tf or f
@@ -4462,13 +6658,14 @@ def consulta_comparar():
             elif q:
                 if search_code:
                     query = query.filter(or_(
-                        Procedimento.codigo == search_code,
-                        Procedimento.codigo.ilike(f"{search_code}%"),
-                        (Procedimento.descricao.ilike(f"%{search_text}%") if search_text else False)
+                        _code_prefix_filter(Procedimento.codigo, Procedimento.codigo_norm, search_code),
+                        _text_contains_filter(Procedimento.descricao_norm, search_text)
+                    ))
+                else:
+                    query = query.filter(or_(
+                        _text_contains_filter(Procedimento.codigo_norm, q, code=True),
+                        _text_contains_filter(Procedimento.descricao_norm, q)
                     ))
-                else:
-                    like = f"%{q}%"
-                    query = query.filter(or_(Procedimento.codigo.ilike(like), Procedimento.descricao.ilike(like)))
 
             prestadores_usados = set()
             for proc, prest in query.all():
@@ -4666,18 +6863,9 @@ def _compute_simulacao_cbhpm(data):
     t_ref = None
 
     target_code = codigo or (codigos[0] if codigos else '')
-    if target_code:
-        q = (db.session.query(CBHPMItem, Tabela)
-             .join(Tabela, CBHPMItem.id_tabela == Tabela.id))
-        if versao:
-            q = q.filter(Tabela.nome == versao)
-        q = q.filter(or_(CBHPMItem.codigo == target_code,
-                         CBHPMItem.codigo.ilike(f"{target_code}%")))
-        if uf:
-            q = q.filter(or_(CBHPMItem.uf == uf, Tabela.uf == uf))
-        row = q.first()
-        if row:
-            item, t_ref = row[0], row[1]
+    resolvidos = _resolve_cbhpm_itens([target_code, *codigos], versao=versao, uf=uf)
+    if target_code in resolvidos:
+        item, t_ref = resolvidos[target_code]
 
     if not t_ref and versao:
         t_ref = Tabela.query.filter_by(nome=versao).first()
@@ -4690,6 +6878,8 @@ def _compute_simulacao_cbhpm(data):
         t_ref = Tabela(nome='SIMULACAO', id_operadora=(op.id if op else 1))
 
     if uco_valor_in is not None:
+        # Cópia transiente: o UCO informado vale só para esta simulação e não suja a Tabela da sessão.
+        t_ref = Tabela(**{attr.key: getattr(t_ref, attr.key) for attr in db.inspect(Tabela).column_attrs})
         t_ref.uco_valor = uco_valor_in
 
     fracao_override = _as_decimal(data.get('fracao_porte'))
@@ -4745,20 +6935,9 @@ def _compute_simulacao_cbhpm(data):
             return val if val is not None else d0
 
         if codigos:
+            bases = []
             for cod in codigos:
-                it_item = None
-                if versao or cod:
-                    qit = (db.session.query(CBHPMItem, Tabela)
-                           .join(Tabela, CBHPMItem.id_tabela == Tabela.id))
-                    if versao:
-                        qit = qit.filter(Tabela.nome == versao)
-                    if cod:
-                        qit = qit.filter(or_(CBHPMItem.codigo == cod, CBHPMItem.codigo.ilike(f"{cod}%")))
-                    if uf:
-                        qit = qit.filter(or_(CBHPMItem.uf == uf, Tabela.uf == uf))
-                    rowi = qit.first()
-                    if rowi:
-                        it_item = rowi[0]
+                it_item = resolvidos[cod][0] if cod in resolvidos else None
 
                 base_i = CBHPMItem(
                     codigo=cod,
@@ -4795,12 +6974,25 @@ def _compute_simulacao_cbhpm(data):
                     base_i.total_filme = None
                 if uco_valor_in is not None:
                     base_i.total_uco = None
+                bases.append((cod, base_i))
+
+            porte_valores = _lookup_porte_valores_lote(
+                t_ref.id_operadora, t_ref.uf, (porte_hint or t_ref.nome),
+                [base_i.porte for _, base_i in bases if _as_decimal(base_i.valor_porte) is None],
+            )
+            porte_an_valores = _lookup_porte_valores_lote(
+                t_ref.id_operadora, t_ref.uf, (porte_an_hint or t_ref.nome),
+                [base_i.porte_anestesico for _, base_i in bases if _as_decimal(base_i.valor_porte_anestesico) is None],
+                anestesico=True,
+            )
 
+            for cod, base_i in bases:
                 br = compute_cbhpm_breakdown(
                     base_i, t_ref,
                     porte_hint=porte_hint, porte_an_hint=porte_an_hint,
                     ajuste_porte_pct=aj_porte_pct, ajuste_porte_an_pct=aj_an_pct,
-                    rules=ruleset_dict
+                    rules=ruleset_dict,
+                    porte_valores=porte_valores, porte_an_valores=porte_an_valores,
                 )
                 br = apply_via_entrada(br, cod)
                 item_out = {k: _stringify_for_output(v) for k, v in br.items()}
@@ -4827,7 +7019,7 @@ def _compute_simulacao_cbhpm(data):
                     }
                 })
 
-        reducoes = (ruleset_dict.get('porte') or {}).get('reducoes_simultaneos') or []
+        reducoes = ruleset_dict.reducoes_simultaneos
         if reducoes and len(cbhpm_results) > 1:
             ordered = sorted(
                 enumerate(cbhpm_results),
@@ -4838,17 +7030,9 @@ def _compute_simulacao_cbhpm(data):
                 original = entry['totals']['total_porte']
                 if original <= d0:
                     continue
-                factor_raw = reducoes[min(rank, len(reducoes) - 1)]
-                try:
-                    factor = Decimal(str(factor_raw))
-                except (InvalidOperation, ValueError):
+                factor = reducoes[min(rank, len(reducoes) - 1)]
+                if factor is None:
                     continue
-                if factor > Decimal('5'):
-                    factor = factor / Decimal('100')
-                if factor > Decimal('1'):
-                    factor = Decimal('1')
-                if factor < Decimal('0'):
-                    factor = Decimal('0')
                 adjusted = original * factor
                 if adjusted == original:
                     continue
@@ -5682,8 +7866,10 @@ def api_simulacao_dtp():
     if uf:
         query = query.filter(or_(Procedimento.uf == uf, t.uf == uf))
     if q:
-        like = f"%{q}%"
-        query = query.filter(or_(Procedimento.codigo == q, Procedimento.codigo.ilike(f"{q}%"), Procedimento.descricao.ilike(like)))
+        query = query.filter(or_(
+            _code_prefix_filter(Procedimento.codigo, Procedimento.codigo_norm, q),
+            _text_contains_filter(Procedimento.descricao_norm, q),
+        ))
     rows = query.order_by(Procedimento.codigo).limit(200).all()
     itens = [{'codigo': r.codigo, 'descricao': r.descricao, 'valor': (str(r.valor) if r.valor is not None else None)} for r in rows]
     total = sum([_as_decimal(r.valor) or Decimal('0') for r in rows])
@@ -5712,7 +7898,7 @@ def api_prestadores_por_codigo():
     if uf:
         q = q.filter(or_(Tabela.uf == uf, Procedimento.uf == uf))
     # Match por igualdade ou prefixo
-    q = q.filter(or_(Procedimento.codigo == codigo, Procedimento.codigo.ilike(f"{codigo}%")))
+    q = q.filter(_code_prefix_filter(Procedimento.codigo, Procedimento.codigo_norm, codigo))
     q = q.filter((Procedimento.prestador.isnot(None)) & (Procedimento.prestador != ''))
     prestadores = [r[0] for r in q.distinct().order_by(Procedimento.prestador).all()]
     return jsonify(prestadores)
@@ -5731,11 +7917,209 @@ def api_versoes_por_codigo():
     qv = db.session.query(Tabela.nome).join(CBHPMItem, CBHPMItem.id_tabela == Tabela.id).filter(Tabela.tipo_tabela == 'cbhpm')
     if uf:
         qv = qv.filter(or_(Tabela.uf == uf, CBHPMItem.uf == uf))
-    qv = qv.filter(or_(CBHPMItem.codigo == codigo, CBHPMItem.codigo.ilike(f"{codigo}%")))
+    qv = qv.filter(_code_prefix_filter(CBHPMItem.codigo, CBHPMItem.codigo_norm, codigo))
     versoes = [r[0] for r in qv.distinct().order_by(Tabela.nome).all()]
     return jsonify(versoes)
 
 
+class ProcedimentoSuggestIndex:
+    """Índice em memória para autocomplete de procedimentos.
+
+    As entradas ficam ordenadas por código (minúsculo), então um prefixo de
+    código vira um intervalo contíguo achado por ``bisect`` (a trie compacta);
+    as descrições dobradas alimentam um índice invertido de trigramas cujas
+    listas de postings também seguem a ordem do código.
+    """
+
+    def __init__(self, rows: Iterable[tuple]) -> None:
+        entries = sorted(
+            ((str(codigo).strip(), descricao, caminho, uf_item, uf_tabela)
+             for codigo, descricao, caminho, uf_item, uf_tabela in rows
+             if codigo and str(codigo).strip()),
+            key=lambda entry: entry[0].lower(),
+        )
+        self.entries = entries
+        self.codes = [entry[0].lower() for entry in entries]
+        self.folded = [_normalize_search_text(entry[1]) or '' for entry in entries]
+        self.trigrams: dict[str, list[int]] = {}
+        for idx, text in enumerate(self.folded):
+            for gram in {text[pos:pos + 3] for pos in range(len(text) - 2)}:
+                self.trigrams.setdefault(gram, []).append(idx)
+        self._bigram_keys: dict[str, list[str]] | None = None
+
+    def _code_range(self, term: str) -> Iterator[int]:
+        lo = bisect.bisect_left(self.codes, term)
+        hi = bisect.bisect_left(self.codes, term + '\uffff')
+        return iter(range(lo, hi))
+
+    def _description_candidates(self, term: str) -> Iterator[int]:
+        if len(term) >= 3:
+            postings = [self.trigrams.get(term[pos:pos + 3]) for pos in range(len(term) - 2)]
+            if any(posting is None for posting in postings):
+                return iter(())
+            # A menor lista dirige a varredura; o filtro final confere a substring.
+            return iter(min(postings, key=len))
+        if self._bigram_keys is None:
+            bigram_keys: dict[str, list[str]] = {}
+            for gram in self.trigrams:
+                bigram_keys.setdefault(gram[:2], []).append(gram)
+                bigram_keys.setdefault(gram[1:], []).append(gram)
+            self._bigram_keys = bigram_keys
+        grams = self._bigram_keys.get(term, [])
+        return heapq.merge(*(self.trigrams[gram] for gram in grams))
+
+    def search(self, term: str, *, uf: str | None = None, limit: int = 30) -> list[dict]:
+        code_term = term.lower()
+        desc_term = _normalize_search_text(term) or ''
+        items: list[dict] = []
+        seen_codes: set[str] = set()
+        last_idx = -1
+        for idx in heapq.merge(self._code_range(code_term), self._description_candidates(desc_term)):
+            if idx == last_idx:
+                continue
+            last_idx = idx
+            codigo, descricao, caminho, uf_item, uf_tabela = self.entries[idx]
+            if not self.codes[idx].startswith(code_term) and desc_term not in self.folded[idx]:
+                continue
+            if uf and uf not in (uf_item, uf_tabela):
+                continue
+            if codigo in seen_codes:
+                continue
+            seen_codes.add(codigo)
+            items.append({'codigo': codigo, 'descricao': descricao, 'caminho': caminho})
+            if len(items) >= limit:
+                break
+        return items
+
+
+_SUGGEST_INDEX_MAX = int(os.getenv('SUGGEST_INDEX_MAX', '16') or '16')
+_suggest_indexes: OrderedDict[tuple, tuple[int, ProcedimentoSuggestIndex]] = OrderedDict()
+_suggest_indexes_lock = threading.Lock()
+
+
+def _procedimentos_versao() -> int:
+    versao = (
+        db.session.query(CatalogoVersao.versao_publicada)
+        .filter(CatalogoVersao.fornecedor == CATALOGO_VERSAO_PROCEDIMENTOS)
+        .scalar()
+    )
+    return versao or 0
+
+
+def _load_suggest_rows(kind: str, tabela_id: int) -> list[tuple]:
+    if kind == 'cbhpm':
+        return (
+            db.session.query(CBHPMItem.codigo, CBHPMItem.procedimento, Tabela.nome, CBHPMItem.uf, Tabela.uf)
+            .join(Tabela, CBHPMItem.id_tabela == Tabela.id)
+            .filter(CBHPMItem.id_tabela == tabela_id)
+            .all()
+        )
+    return (
+        db.session.query(Procedimento.codigo, Procedimento.descricao, Tabela.nome, Procedimento.uf, Tabela.uf)
+        .join(Tabela, Procedimento.id_tabela == Tabela.id)
+        .filter(Procedimento.id_tabela == tabela_id)
+        .all()
+    )
+
+
+def _get_suggest_index(kind: str, tabela_id: int) -> ProcedimentoSuggestIndex:
+    """Índice de sugestões de uma tabela, reconstruído quando a versão de procedimentos muda."""
+    key = (kind, tabela_id)
+    versao = _procedimentos_versao()
+    with _suggest_indexes_lock:
+        cached = _suggest_indexes.get(key)
+        if cached is not None and cached[0] == versao:
+            _suggest_indexes.move_to_end(key)
+            return cached[1]
+    index = ProcedimentoSuggestIndex(_load_suggest_rows(kind, tabela_id))
+    with _suggest_indexes_lock:
+        _suggest_indexes[key] = (versao, index)
+        _suggest_indexes.move_to_end(key)
+        while len(_suggest_indexes) > _SUGGEST_INDEX_MAX:
+            _suggest_indexes.popitem(last=False)
+    return index
+
+
+def _suggest_cbhpm_all(term: str, *, uf: str | None = None, limit: int = 30) -> list[dict]:
+    """Sugestão sem tabela escolhida: consulta limitada em todas as tabelas CBHPM (sem índice em memória)."""
+    query = (
+        db.session.query(CBHPMItem.codigo, CBHPMItem.procedimento, Tabela.nome)
+        .join(Tabela, CBHPMItem.id_tabela == Tabela.id)
+        .filter(Tabela.tipo_tabela == 'cbhpm')
+    )
+    if uf:
+        query = query.filter(or_(CBHPMItem.uf == uf, Tabela.uf == uf))
+    conditions = [CBHPMItem.codigo.ilike(f'{term}%')]
+    normalized = _normalize_search_text(term)
+    if normalized:
+        conditions.append(CBHPMItem.procedimento_norm.like(f'%{normalized}%'))
+    query = query.filter(or_(*conditions)).order_by(CBHPMItem.codigo, CBHPMItem.id).limit(limit * 4)
+
+    items: list[dict] = []
+    seen_codes: set[str] = set()
+    for codigo, descricao, tabela_nome in query:
+        codigo_norm = (codigo or '').strip()
+        if not codigo_norm or codigo_norm in seen_codes:
+            continue
+        seen_codes.add(codigo_norm)
+        items.append({'codigo': codigo_norm, 'descricao': descricao, 'caminho': tabela_nome})
+        if len(items) >= limit:
+            break
+    return items
+
+
+def _increment_procedimentos_versao(session_) -> None:
+    """Incrementa a versão de procedimentos com um UPDATE atômico (sem SELECT ... FOR UPDATE)."""
+    table = CatalogoVersao.__table__
+    bump = (
+        table.update()
+        .where(table.c.fornecedor == CATALOGO_VERSAO_PROCEDIMENTOS)
+        .values(versao_publicada=table.c.versao_publicada + 1, publicado_em=datetime.utcnow())
+    )
+    if session_.execute(bump).rowcount:
+        return
+    try:
+        with session_.begin_nested():
+            session_.execute(
+                table.insert().values(
+                    fornecedor=CATALOGO_VERSAO_PROCEDIMENTOS,
+                    versao_publicada=1,
+                    versao_materializada=0,
+                    publicado_em=datetime.utcnow(),
+                )
+            )
+    except IntegrityError:
+        session_.execute(bump)
+
+
+@event.listens_for(db.session, 'before_flush')
+def _track_procedimentos_changes(session_, flush_context, instances) -> None:
+    # Importação/exclusão de tabelas invalida os índices de sugestão e o cache de portes de todos os workers.
+    if session_.info.get('procedimentos_versao_pending'):
+        return
+    tracked = (Tabela, Procedimento, CBHPMItem, PorteValorItem, PorteAnestesicoValorItem)
+    # ``dirty`` inclui objetos só tocados (atribuição sem mudança de valor); is_modified filtra esses.
+    changed = any(isinstance(obj, tracked) for obj in (*session_.new, *session_.deleted)) or any(
+        isinstance(obj, tracked) and session_.is_modified(obj) for obj in session_.dirty
+    )
+    if changed:
+        session_.info['procedimentos_versao_pending'] = True
+
+
+@event.listens_for(db.session, 'before_commit')
+def _bump_procedimentos_versao(session_) -> None:
+    # Uma vez por transação e só no commit: a linha compartilhada fica travada apenas até o COMMIT,
+    # não durante toda a importação.
+    session_.flush()
+    if session_.info.pop('procedimentos_versao_pending', None):
+        _increment_procedimentos_versao(session_)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _reset_procedimentos_versao_flag(session_) -> None:
+    session_.info.pop('procedimentos_versao_pending', None)
+
+
 @app.route('/api/procedimentos/suggest')
 @login_required
 def api_procedimentos_suggest():
@@ -5762,80 +8146,11 @@ def api_procedimentos_suggest():
     if tabela_nome:
         tabela = Tabela.query.filter(Tabela.nome == tabela_nome).first()
 
-    tabela_id = tabela.id if tabela else None
-
-    like_term = f"%{term}%"
-    code_prefix = f"{term}%"
-
-    items = []
-    seen_codes = set()
-
-    if tabela and tabela.tipo_tabela == 'cbhpm':
-        query = (
-            db.session.query(CBHPMItem.codigo, CBHPMItem.procedimento, Tabela.nome)
-            .join(Tabela, CBHPMItem.id_tabela == Tabela.id)
-            .filter(CBHPMItem.id_tabela == tabela_id)
-        )
-        if uf:
-            query = query.filter(or_(CBHPMItem.uf == uf, Tabela.uf == uf))
-        query = query.filter(or_(CBHPMItem.codigo.ilike(code_prefix), CBHPMItem.procedimento.ilike(like_term)))
-        query = query.order_by(CBHPMItem.codigo).limit(limit)
-        for codigo, descricao, versao_nome in query.all():
-            codigo_norm = (codigo or '').strip()
-            if not codigo_norm or codigo_norm in seen_codes:
-                continue
-            seen_codes.add(codigo_norm)
-            items.append({
-                'codigo': codigo_norm,
-                'descricao': descricao,
-                'caminho': versao_nome,
-            })
-    elif tabela:
-        query = (
-            db.session.query(Procedimento.codigo, Procedimento.descricao, Tabela.nome)
-            .join(Tabela, Procedimento.id_tabela == Tabela.id)
-            .filter(Procedimento.id_tabela == tabela_id)
-        )
-        if uf:
-            query = query.filter(or_(Tabela.uf == uf, Procedimento.uf == uf))
-        query = query.filter(or_(Procedimento.codigo.ilike(code_prefix), Procedimento.descricao.ilike(like_term)))
-        query = query.order_by(Procedimento.codigo).limit(limit)
-        for codigo, descricao, tabela_nome_row in query.all():
-            codigo_norm = (codigo or '').strip()
-            if not codigo_norm or codigo_norm in seen_codes:
-                continue
-            seen_codes.add(codigo_norm)
-            items.append({
-                'codigo': codigo_norm,
-                'descricao': descricao,
-                'caminho': tabela_nome_row,
-            })
-
-    # Se nenhuma tabela específica foi pedida (ou não encontrada), faz uma busca genérica
-    if not items and tabela is None:
-        cbhpm_query = (
-            db.session.query(CBHPMItem.codigo, CBHPMItem.procedimento, Tabela.nome)
-            .join(Tabela, CBHPMItem.id_tabela == Tabela.id)
-            .filter(Tabela.tipo_tabela == 'cbhpm')
-        )
-        if uf:
-            cbhpm_query = cbhpm_query.filter(or_(CBHPMItem.uf == uf, Tabela.uf == uf))
-        cbhpm_query = cbhpm_query.filter(or_(CBHPMItem.codigo.ilike(code_prefix), CBHPMItem.procedimento.ilike(like_term)))
-        cbhpm_query = cbhpm_query.order_by(CBHPMItem.codigo).limit(limit)
-        for codigo, descricao, versao_nome in cbhpm_query.all():
-            codigo_norm = (codigo or '').strip()
-            if not codigo_norm or codigo_norm in seen_codes:
-                continue
-            seen_codes.add(codigo_norm)
-            items.append({
-                'codigo': codigo_norm,
-                'descricao': descricao,
-                'caminho': versao_nome,
-            })
-            if len(items) >= limit:
-                break
-
-    return jsonify({'items': items[:limit]})
+    if tabela is None:
+        # Nenhuma tabela específica pedida (ou não encontrada): busca genérica no CBHPM
+        return jsonify({'items': _suggest_cbhpm_all(term, uf=uf or None, limit=limit)})
+    index = _get_suggest_index('cbhpm' if tabela.tipo_tabela == 'cbhpm' else 'procedimento', tabela.id)
+    return jsonify({'items': index.search(term, uf=uf or None, limit=limit)})
 
 
 @app.route('/api/cbhpm/detalhe')
@@ -6442,6 +8757,7 @@ def cbhpm_rules_new():
                 )
                 db.session.add(ruleset)
                 db.session.commit()
+                _invalidate_cbhpm_ruleset_cache()
                 return redirect(url_for('cbhpm_rules', status='created'))
             except Exception as exc:
                 db.session.rollback()
@@ -6491,6 +8807,7 @@ def cbhpm_rules_edit(ruleset_id: int):
                     ).update({'ativo': False}, synchronize_session=False)
                 ruleset.ativo = ativo
                 db.session.commit()
+                _invalidate_cbhpm_ruleset_cache()
                 return redirect(url_for('cbhpm_rules', status='updated'))
             except Exception as exc:
                 db.session.rollback()
@@ -6527,6 +8844,7 @@ def cbhpm_rules_activate(ruleset_id: int):
         ).update({'ativo': False}, synchronize_session=False)
         ruleset.ativo = True
         db.session.commit()
+        _invalidate_cbhpm_ruleset_cache()
     except Exception:
         db.session.rollback()
     return redirect(url_for('cbhpm_rules', status='activated'))
@@ -6672,6 +8990,11 @@ def ensure_db(max_retries: int = 20, delay_seconds: int = 3):
                     db.session.commit()
                 except Exception:
                     db.session.rollback()
+                try:
+                    db.session.execute(text("ALTER TABLE cbhpm_rulesets ADD COLUMN revisao INT NOT NULL DEFAULT 1"))
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
                 try:
                     db.session.execute(text("UPDATE usuarios SET acesso_insumos = COALESCE(acesso_insumos, 1), acesso_tuss_rol = COALESCE(acesso_tuss_rol, 1), must_reset_senha = COALESCE(must_reset_senha, 0), senha_atualizada_em = COALESCE(senha_atualizada_em, CURRENT_TIMESTAMP)"))
                     db.session.commit()
@@ -6708,6 +9031,37 @@ def ensure_db(max_retries: int = 20, delay_seconds: int = 3):
                     db.session.rollback()
                 # Garante criação da tabela CBHPM (se ainda não existir)
                 db.create_all()
+                try:
+                    _ensure_sqlite_fulltext()
+                except Exception:
+                    db.session.rollback()
+                try:
+                    # Backfill de insumos_index_uf em bases anteriores à tabela.
+                    if (
+                        db.session.query(InsumoIndexUf.uf).first() is None
+                        and db.session.query(InsumoIndex.item_id).filter(InsumoIndex.uf_referencia.isnot(None)).first()
+                    ):
+                        _rebuild_insumo_index_ufs()
+                except Exception:
+                    db.session.rollback()
+                # Migração leve: colunas normalizadas de busca (*_norm) + backfill em Python
+                for norm_model in (InsumoIndex, CBHPMItem, Procedimento):
+                    norm_table = norm_model.__tablename__
+                    added = False
+                    for norm_column in _SEARCH_NORM_COLUMNS[norm_model]:
+                        length = norm_model.__table__.c[norm_column].type.length
+                        try:
+                            db.session.execute(text(f"ALTER TABLE {norm_table} ADD COLUMN {norm_column} VARCHAR({length}) NULL"))
+                            db.session.execute(text(f"CREATE INDEX ix_{norm_table}_{norm_column} ON {norm_table} ({norm_column})"))
+                            db.session.commit()
+                            added = True
+                        except Exception:
+                            db.session.rollback()
+                    if added:
+                        try:
+                            _backfill_search_norm(norm_model)
+                        except Exception:
+                            db.session.rollback()
                 try:
                     usuarios = Usuario.query.all()
                     changed = False
@@ -7523,6 +9877,19 @@ def _serialize_contexto_clinico(
     }
 
 
+_SIMILAR_STOPWORDS = frozenset({'COM', 'DE', 'PARA', 'COMPOS', 'SEM', 'CAPS', 'CAPSULAS', 'TABLETE', 'ML', 'MG', 'G'})
+
+
+def _similar_description_tokens(description_norm: str | None) -> list[str]:
+    """Termos relevantes (4+ letras, sem números/stopwords) de uma descrição já normalizada, sem repetição."""
+    tokens: list[str] = []
+    for token in (description_norm or '').split():
+        if len(token) < 4 or token.isdigit() or token in _SIMILAR_STOPWORDS or token in tokens:
+            continue
+        tokens.append(token)
+    return tokens
+
+
 def _suggest_similar_items(
     origem: str,
     item_model: BrasItemNormalized | SimproItemNormalized | SimproItem,
@@ -7540,13 +9907,6 @@ def _suggest_similar_items(
             return ''
         return ''.join(ch for ch in str(value) if ch.isdigit())
 
-    def _normalize_description(text: str | None) -> str:
-        if not text:
-            return ''
-        normalized = unicodedata.normalize('NFKD', text)
-        normalized = re.sub(r'[^A-Za-z0-9 ]+', ' ', normalized)
-        return normalized.upper()
-
     ranked: dict[int, dict[str, object]] = {}
 
     def _register(rows: Sequence[InsumoIndex], base_score: int, reason: str | None = None) -> None:
@@ -7628,7 +9988,7 @@ def _suggest_similar_items(
             .filter(
                 InsumoIndex.origem == origem,
                 InsumoIndex.item_id != item_id,
-                func.replace(func.replace(func.coalesce(InsumoIndex.tuss, ''), '.', ''), '-', '').like(f"{tuss_prefix}%"),
+                InsumoIndex.tuss_norm.like(f"{tuss_prefix}%"),
             )
             .limit(safe_limit * 4)
             .all()
@@ -7651,7 +10011,7 @@ def _suggest_similar_items(
             .filter(
                 InsumoIndex.origem == origem,
                 InsumoIndex.item_id != item_id,
-                func.replace(func.replace(func.coalesce(InsumoIndex.tiss, ''), '.', ''), '-', '').like(f"{tiss_prefix}%"),
+                InsumoIndex.tiss_norm.like(f"{tiss_prefix}%"),
             )
             .limit(safe_limit * 3)
             .all()
@@ -7673,181 +10033,802 @@ def _suggest_similar_items(
             if cleaned:
                 substituto_codes.add(cleaned)
 
-    substituto_filters: list = []
-    for code in substituto_codes:
-        normalized = code.strip().upper()
-        digits = _extract_digits(code)
-        if normalized:
-            substituto_filters.append(func.upper(func.coalesce(InsumoIndex.tuss, '')) == normalized)
-            substituto_filters.append(func.upper(func.coalesce(InsumoIndex.tiss, '')) == normalized)
-        if digits and digits != normalized:
-            substituto_filters.append(func.upper(func.coalesce(InsumoIndex.tuss, '')) == digits)
-            substituto_filters.append(func.upper(func.coalesce(InsumoIndex.tiss, '')) == digits)
+    substituto_filters: list = []
+    for code in substituto_codes:
+        normalized = _normalize_search_code(code)
+        digits = _extract_digits(code)
+        for candidate in {normalized, digits} - {None, ''}:
+            substituto_filters.append(InsumoIndex.tuss_norm == candidate)
+            substituto_filters.append(InsumoIndex.tiss_norm == candidate)
+
+    if substituto_filters:
+        substituto_rows = (
+            InsumoIndex.query
+            .filter(
+                InsumoIndex.origem == origem,
+                InsumoIndex.item_id != item_id,
+                or_(*substituto_filters),
+            )
+            .limit(safe_limit * 3)
+            .all()
+        )
+        _register(substituto_rows, 440, 'Marcado como substituto clínico')
+
+    # --- Description tokens --------------------------------------------------
+    descricao_source = getattr(item_model, 'descricao', None)
+    if not descricao_source and isinstance(item_model, BrasItemNormalized):
+        descricao_source = ' '.join(
+            part for part in [item_model.produto_nome, item_model.apresentacao_descricao] if part
+        )
+    tokens = _similar_description_tokens(_normalize_search_text(descricao_source))[:6]
+    if tokens:
+        token_filters = [InsumoIndex.descricao_norm.like(f"%{token}%") for token in tokens]
+        token_rows = (
+            InsumoIndex.query
+            .filter(
+                InsumoIndex.origem == origem,
+                InsumoIndex.item_id != item_id,
+                or_(*token_filters),
+            )
+            .limit(safe_limit * 5)
+            .all()
+        )
+        for token in tokens:
+            token_rows_token = [
+                row for row in token_rows
+                if row.descricao_norm and token in row.descricao_norm
+            ]
+            if token_rows_token:
+                _register(token_rows_token, 160, f'Termo relevante: {token}')
+
+    if not ranked:
+        return []
+
+    def _sort_key(entry: dict) -> tuple:
+        row: InsumoIndex = entry['row']  # type: ignore[assignment]
+        descr = (row.descricao or '').strip().upper()
+        updated_at = entry.get('updated_at')
+        return (-entry['score'], descr, updated_at or datetime.min, row.item_id)
+
+    sorted_rows = sorted(ranked.values(), key=_sort_key)
+    sliced = sorted_rows[:safe_limit]
+    results: list[dict] = []
+    prices = _prefetch_insumo_prices([entry['row'] for entry in sliced])
+    for entry in sliced:
+        payload = _serialize_insumo_index(entry['row'], prices=prices)
+        reasons = entry.get('reasons')
+        if reasons:
+            payload['justificativas'] = sorted(reason for reason in reasons if reason)
+        payload['similaridade_score'] = entry['score']
+        results.append(payload)
+    return results
+
+
+def _similar_code_prefix(code_norm: str | None) -> str | None:
+    """Prefixo TUSS/TISS usado por ``_suggest_similar_items`` (5 dígitos, ou 4, com no mínimo 3)."""
+    digits = ''.join(ch for ch in (code_norm or '') if ch.isdigit())
+    prefix = digits[:5] if len(digits) >= 5 else digits[:4]
+    return prefix if len(prefix) >= 3 else None
+
+
+def _build_insumo_similar(
+    origem: str,
+    item_ids: Iterable[int] | None = None,
+    *,
+    top_k: int | None = None,
+    metrics: dict | None = None,
+) -> int:
+    """Grava em ``insumo_similar`` os ``top_k`` vizinhos de ``item_ids`` (todos quando ``None``).
+
+    Mesmos sinais e pesos de ``_suggest_similar_items`` (EAN 500, substituto 440,
+    ANVISA 360, prefixo TUSS 240/TISS 220, termo da descrição 160; vale o maior),
+    resolvidos por listas invertidas em memória em vez de consultas por item.
+    Termos da descrição casam por palavra inteira. ``metrics['itens_alterados']``
+    conta os itens cuja lista de vizinhos mudou.
+    """
+    top_k = max(1, int(top_k or INSUMOS_SIMILAR_TOPK))
+    cap = max(top_k * 5, 50)
+    calculado_em = db.session.execute(select(func.now())).scalar()
+
+    rows = {
+        row.item_id: row
+        for row in db.session.query(
+            InsumoIndex.item_id, InsumoIndex.descricao, InsumoIndex.descricao_norm, InsumoIndex.anvisa,
+            InsumoIndex.tuss_norm, InsumoIndex.tiss_norm, InsumoIndex.updated_at,
+        ).filter(InsumoIndex.origem == origem)
+    }
+    source_model = BrasItemNormalized if origem == 'BRAS' else SimproItemNormalized
+    eans = {
+        item_id: ean.strip()
+        for item_id, ean in db.session.query(source_model.id, source_model.ean).filter(source_model.ean.isnot(None))
+        if item_id in rows and ean.strip()
+    }
+    substitutos: dict[int, set[str]] = {}
+    for item_id, raw_codes in (
+        db.session.query(InsumoContextoClinico.item_id, InsumoContextoClinico.substitutos_raw)
+        .filter(InsumoContextoClinico.origem == origem, InsumoContextoClinico.substitutos_raw.isnot(None))
+    ):
+        for code in _split_substitutos(raw_codes):
+            digits = ''.join(ch for ch in code if ch.isdigit())
+            substitutos.setdefault(int(item_id), set()).update({_normalize_search_code(code), digits} - {None, ''})
+
+    postings: dict[tuple[str, str], list[int]] = {}
+
+    def _post(key: tuple[str, str], item_id: int) -> None:
+        postings.setdefault(key, []).append(item_id)
+
+    for item_id in sorted(rows):
+        row = rows[item_id]
+        if item_id in eans:
+            _post(('ean', eans[item_id]), item_id)
+        if row.anvisa and row.anvisa.strip():
+            _post(('anvisa', row.anvisa.strip()), item_id)
+        for kind, code in (('tuss', row.tuss_norm), ('tiss', row.tiss_norm)):
+            if not code:
+                continue
+            _post(('codigo', code), item_id)
+            for size in (3, 4, 5):
+                if len(code) >= size:
+                    _post((kind, code[:size]), item_id)
+        for token in _similar_description_tokens(row.descricao_norm):
+            _post(('termo', token), item_id)
+
+    def _neighbours(item_id: int) -> list[tuple[int, int, list[str]]]:
+        row = rows[item_id]
+        ranked: dict[int, list] = {}
+
+        def _register(key: tuple[str, str], score: int, reason: str, limit: int = cap) -> None:
+            for other_id in postings.get(key, ())[:limit + 1]:
+                if other_id == item_id:
+                    continue
+                entry = ranked.setdefault(other_id, [0, set()])
+                entry[0] = max(entry[0], score)
+                entry[1].add(reason)
+
+        if item_id in eans:
+            _register(('ean', eans[item_id]), 500, 'EAN idêntico')
+        if row.anvisa and row.anvisa.strip():
+            _register(('anvisa', row.anvisa.strip()), 360, 'Registro ANVISA compartilhado')
+        for kind, code, score, label in (
+            ('tuss', row.tuss_norm, 240, 'Prefixo TUSS'),
+            ('tiss', row.tiss_norm, 220, 'Prefixo TISS'),
+        ):
+            prefix = _similar_code_prefix(code)
+            if prefix:
+                _register((kind, prefix), score, f'{label} {prefix}')
+        for code in substitutos.get(item_id, ()):
+            _register(('codigo', code), 440, 'Marcado como substituto clínico')
+        for token in _similar_description_tokens(row.descricao_norm)[:6]:
+            _register(('termo', token), 160, f'Termo relevante: {token}')
+
+        ordered = sorted(
+            ranked.items(),
+            key=lambda entry: (
+                -entry[1][0],
+                (rows[entry[0]].descricao or '').strip().upper(),
+                rows[entry[0]].updated_at or datetime.min,
+                entry[0],
+            ),
+        )
+        return [(other_id, score, sorted(reasons)) for other_id, (score, reasons) in ordered[:top_k]]
+
+    targets = sorted(rows) if item_ids is None else sorted(set(int(item_id) for item_id in item_ids))
+
+    total = 0
+    alterados = 0
+    table = InsumoSimilar.__table__
+    for start in range(0, len(targets), IMPORT_DELTA_ID_CHUNK):
+        chunk = targets[start:start + IMPORT_DELTA_ID_CHUNK]
+        chunk_filter = (table.c.origem == origem, table.c.item_id.in_(chunk))
+        anteriores: dict[int, list[tuple]] = {}
+        for row in db.session.execute(
+            select(table.c.item_id, table.c.similar_id, table.c.score, table.c.justificativas)
+            .where(*chunk_filter)
+            .order_by(table.c.item_id, table.c.posicao)
+        ):
+            anteriores.setdefault(row.item_id, []).append((row.similar_id, row.score, row.justificativas))
+        db.session.execute(table.delete().where(*chunk_filter))
+        payload = [
+            {
+                'origem': origem,
+                'item_id': item_id,
+                'posicao': posicao,
+                'similar_id': other_id,
+                'score': score,
+                'justificativas': '|'.join(reasons)[:1000] or None,
+                'calculado_em': calculado_em,
+            }
+            for item_id in chunk if item_id in rows
+            for posicao, (other_id, score, reasons) in enumerate(_neighbours(item_id))
+        ]
+        novos: dict[int, list[tuple]] = {}
+        for entry in payload:
+            novos.setdefault(entry['item_id'], []).append(
+                (entry['similar_id'], entry['score'], entry['justificativas'])
+            )
+        alterados += sum(1 for item_id in chunk if anteriores.get(item_id, []) != novos.get(item_id, []))
+        if payload:
+            db.session.execute(table.insert(), payload)
+        db.session.commit()
+        total += len(payload)
+    if metrics is not None:
+        metrics['itens_alterados'] = alterados
+    return total
+
+
+def _changed_similar_items(origem: str) -> list[int] | None:
+    """Itens cujos vizinhos precisam ser recalculados desde a última construção (``None``: tudo).
+
+    Itens com cadastro alterado depois do último ``calculado_em`` (o upsert do índice só
+    avança ``updated_at`` nesse caso, ver _INDEX_UPDATED_AT_SQL), quem os lista como vizinho e
+    quem compartilha EAN/ANVISA/código com eles; os demais podem ganhar um vizinho
+    novo só por prefixo ou termo até a próxima reconstrução completa.
+    """
+    ultimo = db.session.query(func.max(InsumoSimilar.calculado_em)).filter(InsumoSimilar.origem == origem).scalar()
+    if ultimo is None:
+        return None
+    source_model = BrasItemNormalized if origem == 'BRAS' else SimproItemNormalized
+    changed = [
+        item_id for (item_id,) in db.session.query(InsumoIndex.item_id).filter(
+            InsumoIndex.origem == origem, InsumoIndex.updated_at >= ultimo,
+        )
+    ]
+    if not changed:
+        return []
+    affected = set(changed)
+    for start in range(0, len(changed), IMPORT_DELTA_ID_CHUNK):
+        chunk = changed[start:start + IMPORT_DELTA_ID_CHUNK]
+        affected.update(
+            item_id for (item_id,) in db.session.query(InsumoSimilar.item_id).filter(
+                InsumoSimilar.origem == origem, InsumoSimilar.similar_id.in_(chunk),
+            )
+        )
+        changed_rows = db.session.query(InsumoIndex.anvisa, InsumoIndex.tuss_norm, InsumoIndex.tiss_norm).filter(
+            InsumoIndex.origem == origem, InsumoIndex.item_id.in_(chunk),
+        ).all()
+        anvisas = {row.anvisa for row in changed_rows if row.anvisa}
+        codes = {code for row in changed_rows for code in (row.tuss_norm, row.tiss_norm) if code}
+        filters = []
+        if anvisas:
+            filters.append(InsumoIndex.anvisa.in_(anvisas))
+        if codes:
+            filters.extend([InsumoIndex.tuss_norm.in_(codes), InsumoIndex.tiss_norm.in_(codes)])
+        if filters:
+            affected.update(
+                item_id for (item_id,) in db.session.query(InsumoIndex.item_id).filter(
+                    InsumoIndex.origem == origem, or_(*filters),
+                )
+            )
+        # O EAN não fica no índice: vem da tabela normalizada (id = item_id), como em _build_insumo_similar.
+        eans = {
+            ean.strip()
+            for (ean,) in db.session.query(source_model.ean).filter(
+                source_model.id.in_(chunk), source_model.ean.isnot(None),
+            )
+            if ean.strip()
+        }
+        if eans:
+            affected.update(
+                item_id for (item_id,) in db.session.query(InsumoIndex.item_id)
+                .join(source_model, source_model.id == InsumoIndex.item_id)
+                .filter(InsumoIndex.origem == origem, source_model.ean.in_(eans))
+            )
+    return sorted(affected)
+
+
+def _purge_orphan_similar(origem: str) -> tuple[int, set[int]]:
+    """Remove de ``insumo_similar`` linhas cujo item ou vizinho saiu de ``insumos_index``.
+
+    Retorna quantas linhas saíram e os itens que perderam um vizinho (a recalcular).
+    """
+    table = InsumoSimilar.__table__
+    index_table = InsumoIndex.__table__
+
+    def _missing(column):
+        return ~select(index_table.c.item_id).where(
+            index_table.c.origem == table.c.origem, index_table.c.item_id == column,
+        ).exists()
+
+    lost_neighbour = set(
+        db.session.execute(
+            select(table.c.item_id).distinct().where(
+                table.c.origem == origem, _missing(table.c.similar_id), ~_missing(table.c.item_id),
+            )
+        ).scalars()
+    )
+    removed = db.session.execute(
+        table.delete().where(table.c.origem == origem, or_(_missing(table.c.item_id), _missing(table.c.similar_id)))
+    ).rowcount or 0
+    db.session.commit()
+    return removed, lost_neighbour
+
+
+def _rebuild_insumo_similar(origem: str, *, full: bool = False) -> int:
+    removed, lost_neighbour = _purge_orphan_similar(origem)
+    item_ids = None if full else _changed_similar_items(origem)
+    if item_ids is not None:
+        item_ids = sorted(set(item_ids) | lost_neighbour)
+    metrics: dict = {}
+    total = _build_insumo_similar(origem, item_ids, metrics=metrics) if item_ids != [] else 0
+    if metrics.get('itens_alterados') or removed:
+        # Os similares entram no detalhe, cujo cache é chaveado pela versão do índice:
+        # só invalida quando alguma lista de vizinhos mudou de fato.
+        _bump_catalogo_versao(CATALOGO_VERSAO_INDEX)
+        db.session.commit()
+    return total
+
+
+# origem → houve novo pedido enquanto o recálculo rodava (roda de novo ao terminar).
+_similar_rebuild_pending: dict[str, bool] = {}
+_similar_rebuild_lock = threading.Lock()
+
+
+def _schedule_similar_rebuild(origem: str) -> None:
+    """Agenda o recálculo incremental de ``insumo_similar`` numa thread; pedidos repetidos se agrupam.
+
+    A origem fica pendente até o fim da execução, então nunca há duas rodando juntas; um
+    pedido feito no meio dela gera uma única nova rodada.
+    """
+    mode = (os.getenv('INSUMOS_SIMILAR_REBUILD') or 'background').strip().lower()
+    if mode == 'off':
+        return
+    if mode == 'inline':
+        _rebuild_insumo_similar(origem)
+        return
+
+    with _similar_rebuild_lock:
+        if origem in _similar_rebuild_pending:
+            _similar_rebuild_pending[origem] = True
+            return
+        _similar_rebuild_pending[origem] = False
+
+    def _runner():
+        while True:
+            try:
+                with app.app_context():
+                    try:
+                        _rebuild_insumo_similar(origem)
+                    finally:
+                        db.session.remove()
+            except Exception as exc:  # noqa: BLE001
+                app.logger.exception('Falha ao recalcular similares de %s', origem, exc_info=exc)
+            with _similar_rebuild_lock:
+                if not _similar_rebuild_pending.get(origem):
+                    _similar_rebuild_pending.pop(origem, None)
+                    return
+                _similar_rebuild_pending[origem] = False
+
+    thread = threading.Thread(target=_runner, name=f'InsumoSimilar-{origem}', daemon=True)
+    thread.start()
+
+
+def _load_similar_items(origem: str, item_id: int, *, limit: int = 5) -> list[dict]:
+    """Similares pré-calculados do item: uma leitura pela chave de ``insumo_similar``."""
+    rows = (
+        db.session.query(InsumoSimilar, InsumoIndex)
+        .join(
+            InsumoIndex,
+            and_(InsumoIndex.origem == InsumoSimilar.origem, InsumoIndex.item_id == InsumoSimilar.similar_id),
+        )
+        .filter(InsumoSimilar.origem == origem, InsumoSimilar.item_id == item_id)
+        .order_by(InsumoSimilar.posicao)
+        .limit(max(1, int(limit or 5)))
+        .all()
+    )
+    prices = _prefetch_insumo_prices([index_row for _, index_row in rows])
+    results: list[dict] = []
+    for similar, index_row in rows:
+        payload = _serialize_insumo_index(index_row, prices=prices)
+        if similar.justificativas:
+            payload['justificativas'] = similar.justificativas.split('|')
+        payload['similaridade_score'] = similar.score
+        results.append(payload)
+    return results
+
+
+def _minhash_hash_params(count: int, prime: int, *, seed: int) -> tuple[tuple[int, int], ...]:
+    """Coeficientes (a, b) das funções ``(a * x + b) mod prime`` do MinHash, fixos pela semente."""
+    rng = random.Random(seed)
+    return tuple((rng.randrange(1, prime), rng.randrange(0, prime)) for _ in range(count))
+
+
+class InsumoLSHIndex:
+    """MinHash + LSH sobre as descrições normalizadas de ``insumos_index`` (BRAS e SIMPRO juntos).
+
+    Cada descrição vira o conjunto de shingles de ``SHINGLE`` caracteres; a
+    assinatura guarda, para cada uma das ``NUM_PERM`` funções
+    ``(a * crc32(shingle) + b) mod PRIME`` (truncada em 32 bits), o menor valor.
+    A assinatura é cortada em ``BANDS`` bandas e itens com alguma banda
+    idêntica viram candidatos (limiar ~0,5 de Jaccard). Cada banda é um array
+    ordenado de (hash da banda, posição) buscado com ``bisect``: compacto e
+    gravado em disco como arrays binários com um cabeçalho JSON.
+    """
+
+    FORMAT = 2
+    NUM_PERM = 64
+    BANDS = 16
+    SHINGLE = 4
+    ORIGENS = ('BRAS', 'SIMPRO')
+    PRIME = (1 << 61) - 1
+    _HASHES = _minhash_hash_params(NUM_PERM, PRIME, seed=20241019)
+
+    def __init__(self, keys: array, signatures: array, band_hashes: list, band_positions: list, *, versao: int = 0):
+        self.keys = keys                      # (origem << 32 | item_id), ordenado
+        self.signatures = signatures          # NUM_PERM valores por posição de ``keys``
+        self.band_hashes = band_hashes        # por banda: hashes ordenados
+        self.band_positions = band_positions  # por banda: posições alinhadas a ``band_hashes``
+        self.versao = versao
+
+    @classmethod
+    def _signature(cls, descricao_norm: str | None) -> list[int] | None:
+        data = (descricao_norm or '').encode()
+        if not data:
+            return None
+        size = cls.SHINGLE
+        shingles = list({zlib.crc32(data[pos:pos + size]) for pos in range(max(len(data) - size + 1, 1))})
+        prime = cls.PRIME
+        return [min([(a * value + b) % prime for value in shingles]) & 0xFFFFFFFF for a, b in cls._HASHES]
+
+    @classmethod
+    def _band_keys(cls, signature: Sequence[int]) -> list[int]:
+        rows = cls.NUM_PERM // cls.BANDS
+        return [
+            zlib.crc32(array('I', signature[band * rows:(band + 1) * rows]).tobytes())
+            for band in range(cls.BANDS)
+        ]
+
+    @classmethod
+    def _key(cls, origem: str, item_id: int) -> int:
+        return (cls.ORIGENS.index(origem) << 32) | int(item_id)
+
+    @classmethod
+    def build(cls, rows: Iterable[tuple], *, versao: int = 0) -> 'InsumoLSHIndex':
+        """``rows``: (origem, item_id, descricao_norm)."""
+        entries = []
+        for origem, item_id, descricao_norm in rows:
+            signature = cls._signature(descricao_norm)
+            if signature is not None:
+                entries.append((cls._key(origem, item_id), signature))
+        entries.sort(key=itemgetter(0))
+        keys = array('Q', (key for key, _ in entries))
+        signatures = array('I')
+        bands: list[list[tuple[int, int]]] = [[] for _ in range(cls.BANDS)]
+        for position, (_, signature) in enumerate(entries):
+            signatures.extend(signature)
+            for band, band_key in enumerate(cls._band_keys(signature)):
+                bands[band].append((band_key, position))
+        band_hashes, band_positions = [], []
+        for band in bands:
+            band.sort()
+            band_hashes.append(array('I', (band_key for band_key, _ in band)))
+            band_positions.append(array('I', (position for _, position in band)))
+        return cls(keys, signatures, band_hashes, band_positions, versao=versao)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _position(self, origem: str, item_id: int) -> int | None:
+        key = self._key(origem, item_id)
+        position = bisect.bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            return position
+        return None
+
+    def candidates(
+        self,
+        origem: str,
+        item_id: int,
+        *,
+        escopo: str = 'outra',
+        min_sim: float = 0.5,
+        limit: int = 10,
+    ) -> list[tuple[str, int, float]]:
+        """Vizinhos (origem, item_id, Jaccard estimado); ``escopo``: ``outra``, ``mesma`` ou ``todas`` as origens."""
+        position = self._position(origem, item_id)
+        if position is None:
+            return []
+        width = self.NUM_PERM
+        signature = self.signatures[position * width:(position + 1) * width]
+        found: set[int] = set()
+        for band, band_key in enumerate(self._band_keys(signature)):
+            hashes = self.band_hashes[band]
+            idx = bisect.bisect_left(hashes, band_key)
+            while idx < len(hashes) and hashes[idx] == band_key:
+                found.add(self.band_positions[band][idx])
+                idx += 1
+        found.discard(position)
+
+        origem_code = self.ORIGENS.index(origem)
+        results = []
+        for other in found:
+            other_origem = self.keys[other] >> 32
+            if (escopo == 'outra' and other_origem == origem_code) or (escopo == 'mesma' and other_origem != origem_code):
+                continue
+            other_signature = self.signatures[other * width:(other + 1) * width]
+            similarity = sum(1 for a, b in zip(signature, other_signature) if a == b) / width
+            if similarity >= min_sim:
+                results.append((self.ORIGENS[other_origem], self.keys[other] & 0xFFFFFFFF, similarity))
+        results.sort(key=lambda entry: (-entry[2], entry[0], entry[1]))
+        return results[:limit]
+
+    def save(self, path: str) -> None:
+        """Grava atomicamente (arquivo temporário + ``os.replace``) para outros workers lerem.
+
+        Layout: uma linha de cabeçalho JSON (parâmetros, versão, tamanhos) seguida
+        dos arrays em binário, na ordem ``keys``, ``signatures`` e, por banda,
+        hashes e posições.
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        arrays = [self.keys, self.signatures, *self.band_hashes, *self.band_positions]
+        header = {
+            'format': self.FORMAT,
+            'num_perm': self.NUM_PERM,
+            'bands': self.BANDS,
+            'shingle': self.SHINGLE,
+            'versao': self.versao,
+            'byteorder': sys.byteorder,
+            'arrays': [[values.typecode, values.itemsize, len(values)] for values in arrays],
+        }
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as fh:
+            fh.write(json.dumps(header, separators=(',', ':')).encode('utf-8') + b'\n')
+            for values in arrays:
+                values.tofile(fh)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'InsumoLSHIndex | None':
+        """Lê um índice gravado por ``save``; ``None`` se ausente, ilegível ou de parâmetros diferentes."""
+        try:
+            with open(path, 'rb') as fh:
+                header = json.loads(fh.readline().decode('utf-8'))
+                expected = (cls.FORMAT, cls.NUM_PERM, cls.BANDS, cls.SHINGLE)
+                if (header.get('format'), header.get('num_perm'), header.get('bands'), header.get('shingle')) != expected:
+                    return None
+                arrays = []
+                for typecode, itemsize, length in header['arrays']:
+                    values = array(typecode)
+                    if values.itemsize != itemsize:
+                        return None
+                    values.fromfile(fh, length)
+                    if header.get('byteorder') != sys.byteorder:
+                        values.byteswap()
+                    arrays.append(values)
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError, EOFError, UnicodeDecodeError) as exc:
+            app.logger.warning('Índice LSH ilegível em %s (%s).', path, exc)
+            return None
+        if len(arrays) != 2 + 2 * cls.BANDS:
+            return None
+        keys, signatures, *bands = arrays
+        return cls(keys, signatures, bands[:cls.BANDS], bands[cls.BANDS:], versao=header.get('versao') or 0)
+
+
+_insumo_lsh_state: dict[str, object] = {'index': None, 'mtime': None}
+_insumo_lsh_lock = threading.Lock()
+
+
+def _rebuild_insumo_lsh_index(path: str | None = None) -> InsumoLSHIndex:
+    """Reconstrói o índice LSH a partir de ``insumos_index`` e grava em ``INSUMOS_LSH_PATH``."""
+    path = path or INSUMOS_LSH_PATH
+    versao = (
+        db.session.query(CatalogoVersao.versao_publicada)
+        .filter(CatalogoVersao.fornecedor == CATALOGO_VERSAO_INDEX)
+        .scalar()
+    ) or 0
+    rows = db.session.query(InsumoIndex.origem, InsumoIndex.item_id, InsumoIndex.descricao_norm).filter(
+        InsumoIndex.descricao_norm.isnot(None)
+    )
+    index = InsumoLSHIndex.build(rows, versao=versao)
+    index.save(path)
+    with _insumo_lsh_lock:
+        _insumo_lsh_state.update(index=index, mtime=os.stat(path).st_mtime_ns)
+    return index
 
-    if substituto_filters:
-        substituto_rows = (
-            InsumoIndex.query
-            .filter(
-                InsumoIndex.origem == origem,
-                InsumoIndex.item_id != item_id,
-                or_(*substituto_filters),
-            )
-            .limit(safe_limit * 3)
-            .all()
-        )
-        _register(substituto_rows, 440, 'Marcado como substituto clínico')
 
-    # --- Description tokens --------------------------------------------------
-    descricao_source = getattr(item_model, 'descricao', None)
-    if not descricao_source and isinstance(item_model, BrasItemNormalized):
-        descricao_source = ' '.join(
-            part for part in [item_model.produto_nome, item_model.apresentacao_descricao] if part
-        )
-    description_norm = _normalize_description(descricao_source)
-    tokens: list[str] = []
-    if description_norm:
-        seen = set()
-        stopwords = {'COM', 'DE', 'PARA', 'COMPOS', 'SEM', 'CAPS', 'CAPSULAS', 'TABLETE', 'ML', 'MG', 'G'}
-        for token in description_norm.split():
-            if len(token) < 4:
-                continue
-            if token.isdigit():
-                continue
-            if token in stopwords:
-                continue
-            if token in seen:
+# Reconstrução agendada pelos jobs de importação: ``deadline`` é adiado a cada pedido.
+_insumo_lsh_rebuild: dict[str, object] = {'deadline': None, 'scheduled': False}
+_insumo_lsh_rebuild_lock = threading.Lock()
+
+
+def _schedule_insumo_lsh_rebuild() -> None:
+    """Agenda a reconstrução do índice LSH numa thread, após INSUMOS_LSH_DEBOUNCE segundos sem novos pedidos.
+
+    Importações em sequência geram uma só reconstrução; nunca há duas rodando juntas.
+    """
+    mode = (os.getenv('INSUMOS_LSH_REBUILD') or 'background').strip().lower()
+    if mode == 'off':
+        return
+    if mode == 'inline':
+        _rebuild_insumo_lsh_index()
+        return
+
+    with _insumo_lsh_rebuild_lock:
+        _insumo_lsh_rebuild['deadline'] = time.monotonic() + INSUMOS_LSH_DEBOUNCE
+        if _insumo_lsh_rebuild['scheduled']:
+            return
+        _insumo_lsh_rebuild['scheduled'] = True
+
+    def _runner():
+        while True:
+            with _insumo_lsh_rebuild_lock:
+                deadline = _insumo_lsh_rebuild['deadline']
+                if deadline is None:
+                    _insumo_lsh_rebuild['scheduled'] = False
+                    return
+                wait = deadline - time.monotonic()
+                if wait <= 0:
+                    _insumo_lsh_rebuild['deadline'] = None
+            if wait > 0:
+                time.sleep(wait)
                 continue
-            seen.add(token)
-            tokens.append(token)
-            if len(tokens) >= 6:
-                break
+            try:
+                with app.app_context():
+                    try:
+                        _rebuild_insumo_lsh_index()
+                    finally:
+                        db.session.remove()
+            except Exception as exc:  # noqa: BLE001
+                app.logger.exception('Falha ao reconstruir o índice LSH', exc_info=exc)
 
-    if tokens:
-        token_filters = [func.upper(func.coalesce(InsumoIndex.descricao, '')).like(f"%{token}%") for token in tokens]
-        token_rows = (
-            InsumoIndex.query
-            .filter(
-                InsumoIndex.origem == origem,
-                InsumoIndex.item_id != item_id,
-                or_(*token_filters),
-            )
-            .limit(safe_limit * 5)
-            .all()
-        )
-        for token in tokens:
-            token_rows_token = [
-                row for row in token_rows
-                if row.descricao and token in row.descricao.upper()
-            ]
-            if token_rows_token:
-                _register(token_rows_token, 160, f'Termo relevante: {token}')
+    thread = threading.Thread(target=_runner, name='InsumoLSH', daemon=True)
+    thread.start()
 
-    if not ranked:
-        return []
 
-    def _sort_key(entry: dict) -> tuple:
-        row: InsumoIndex = entry['row']  # type: ignore[assignment]
-        descr = (row.descricao or '').strip().upper()
-        updated_at = entry.get('updated_at')
-        return (-entry['score'], descr, updated_at or datetime.min, row.item_id)
+def _get_insumo_lsh_index() -> InsumoLSHIndex | None:
+    """Índice LSH do processo: lido do disco (e relido quando outro worker o regrava).
 
-    sorted_rows = sorted(ranked.values(), key=_sort_key)
-    sliced = sorted_rows[:safe_limit]
-    results: list[dict] = []
-    for entry in sliced:
-        payload = _serialize_insumo_index(entry['row'])
-        reasons = entry.get('reasons')
-        if reasons:
-            payload['justificativas'] = sorted(reason for reason in reasons if reason)
-        payload['similaridade_score'] = entry['score']
-        results.append(payload)
-    return results
+    Nunca é construído aqui: a construção fica com ``flask insumos:lsh`` e com a
+    reconstrução agendada pelos jobs de importação. ``None`` enquanto não houver arquivo válido.
+    """
+    try:
+        mtime = os.stat(INSUMOS_LSH_PATH).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    with _insumo_lsh_lock:
+        cached = _insumo_lsh_state['index']
+        if cached is not None and mtime is not None and _insumo_lsh_state['mtime'] == mtime:
+            return cached  # type: ignore[return-value]
+    if mtime is not None:
+        index = InsumoLSHIndex.load(INSUMOS_LSH_PATH)
+        if index is not None:
+            with _insumo_lsh_lock:
+                _insumo_lsh_state.update(index=index, mtime=mtime)
+            return index
+    return None
 
 
-def _lookup_porte_valor(operadora_id, uf, nome_hint, porte_codigo):
-    if not porte_codigo:
-        return None
-    q = Tabela.query.filter(Tabela.tipo_tabela == 'porte', Tabela.id_operadora == operadora_id)
+_PORTE_CACHE_MAX = int(os.getenv('PORTE_CACHE_MAX', '64') or '64')
+_porte_resolucoes: OrderedDict[tuple, tuple[int, tuple]] = OrderedDict()
+_porte_resolucoes_lock = threading.Lock()
+
+
+def _invalidate_porte_cache() -> None:
+    with _porte_resolucoes_lock:
+        _porte_resolucoes.clear()
+    if has_request_context():
+        g.pop('porte_resolucoes', None)
+
+
+def _porte_tabelas_candidatas(operadora_id, uf, nome_hint, tipo: str) -> tuple:
+    """Tabelas de porte na ordem de preferência (nome parecido com o hint, depois a
+    mais recente), cada uma com o mapa porte→valor completo: ((nome, {porte: valor}), ...).
+
+    Memorizado por requisição e entre requisições; a versão de procedimentos
+    (incrementada a cada escrita em tabelas) invalida o cache dos demais workers.
+    """
+    key = (operadora_id, uf or None, nome_hint or None, tipo)
+    por_requisicao = g.setdefault('porte_resolucoes', {}) if has_request_context() else {}
+    if key in por_requisicao:
+        return por_requisicao[key]
+    versao = _procedimentos_versao()
+    with _porte_resolucoes_lock:
+        cached = _porte_resolucoes.get(key)
+        if cached is not None and cached[0] == versao:
+            _porte_resolucoes.move_to_end(key)
+            por_requisicao[key] = cached[1]
+            return cached[1]
+
+    if tipo == 'porte_anestesico':
+        model, porte_col = PorteAnestesicoValorItem, PorteAnestesicoValorItem.porte_an
+    else:
+        model, porte_col = PorteValorItem, PorteValorItem.porte
+    q = Tabela.query.filter(Tabela.tipo_tabela == tipo, Tabela.id_operadora == operadora_id)
     if uf:
         q = q.filter(Tabela.uf == uf)
-    # Se existir alguma com nome próximo ao hint, prefere
+    ordem = (Tabela.data_vigencia.is_(None), Tabela.data_vigencia.desc())
+    candidatas = []
     if nome_hint:
-        cand = q.filter(Tabela.nome.ilike(f"%{nome_hint}%")).order_by(Tabela.data_vigencia.is_(None), Tabela.data_vigencia.desc()).first()
-        if cand:
-            pv = PorteValorItem.query.filter_by(id_tabela=cand.id, porte=str(porte_codigo)).first()
-            if pv:
-                return pv.valor
-    # Fallback: mais recente
-    cand = q.order_by(Tabela.data_vigencia.is_(None), Tabela.data_vigencia.desc()).first()
-    if cand:
-        pv = PorteValorItem.query.filter_by(id_tabela=cand.id, porte=str(porte_codigo)).first()
-        if pv:
-            return pv.valor
-    return None
+        candidatas.append(q.filter(Tabela.nome.ilike(f"%{nome_hint}%")).order_by(*ordem).first())
+    candidatas.append(q.order_by(*ordem).first())
+    tabelas = {cand.id: cand.nome for cand in candidatas if cand}
+    mapas: dict[int, dict[str, Decimal]] = {tabela_id: {} for tabela_id in tabelas}
+    if tabelas:
+        rows = (
+            db.session.query(model.id_tabela, porte_col, model.valor)
+            .filter(model.id_tabela.in_(list(tabelas)))
+            .order_by(model.id)
+        )
+        for tabela_id, porte, valor in rows:
+            mapas[tabela_id].setdefault(porte, valor)
+    resolucao = tuple((nome, mapas[tabela_id]) for tabela_id, nome in tabelas.items())
+
+    with _porte_resolucoes_lock:
+        _porte_resolucoes[key] = (versao, resolucao)
+        _porte_resolucoes.move_to_end(key)
+        while len(_porte_resolucoes) > _PORTE_CACHE_MAX:
+            _porte_resolucoes.popitem(last=False)
+    por_requisicao[key] = resolucao
+    return resolucao
+
+
+def _resolve_porte(operadora_id, uf, nome_hint, porte_codigo, *, anestesico: bool = False):
+    """(valor, nome da tabela) do porte: primeira tabela candidata que o contém."""
+    if not porte_codigo:
+        return None, None
+    tipo = 'porte_anestesico' if anestesico else 'porte'
+    for nome, valores in _porte_tabelas_candidatas(operadora_id, uf, nome_hint, tipo):
+        if str(porte_codigo) in valores:
+            return valores[str(porte_codigo)], nome
+    return None, None
+
+
+def _lookup_porte_valor(operadora_id, uf, nome_hint, porte_codigo):
+    return _resolve_porte(operadora_id, uf, nome_hint, porte_codigo)[0]
 
 
 def _lookup_porte_an_valor(operadora_id, uf, nome_hint, porte_an):
-    if not porte_an:
-        return None
-    q = Tabela.query.filter(Tabela.tipo_tabela == 'porte_anestesico', Tabela.id_operadora == operadora_id)
-    if uf:
-        q = q.filter(Tabela.uf == uf)
-    if nome_hint:
-        cand = q.filter(Tabela.nome.ilike(f"%{nome_hint}%")).order_by(Tabela.data_vigencia.is_(None), Tabela.data_vigencia.desc()).first()
-        if cand:
-            pv = PorteAnestesicoValorItem.query.filter_by(id_tabela=cand.id, porte_an=str(porte_an)).first()
-            if pv:
-                return pv.valor
-    cand = q.order_by(Tabela.data_vigencia.is_(None), Tabela.data_vigencia.desc()).first()
-    if cand:
-        pv = PorteAnestesicoValorItem.query.filter_by(id_tabela=cand.id, porte_an=str(porte_an)).first()
-        if pv:
-            return pv.valor
-    return None
+    return _resolve_porte(operadora_id, uf, nome_hint, porte_an, anestesico=True)[0]
 
 
 def _resolve_porte_tabela_nome(operadora_id, uf, nome_hint, porte_codigo):
-    """Resolve o nome da tabela de Porte utilizada seguindo a mesma heurística
-    de _lookup_porte_valor (preferindo por hint; fallback mais recente)."""
-    if not porte_codigo:
-        return None
-    q = Tabela.query.filter(Tabela.tipo_tabela == 'porte', Tabela.id_operadora == operadora_id)
-    if uf:
-        q = q.filter(Tabela.uf == uf)
-    if nome_hint:
-        cand = q.filter(Tabela.nome.ilike(f"%{nome_hint}%")).order_by(Tabela.data_vigencia.is_(None), Tabela.data_vigencia.desc()).first()
-        if cand:
-            pv = PorteValorItem.query.filter_by(id_tabela=cand.id, porte=str(porte_codigo)).first()
-            if pv:
-                return cand.nome
-    cand = q.order_by(Tabela.data_vigencia.is_(None), Tabela.data_vigencia.desc()).first()
-    if cand:
-        pv = PorteValorItem.query.filter_by(id_tabela=cand.id, porte=str(porte_codigo)).first()
-        if pv:
-            return cand.nome
-    return None
+    """Nome da tabela de Porte usada por _lookup_porte_valor (mesma resolução)."""
+    return _resolve_porte(operadora_id, uf, nome_hint, porte_codigo)[1]
 
 
 def _resolve_porte_an_tabela_nome(operadora_id, uf, nome_hint, porte_an):
-    """Resolve o nome da tabela de Porte Anestésico utilizada seguindo a mesma
-    heurística de _lookup_porte_an_valor."""
-    if not porte_an:
-        return None
-    q = Tabela.query.filter(Tabela.tipo_tabela == 'porte_anestesico', Tabela.id_operadora == operadora_id)
+    """Nome da tabela de Porte Anestésico usada por _lookup_porte_an_valor."""
+    return _resolve_porte(operadora_id, uf, nome_hint, porte_an, anestesico=True)[1]
+
+
+def _lookup_porte_valores_lote(operadora_id, uf, nome_hint, codigos, *, anestesico: bool = False):
+    """Versão em lote de _lookup_porte_valor/_lookup_porte_an_valor: {porte: valor}."""
+    valores = {}
+    for codigo in {str(codigo) for codigo in codigos if codigo}:
+        valor, nome = _resolve_porte(operadora_id, uf, nome_hint, codigo, anestesico=anestesico)
+        if nome is not None:
+            valores[codigo] = valor
+    return valores
+
+
+def _resolve_cbhpm_itens(codigos, *, versao: str | None = None, uf: str | None = None):
+    """Resolve vários códigos CBHPM numa única consulta.
+
+    Cada código casa como em _code_prefix_filter (igualdade ou prefixo de _code_prefix) e
+    fica com a primeira linha na ordem de ``CBHPMItem.id``. Retorna {codigo: (item, tabela)}.
+    """
+    codigos = [codigo for codigo in dict.fromkeys(codigos) if codigo]
+    if not codigos:
+        return {}
+    q = (db.session.query(CBHPMItem, Tabela)
+         .join(Tabela, CBHPMItem.id_tabela == Tabela.id))
+    if versao:
+        q = q.filter(Tabela.nome == versao)
+    q = q.filter(or_(*[_code_prefix_filter(CBHPMItem.codigo, CBHPMItem.codigo_norm, codigo) for codigo in codigos]))
     if uf:
-        q = q.filter(Tabela.uf == uf)
-    if nome_hint:
-        cand = q.filter(Tabela.nome.ilike(f"%{nome_hint}%")).order_by(Tabela.data_vigencia.is_(None), Tabela.data_vigencia.desc()).first()
-        if cand:
-            pv = PorteAnestesicoValorItem.query.filter_by(id_tabela=cand.id, porte_an=str(porte_an)).first()
-            if pv:
-                return cand.nome
-    cand = q.order_by(Tabela.data_vigencia.is_(None), Tabela.data_vigencia.desc()).first()
-    if cand:
-        pv = PorteAnestesicoValorItem.query.filter_by(id_tabela=cand.id, porte_an=str(porte_an)).first()
-        if pv:
-            return cand.nome
-    return None
+        q = q.filter(or_(CBHPMItem.uf == uf, Tabela.uf == uf))
+    rows = q.order_by(CBHPMItem.id).all()
+
+    resolvidos = {}
+    for codigo in codigos:
+        prefixo, bruto = _code_prefix(codigo)
+        for item, tabela in rows:
+            alvo = item.codigo if bruto else item.codigo_norm
+            if item.codigo == codigo or (prefixo and (alvo or '').startswith(prefixo)):
+                resolvidos[codigo] = (item, tabela)
+                break
+    return resolvidos
 
 
 
@@ -7855,42 +10836,185 @@ def _clone_default_cbhpm_rules():
     return json.loads(json.dumps(DEFAULT_CBHPM_RULES))
 
 
-def _get_active_cbhpm_ruleset(return_model: bool = False):
+def _freeze_cbhpm_json(value):
+    if isinstance(value, Mapping):
+        return MappingProxyType({str(key): _freeze_cbhpm_json(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze_cbhpm_json(item) for item in value)
+    return value
+
+
+def _cbhpm_fator(value, *, limite: Decimal | None = None) -> Decimal | None:
+    """Fator numérico das regras: valores acima de 5 são percentuais; negativos viram 0."""
+    if value in (None, '', 'None'):
+        return None
+    try:
+        fator = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        return None
+    if fator > Decimal('5'):
+        fator = fator / Decimal('100')
+    if limite is not None and fator > limite:
+        fator = limite
+    return max(fator, Decimal('0'))
+
+
+class CBHPMRegras(Mapping):
+    """Conjunto de regras CBHPM imutável, com os fatores já convertidos para Decimal.
+
+    Continua acessível como dicionário (somente leitura) para quem lê o JSON bruto.
+    """
+
+    _MULTIPLICADORES = (
+        ('total_porte', 'porte'),
+        ('total_filme', 'filme'),
+        ('total_uco', 'uco'),
+        ('total_porte_an', 'porte_an'),
+    )
+
+    def __init__(self, regras: Mapping | None):
+        self._regras = _freeze_cbhpm_json(regras or {})
+        porte_cfg = self._regras.get('porte') or {}
+        aux_cfg = self._regras.get('auxiliares') or {}
+
+        self.reducoes_simultaneos = tuple(
+            _cbhpm_fator(valor, limite=Decimal('1')) for valor in (porte_cfg.get('reducoes_simultaneos') or ())
+        )
+
+        percentuais = []
+        for valor in aux_cfg.get('percentuais') or ():
+            try:
+                perc = Decimal(str(valor))
+            except (InvalidOperation, ValueError):
+                perc = None
+            if perc is not None and perc > 1:
+                perc = perc / Decimal('100')
+            percentuais.append(perc)
+        self.aux_percentuais = tuple(percentuais)
+
+        max_por_porte = {}
+        for porte, valor in (aux_cfg.get('max_por_porte') or {}).items():
+            try:
+                max_por_porte[porte] = int(valor) if valor is not None else None
+            except (TypeError, ValueError):
+                max_por_porte[porte] = None
+        self.aux_max_por_porte = MappingProxyType(max_por_porte)
+
+        multiplicadores = []
+        for key, componente in self._MULTIPLICADORES:
+            cfg = self._regras.get(componente)
+            fator = _cbhpm_fator(cfg.get('multiplicador')) if isinstance(cfg, Mapping) else None
+            if fator is not None:
+                multiplicadores.append((key, componente, fator))
+        self.multiplicadores = tuple(multiplicadores)
+
+    def aux_max(self, porte: str) -> int | None:
+        if porte in self.aux_max_por_porte:
+            return self.aux_max_por_porte[porte]
+        return self.aux_max_por_porte.get('default')
+
+    def __getitem__(self, key):
+        return self._regras[key]
+
+    def __iter__(self):
+        return iter(self._regras)
+
+    def __len__(self):
+        return len(self._regras)
+
+
+def _as_cbhpm_regras(rules) -> CBHPMRegras:
+    return rules if isinstance(rules, CBHPMRegras) else CBHPMRegras(rules)
+
+
+@dataclass(frozen=True)
+class CBHPMRuleSetInfo:
+    """Metadados do ruleset usado nas regras (sem o JSON), para exibição."""
+    id: int
+    nome: str
+    versao: str | None
+    descricao: str | None
+
+
+# (id, revisao) do ruleset → (regras pré-processadas, metadados); um único conjunto fica ativo.
+_cbhpm_regras_cache: dict[tuple | None, tuple[CBHPMRegras, CBHPMRuleSetInfo | None]] = {}
+_cbhpm_regras_lock = threading.Lock()
+
+
+def _invalidate_cbhpm_ruleset_cache() -> None:
+    with _cbhpm_regras_lock:
+        _cbhpm_regras_cache.clear()
+    if has_request_context():
+        g.pop('cbhpm_ruleset', None)
+
+
+def _load_active_cbhpm_ruleset() -> tuple[CBHPMRegras, CBHPMRuleSetInfo | None]:
     ruleset = None
     try:
+        base = db.session.query(CBHPMRuleSet.id, CBHPMRuleSet.revisao)
         ruleset = (
-            CBHPMRuleSet.query
+            base
             .filter(CBHPMRuleSet.ativo.is_(True))
             .order_by(CBHPMRuleSet.atualizado_em.desc())
             .first()
         )
         if not ruleset:
             ruleset = (
-                CBHPMRuleSet.query
+                base
                 .order_by(CBHPMRuleSet.atualizado_em.desc())
                 .first()
             )
     except Exception:
         db.session.rollback()
         ruleset = None
-    data = _clone_default_cbhpm_rules()
-    if ruleset and isinstance(ruleset.regras, dict) and ruleset.regras:
-        try:
-            data = json.loads(json.dumps(ruleset.regras))
-        except Exception:
-            data = _clone_default_cbhpm_rules()
+
+    key = (ruleset.id, ruleset.revisao) if ruleset is not None else None
+    with _cbhpm_regras_lock:
+        entry = _cbhpm_regras_cache.get(key)
+    if entry is not None:
+        return entry
+
+    raw = None
+    info = None
+    if ruleset is not None:
+        row = (
+            db.session.query(CBHPMRuleSet.nome, CBHPMRuleSet.versao, CBHPMRuleSet.descricao, CBHPMRuleSet.regras)
+            .filter(CBHPMRuleSet.id == ruleset.id)
+            .first()
+        )
+        if row is not None:
+            raw = row.regras
+            info = CBHPMRuleSetInfo(id=ruleset.id, nome=row.nome, versao=row.versao, descricao=row.descricao)
+    try:
+        regras = CBHPMRegras(raw if isinstance(raw, dict) and raw else DEFAULT_CBHPM_RULES)
+    except Exception:
+        regras = CBHPMRegras(DEFAULT_CBHPM_RULES)
+    entry = (regras, info)
+    with _cbhpm_regras_lock:
+        _cbhpm_regras_cache.clear()
+        _cbhpm_regras_cache[key] = entry
+    return entry
+
+
+def _get_active_cbhpm_ruleset(return_model: bool = False):
+    """Regras CBHPM ativas; com ``return_model`` devolve ``(regras, CBHPMRuleSetInfo | None)``."""
+    entry = g.get('cbhpm_ruleset') if has_request_context() else None
+    if entry is None:
+        entry = _load_active_cbhpm_ruleset()
+        if has_request_context():
+            g.cbhpm_ruleset = entry
     if return_model:
-        return data, ruleset
-    return data
+        return entry
+    return entry[0]
 
 
 def _apply_ruleset_to_breakdown(item: CBHPMItem, tabela_ref: Tabela, breakdown: dict, rules: dict | None):
     result = dict(breakdown or {})
     applied = []
+    regras = _as_cbhpm_regras(rules)
 
     total_porte = _as_decimal(result.get('total_porte'))
     if total_porte is not None:
-        aux_cfg = (rules or {}).get('auxiliares') or {}
         current_aux = _as_decimal(result.get('total_auxiliares'))
         aux_count_raw = getattr(item, 'numero_auxiliares', None)
         explicit_no_aux = False
@@ -7900,19 +11024,13 @@ def _apply_ruleset_to_breakdown(item: CBHPMItem, tabela_ref: Tabela, breakdown:
             except (InvalidOperation, ValueError):
                 explicit_no_aux = False
         aux_details = []
-        if (current_aux is None or current_aux == Decimal('0')) and aux_cfg.get('percentuais') and not explicit_no_aux:
-            percentuais = aux_cfg.get('percentuais') or []
+        if (current_aux is None or current_aux == Decimal('0')) and regras.aux_percentuais and not explicit_no_aux:
+            percentuais = regras.aux_percentuais
             try:
                 aux_count = int(aux_count_raw) if aux_count_raw is not None else None
             except (TypeError, ValueError):
                 aux_count = None
-            max_por_porte = aux_cfg.get('max_por_porte') or {}
-            porte_key = str(getattr(item, 'porte', '') or '').strip()
-            max_aux = max_por_porte.get(porte_key, max_por_porte.get('default'))
-            try:
-                max_aux = int(max_aux) if max_aux is not None else None
-            except (TypeError, ValueError):
-                max_aux = None
+            max_aux = regras.aux_max(str(getattr(item, 'porte', '') or '').strip())
             if aux_count is None:
                 aux_count = max_aux if max_aux is not None else len(percentuais)
             elif max_aux is not None:
@@ -7922,10 +11040,7 @@ def _apply_ruleset_to_breakdown(item: CBHPMItem, tabela_ref: Tabela, breakdown:
                 computed = Decimal('0')
                 for idx in range(aux_count):
                     perc = percentuais[min(idx, len(percentuais) - 1)]
-                    perc = Decimal(str(perc))
-                    if perc > 1:
-                        perc = perc / Decimal('100')
-                    if perc <= 0:
+                    if perc is None or perc <= 0:
                         continue
                     value_aux = total_porte * perc
                     computed += value_aux
@@ -7964,26 +11079,7 @@ def _apply_ruleset_to_breakdown(item: CBHPMItem, tabela_ref: Tabela, breakdown:
     result['total_porte_an'] = _as_decimal(result.get('total_porte_an'))
     result['total_auxiliares'] = _as_decimal(result.get('total_auxiliares'))
 
-    multipliers = [
-        ('total_porte', (rules or {}).get('porte'), 'porte'),
-        ('total_filme', (rules or {}).get('filme'), 'filme'),
-        ('total_uco', (rules or {}).get('uco'), 'uco'),
-        ('total_porte_an', (rules or {}).get('porte_an'), 'porte_an'),
-    ]
-    for key, cfg, comp_name in multipliers:
-        if not cfg:
-            continue
-        factor_raw = cfg.get('multiplicador') if isinstance(cfg, dict) else None
-        if factor_raw in (None, '', 'None'):
-            continue
-        try:
-            factor = Decimal(str(factor_raw))
-        except (InvalidOperation, ValueError):
-            continue
-        if factor > Decimal('5'):
-            factor = factor / Decimal('100')
-        if factor < Decimal('0'):
-            factor = Decimal('0')
+    for key, comp_name, factor in regras.multiplicadores:
         current = result.get(key)
         if current is None:
             continue
@@ -8023,10 +11119,14 @@ def compute_cbhpm_total(item: CBHPMItem, tabela_ref: Tabela, porte_hint: str | N
 
 
 def compute_cbhpm_breakdown(item: CBHPMItem, tabela_ref: Tabela, porte_hint: str | None = None, porte_an_hint: str | None = None,
-                            ajuste_porte_pct: Decimal | None = None, ajuste_porte_an_pct: Decimal | None = None, rules: dict | None = None):
+                            ajuste_porte_pct: Decimal | None = None, ajuste_porte_an_pct: Decimal | None = None, rules: dict | None = None,
+                            porte_valores: Mapping[str, Decimal] | None = None, porte_an_valores: Mapping[str, Decimal] | None = None):
     valor_porte = _as_decimal(item.valor_porte)
     if valor_porte is None:
-        valor_porte = _lookup_porte_valor(tabela_ref.id_operadora, tabela_ref.uf, (porte_hint or tabela_ref.nome), item.porte)
+        if porte_valores is not None:
+            valor_porte = porte_valores.get(str(item.porte)) if item.porte else None
+        else:
+            valor_porte = _lookup_porte_valor(tabela_ref.id_operadora, tabela_ref.uf, (porte_hint or tabela_ref.nome), item.porte)
     fracao_input = getattr(item, '_fracao_input', None)
     fracao = _as_decimal(fracao_input) if fracao_input is not None else _as_decimal(item.fracao_porte)
     if fracao is None or fracao <= Decimal('0'):
@@ -8057,7 +11157,10 @@ def compute_cbhpm_breakdown(item: CBHPMItem, tabela_ref: Tabela, porte_hint: str
 
     valor_an = _as_decimal(item.valor_porte_anestesico)
     if valor_an is None:
-        valor_an = _lookup_porte_an_valor(tabela_ref.id_operadora, tabela_ref.uf, (porte_an_hint or tabela_ref.nome), item.porte_anestesico)
+        if porte_an_valores is not None:
+            valor_an = porte_an_valores.get(str(item.porte_anestesico)) if item.porte_anestesico else None
+        else:
+            valor_an = _lookup_porte_an_valor(tabela_ref.id_operadora, tabela_ref.uf, (porte_an_hint or tabela_ref.nome), item.porte_anestesico)
     total_an = _as_decimal(item.total_porte_anestesico)
     if total_an is not None and ajuste_porte_an_pct:
         total_an = total_an * (Decimal('1') + (ajuste_porte_an_pct/Decimal('100')))
@@ -8282,6 +11385,7 @@ def tabela_excluir(tid):
     db.session.query(Procedimento).filter_by(id_tabela=tid).delete(synchronize_session=False)
     db.session.delete(t)
     db.session.commit()
+    _invalidate_porte_cache()
     return redirect(url_for('gerenciar_tabelas'))
 
 
@@ -8370,6 +11474,7 @@ def importar_porte():
         db.session.add(PorteValorItem(porte=str(porte), valor=valor, uf=uf, id_tabela=tab.id))
 
     db.session.commit()
+    _invalidate_porte_cache()
     return redirect(url_for('gerenciar_tabelas'))
 
 
@@ -8435,6 +11540,7 @@ def importar_porte_anestesico():
         db.session.add(PorteAnestesicoValorItem(porte_an=str(porte_an), valor=valor, uf=uf, id_tabela=tab.id))
 
     db.session.commit()
+    _invalidate_porte_cache()
     return redirect(url_for('gerenciar_tabelas'))
 
 
@@ -8598,17 +11704,18 @@ def tabela_itens(tid):
     if tabela.tipo_tabela == 'cbhpm':
         query = CBHPMItem.query.filter_by(id_tabela=tid)
         if q:
-            like = f"%{q}%"
             query = query.filter(
-                (CBHPMItem.codigo.ilike(like)) | (CBHPMItem.procedimento.ilike(like))
+                _text_contains_filter(CBHPMItem.codigo_norm, q, code=True)
+                | _text_contains_filter(CBHPMItem.procedimento_norm, q)
             )
         rows = query.order_by(CBHPMItem.codigo).all()
         # Mapeia para o formato consumido pelo template (codigo, descricao, valor)
         itens = []
+        regras = _get_active_cbhpm_ruleset()
         for r in rows:
             val = r.subtotal
             if val in (None, Decimal('0')):
-                val = compute_cbhpm_total(r, tabela)
+                val = compute_cbhpm_total(r, tabela, rules=regras)
             itens.append({
                 'codigo': r.codigo,
                 'descricao': r.procedimento,
@@ -8637,24 +11744,74 @@ def tabela_itens(tid):
     # Default: procedimentos comuns
     query = Procedimento.query.filter_by(id_tabela=tid)
     if q:
-        like = f"%{q}%"
         query = query.filter(
-            (Procedimento.codigo.ilike(like)) | (Procedimento.descricao.ilike(like))
+            _text_contains_filter(Procedimento.codigo_norm, q, code=True)
+            | _text_contains_filter(Procedimento.descricao_norm, q)
         )
     itens = query.order_by(Procedimento.codigo).all()
     return render_template('tabela-itens.html', tabela=tabela, itens=itens, q=q)
 
 
+def _insumos_etag(*extra) -> str:
+    """ETag forte a partir das versões dos catálogos, da rota e dos parâmetros da requisição."""
+    payload = json.dumps(
+        {
+            'versions': _catalog_cache_versions(),
+            'path': request.path,
+            'args': sorted(request.args.items(multi=True)),
+            'extra': list(extra),
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _insumos_not_modified(etag: str):
+    """Resposta 304 quando ``If-None-Match`` confere; ``None`` caso contrário."""
+    if not request.if_none_match.contains(etag):
+        return None
+    response = app.response_class(status=304)
+    return _insumos_cache_headers(response, etag)
+
+
+def _insumos_cache_headers(response, etag: str):
+    response.set_etag(etag)
+    # O navegador guarda a resposta, mas revalida sempre (304 quando nada mudou).
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
+
+
 @app.route('/insumos/search')
 @login_required
 @feature_required('insumos')
 def insumos_search():
+    etag = _insumos_etag()
+    not_modified = _insumos_not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+
     page = _parse_positive_int(request.args.get('page'), 1, maximum=500)
     per_page = _parse_positive_int(request.args.get('per_page'), 50, maximum=500)
 
     filters = _extract_insumo_filters(request.args)
-    payload = _catalogo_search(filters, page, per_page)
-    return jsonify(payload)
+    cursor = request.args.get('cursor')
+    total_mode = (request.args.get('total') or '').strip().lower() or None
+    if total_mode is not None and total_mode not in SEARCH_TOTAL_MODES:
+        return jsonify({'error': 'Modo de total inválido.'}), 400
+    try:
+        payload = _catalogo_search(filters, page, per_page, cursor=cursor, total_mode=total_mode)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    return _insumos_cache_headers(jsonify(payload), etag)
+
+
+@app.route('/insumos/search/cache')
+@admin_required
+@feature_required('insumos')
+def insumos_search_cache_stats():
+    return jsonify(search_cache.stats())
 
 
 @app.route('/insumos/<origem>/<int:item_id>')
@@ -8665,6 +11822,23 @@ def insumo_detail(origem: str, item_id: int):
     if origem not in {'BRAS', 'SIMPRO'}:
         abort(404)
 
+    is_admin = session.get('perfil') == 'adm'
+    contexto_state = None
+    if is_admin:
+        contexto_state = list(
+            db.session.query(
+                func.count(InsumoContextoClinico.id),
+                func.max(InsumoContextoClinico.id),
+                func.max(InsumoContextoClinico.updated_at),
+            )
+            .filter_by(origem=origem, item_id=item_id)
+            .one()
+        )
+    etag = _insumos_etag(is_admin, contexto_state)
+    not_modified = _insumos_not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+
     model = BrasItemNormalized if origem == 'BRAS' else SimproItemNormalized
     item = model.query.get(item_id)
     if not item:
@@ -8712,13 +11886,7 @@ def insumo_detail(origem: str, item_id: int):
 
     index_query = InsumoIndex.query.filter_by(origem=origem, item_id=item_id)
     if uf_param:
-        like_pattern = f"%|{uf_param}|%"
-        index_entry = index_query.filter(
-            or_(
-                func.upper(InsumoIndex.uf_referencia) == uf_param,
-                func.upper(func.coalesce(InsumoIndex.uf_referencia, '')).like(like_pattern)
-            )
-        ).first()
+        index_entry = _filter_index_uf(index_query, uf_param).first()
     else:
         index_entry = None
     if index_entry is None:
@@ -8734,9 +11902,10 @@ def insumo_detail(origem: str, item_id: int):
     detail_payload['historico'] = historico
     detail_payload['uf_filtro'] = uf_param or None
 
-    detail_payload['similares'] = _suggest_similar_items(origem, item)
+    # Tabela pré-calculada; itens ainda não processados caem no cálculo por consultas.
+    detail_payload['similares'] = _load_similar_items(origem, item_id) or _suggest_similar_items(origem, item)
 
-    if session.get('perfil') == 'adm':
+    if is_admin:
         contexto_rows = (
             InsumoContextoClinico.query
             .filter_by(origem=origem, item_id=item_id)
@@ -8748,7 +11917,55 @@ def insumo_detail(origem: str, item_id: int):
                 _serialize_contexto_clinico(row, detail_payload)
                 for row in contexto_rows
             ]
-    return jsonify(detail_payload)
+    return _insumos_cache_headers(jsonify(detail_payload), etag)
+
+
+@app.route('/insumos/<origem>/<int:item_id>/equivalentes')
+@login_required
+@feature_required('insumos')
+def insumo_equivalentes(origem: str, item_id: int):
+    """Equivalentes prováveis do item (índice MinHash/LSH): por padrão na outra origem."""
+    origem = (origem or '').upper()
+    if origem not in {'BRAS', 'SIMPRO'}:
+        abort(404)
+    escopo = (request.args.get('escopo') or 'outra').strip().lower()
+    if escopo not in {'outra', 'mesma', 'todas'}:
+        return jsonify({'error': 'escopo deve ser outra, mesma ou todas.'}), 400
+    try:
+        min_sim = min(max(float(request.args.get('min_sim') or 0.5), 0.0), 1.0)
+        limit = min(max(int(request.args.get('limit') or 10), 1), 50)
+    except ValueError:
+        return jsonify({'error': 'min_sim/limit inválidos.'}), 400
+
+    index = _get_insumo_lsh_index()
+    if index is None:
+        return jsonify({'error': 'Índice de equivalências ainda não foi gerado (flask insumos:lsh).'}), 503
+    candidates = index.candidates(origem, item_id, escopo=escopo, min_sim=min_sim, limit=limit)
+    wanted = {(cand_origem, cand_id): similarity for cand_origem, cand_id, similarity in candidates}
+    rows = []
+    if wanted:
+        rows = (
+            InsumoIndex.query
+            .filter(or_(*(
+                and_(InsumoIndex.origem == cand_origem, InsumoIndex.item_id.in_(
+                    [cand_id for key_origem, cand_id in wanted if key_origem == cand_origem]
+                ))
+                for cand_origem in {key_origem for key_origem, _ in wanted}
+            )))
+            .all()
+        )
+    rows.sort(key=lambda row: (-wanted[(row.origem, row.item_id)], row.origem, row.item_id))
+    equivalentes = []
+    for row, payload in zip(rows, _serialize_insumo_indexes(rows)):
+        payload['similaridade_estimada'] = round(wanted[(row.origem, row.item_id)], 4)
+        equivalentes.append(payload)
+    return jsonify({
+        'origem': origem,
+        'item_id': item_id,
+        'escopo': escopo,
+        'indice_versao': index.versao,
+        'equivalentes': equivalentes,
+    })
 
 
 @app.route('/insumos/<origem>/<int:item_id>/contexto', methods=['POST'])
@@ -8916,6 +12133,7 @@ def _run_import_job(job_id: str) -> None:
         skip_header = bool(params.get('skip_header'))
         encoding = params.get('encoding') or None
         truncate = bool(params.get('truncate'))
+        incremental = bool(params.get('incremental'))
         map_config = params.get('map_config') or {}
         sequencia_input = params.get('sequencia_input')
         aliquota_raw = params.get('aliquota')
@@ -8958,6 +12176,8 @@ def _run_import_job(job_id: str) -> None:
                     uf_values=uf_values,
                     aliquota_default=aliquota_decimal,
                     arquivo_label_override=arquivo_label_override,
+                    metrics=metrics,
+                    incremental=incremental,
                 )
                 metrics['timings']['import_stage'] = round(time.perf_counter() - stage_start, 4)
             else:
@@ -8966,43 +12186,29 @@ def _run_import_job(job_id: str) -> None:
                 if not base_label:
                     base_label = versao or 'simpro'
                 target_ufs = list(dict.fromkeys([*(uf_values or []), *( [uf_default] if uf_default else [] )]))
-                if not target_ufs:
-                    target_ufs = [None]
-                parts: list[tuple[dict, str | None, str | None]] = []
-                for idx, uf in enumerate(target_ufs):
-                    current_label = base_label
-                    if uf:
-                        current_label = f"{base_label}_{uf}"
-                    partial = _import_simpro(
-                        file_path=file_path,
-                        versao=versao,
-                        fmt=fmt,
-                        map_config=map_config,
-                        encoding=encoding,
-                        truncate=(truncate if idx == 0 else False),
-                        uf_default=uf,
-                        uf_values=[uf] if uf else None,
-                        aliquota_default=aliquota_decimal,
-                        arquivo_label_override=current_label,
-                    )
-                    if partial:
-                        parts.append((partial, uf, current_label))
+                result = _import_simpro_multi_uf(
+                    file_path=file_path,
+                    versao=versao,
+                    fmt=fmt,
+                    map_config=map_config,
+                    encoding=encoding,
+                    truncate=truncate,
+                    base_label=base_label,
+                    target_ufs=target_ufs or [None],
+                    aliquota_default=aliquota_decimal,
+                    metrics=metrics,
+                    incremental=incremental,
+                )
                 metrics['timings']['import_stage'] = round(time.perf_counter() - stage_start, 4)
-                arquivos = [label for _, _, label in parts if label]
-                result = {
-                    'arquivo': arquivos[0] if arquivos else None,
-                    'arquivos': arquivos,
-                    'linhas_raw': sum(partial.get('linhas_raw') or 0 for partial, _, _ in parts),
-                    'linhas_materializadas': sum(partial.get('linhas_materializadas') or 0 for partial, _, _ in parts),
-                    'load_strategy': next((partial.get('load_strategy') for partial, _, _ in parts if partial.get('load_strategy')), None),
-                    '_partials': parts,
-                }
 
             job.status = ImportJobStatus.SUCCESS.value
-            job.message = _job_message_trim(
+            message = (
                 f"Importação concluída (arquivo {result['arquivo']} | {result['linhas_raw']} linhas brutas, "
                 f"{result['linhas_materializadas']} materializadas)."
             )
+            if result.get('delta'):
+                message = f"{message} {_format_delta_counts(result['delta'])}"
+            job.message = _job_message_trim(message)
             job.total_linhas = result.get('linhas_raw')
             job.linhas_materializadas = result.get('linhas_materializadas')
             job.finished_at = datetime.utcnow()
@@ -9021,38 +12227,35 @@ def _run_import_job(job_id: str) -> None:
 
             try:
                 post_start = time.perf_counter()
-                partials = result.get('_partials') if origem == 'SIMPRO' else None
-                if partials:
-                    for partial, uf, label in partials:
-                        if isinstance(partial, dict):
-                            label = label or partial.get('arquivo')
-                        if not label:
-                            continue
-                        _post_catalog_ingest(
-                            origem=origem,
-                            arquivo_label=label,
-                            versao=versao,
-                            sequencia_input=sequencia_input,
-                            aliquota_value=aliquota_decimal,
-                            uf_values=[uf] if uf else uf_values,
-                        )
-                else:
-                    _post_catalog_ingest(
-                        origem=origem,
-                        arquivo_label=result.get('arquivo'),
-                        versao=versao,
-                        sequencia_input=sequencia_input,
-                        aliquota_value=aliquota_decimal,
-                        uf_values=uf_values,
-                    )
+                publicacao = _post_catalog_ingest(
+                    origem=origem,
+                    arquivo_label=result.get('arquivo'),
+                    versao=versao,
+                    sequencia_input=sequencia_input,
+                    aliquota_value=aliquota_decimal,
+                    uf_values=result.get('ufs') or uf_values,
+                    hash_arquivo=params.get('hash_arquivo'),
+                    metrics=metrics,
+                )
                 metrics['timings']['post_catalog'] = round(time.perf_counter() - post_start, 4)
             except Exception as exc:  # noqa: BLE001
+                publicacao = None
                 app.logger.warning('Falha ao consolidar catálogo pós-import (job %s): %s', job_id, exc)
                 job = ImportJob.query.get(job_id)
                 if job:
                     job.message = _job_message_trim((job.message or '') + ' Consolidação posterior falhou.')
                     _set_job_metrics(job, metrics)
                     db.session.commit()
+
+            if publicacao is not None and origem == 'SIMPRO' and len(result.get('ufs') or []) > 1 and not truncate:
+                try:
+                    removed = _purge_legacy_simpro_uf_labels(base_label, result['ufs'])
+                    metrics['legacy_labels_removed'] = removed
+                except Exception as exc:  # noqa: BLE001
+                    db.session.rollback()
+                    app.logger.warning('Falha ao remover cópias SIMPRO por UF (job %s): %s', job_id, exc)
+
+            _schedule_insumo_lsh_rebuild()
         except Exception as exc:  # noqa: BLE001
             metrics['timings']['total'] = round(time.perf_counter() - overall_start, 4)
             metrics['error'] = str(exc)
@@ -9218,12 +12421,12 @@ def insumos_aliquotas():
             return redirect(url_for('insumos_aliquotas', highlight=target_uf))
 
         refresh_failures: list[str] = []
-        for fornecedor in ('BRASINDICE', 'SIMPRO'):
-            try:
-                _refresh_materialized_catalogs(fornecedor)
-            except Exception as exc:  # noqa: BLE001
-                app.logger.warning('Falha ao atualizar view %s após ajuste %s (%s)', fornecedor, target_uf, exc)
-                refresh_failures.append(fornecedor)
+        try:
+            _mark_catalogs_stale(('BRASINDICE', 'SIMPRO'))
+        except Exception as exc:  # noqa: BLE001
+            db.session.rollback()
+            app.logger.warning('Falha ao agendar atualização dos catálogos após ajuste %s (%s)', target_uf, exc)
+            refresh_failures.extend(('BRASINDICE', 'SIMPRO'))
 
         if refresh_failures:
             flash(
@@ -9404,6 +12607,8 @@ def insumos_import():
     data_ref = (request.form.get('data_atualizacao') or '').strip() or None
     no_header = request.form.get('no_header') == 'on'
     truncate = request.form.get('truncate') == 'on'
+    incremental = request.form.get('incremental') == 'on'
+    force = request.form.get('force') == 'on'
     encoding = (request.form.get('encoding') or '').strip() or None
     arquivo_label_override_raw = (request.form.get('arquivo_label') or '').strip()
     raw_ufs = request.form.getlist('ufs') or request.form.getlist('uf')
@@ -9501,13 +12706,23 @@ def insumos_import():
     data_path = job_dir / original_name
 
     try:
-        upload.stream.seek(0)
-        upload.save(data_path)
+        upload_hash = _save_upload_with_hash(upload, data_path)
     except Exception as exc:  # noqa: BLE001
         message = f'Falha ao salvar o arquivo de importação: {exc}'
         shutil.rmtree(job_dir, ignore_errors=True)
         return _fail(message)
 
+    unchanged_lote = None
+    if not force and not truncate:
+        base_label = arquivo_label_override or (map_config.get('arquivo') if origem == 'BRAS' else None) or versao
+        unchanged_lote = _find_unchanged_import(
+            origem,
+            upload_hash,
+            versao=versao,
+            aliquota_value=aliquota_value,
+            arquivo_labels=_import_target_labels(origem, base_label, uf_default=uf_value, uf_values=uf_values),
+        )
+
     params_payload = {
         'fmt': fmt,
         'delimiter': delimiter_value,
@@ -9518,12 +12733,14 @@ def insumos_import():
         'versao': versao,
         'data_ref': data_ref,
         'truncate': truncate,
+        'incremental': incremental,
         'uf_values': uf_values,
         'uf_default': uf_value,
         'aliquota': str(aliquota_value) if aliquota_value is not None else None,
         'sequencia_input': sequencia_input,
         'map_config': map_config,
         'arquivo_label': arquivo_label_override,
+        'hash_arquivo': upload_hash,
     }
 
     job = ImportJob(
@@ -9538,6 +12755,12 @@ def insumos_import():
         params=params_payload,
         message='Aguardando processamento.',
     )
+    if unchanged_lote is not None:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        job.status = ImportJobStatus.SUCCESS.value
+        job.started_at = job.finished_at = datetime.utcnow()
+        job.message = _job_message_trim(_unchanged_import_message(unchanged_lote))
+        _set_job_metrics(job, {'unchanged': True, 'lote_id': unchanged_lote.id, 'hash_arquivo': upload_hash})
 
     try:
         db.session.add(job)
@@ -9562,6 +12785,13 @@ def insumos_import():
     redirect_url = url_for(redirect_endpoint)
     prefix = job_id[:8]
 
+    if unchanged_lote is not None:
+        message = f'Importação {origem} sem alterações (protocolo {prefix}). {job.message}'
+        if not is_ajax:
+            _safe_flash(message, 'info')
+            return _go_back()
+        return jsonify({'status': 'unchanged', 'job_id': job_id, 'prefix': prefix, 'message': message, 'inline': True, 'redirect': redirect_url})
+
     if inline:
         _run_import_job(job_id)
         job = ImportJob.query.get(job_id)
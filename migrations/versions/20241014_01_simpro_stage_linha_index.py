@@ -0,0 +1,31 @@
+"""Index SIMPRO fixed stage by arquivo and line number
+
+Revision ID: 20241014_01_simpro_stage_linha_index
+Revises: 20241013_01_extend_simpro_norm_fields
+Create Date: 2024-10-14 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20241014_01_simpro_stage_linha_index'
+down_revision: Union[str, None] = '20241013_01_extend_simpro_norm_fields'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'idx_simpro_fixed_arquivo_linha',
+        'simpro_fixed_stage',
+        ['arquivo', 'linha_num'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_simpro_fixed_arquivo_linha', table_name='simpro_fixed_stage')
@@ -0,0 +1,33 @@
+"""Full-text index for insumos_index searches
+
+Revision ID: 20241015_01_insumos_fulltext
+Revises: 20241014_01_simpro_stage_linha_index
+Create Date: 2024-10-15 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20241015_01_insumos_fulltext'
+down_revision: Union[str, None] = '20241014_01_simpro_stage_linha_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'mysql':
+        return
+    op.execute(
+        'ALTER TABLE insumos_index ADD FULLTEXT INDEX ft_insumos_index '
+        '(descricao, fabricante, tuss, tiss, anvisa) WITH PARSER ngram'
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'mysql':
+        return
+    op.drop_index('ft_insumos_index', table_name='insumos_index')
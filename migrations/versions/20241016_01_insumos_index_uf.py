@@ -0,0 +1,55 @@
+"""UF membership table for insumos_index
+
+Revision ID: 20241016_01_insumos_index_uf
+Revises: 20241015_01_insumos_fulltext
+Create Date: 2024-10-16 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20241016_01_insumos_index_uf'
+down_revision: Union[str, None] = '20241015_01_insumos_fulltext'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BR_UFS = [
+    'AC', 'AL', 'AP', 'AM', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA', 'MT', 'MS', 'MG', 'PA',
+    'PB', 'PR', 'PE', 'PI', 'RJ', 'RN', 'RS', 'RO', 'RR', 'SC', 'SP', 'SE', 'TO',
+]
+
+
+def upgrade() -> None:
+    op.create_table(
+        'insumos_index_uf',
+        sa.Column('uf', sa.String(length=2), nullable=False),
+        sa.Column('origem', sa.Enum('BRAS', 'SIMPRO', name='insumo_origem', create_type=False), nullable=False),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('uf', 'origem', 'item_id'),
+        sa.ForeignKeyConstraint(
+            ['origem', 'item_id'],
+            ['insumos_index.origem', 'insumos_index.item_id'],
+            ondelete='CASCADE',
+        ),
+    )
+    op.create_index('idx_insumos_index_uf_item', 'insumos_index_uf', ['origem', 'item_id'], unique=False)
+
+    uf_rows = ' UNION ALL '.join(f"SELECT '{uf}' AS uf, '%|{uf}|%' AS padrao" for uf in BR_UFS)
+    op.execute(
+        f"""
+        INSERT INTO insumos_index_uf (uf, origem, item_id)
+        SELECT u.uf, i.origem, i.item_id
+          FROM insumos_index i
+          JOIN ({uf_rows}) u
+            ON UPPER(i.uf_referencia) = u.uf OR UPPER(i.uf_referencia) LIKE u.padrao
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_insumos_index_uf_item', table_name='insumos_index_uf')
+    op.drop_table('insumos_index_uf')
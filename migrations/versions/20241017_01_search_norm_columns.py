@@ -0,0 +1,129 @@
+"""Normalized search columns (*_norm)
+
+Revision ID: 20241017_01_search_norm_columns
+Revises: 20241016_01_insumos_index_uf
+Create Date: 2024-10-17 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# env.py já importa o app; a dobra é a mesma das colunas gravadas pela aplicação.
+from app import _normalize_search_code, _normalize_search_text, _sql_search_norm
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20241017_01_search_norm_columns'
+down_revision: Union[str, None] = '20241016_01_insumos_index_uf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# tabela → (chave primária, [(coluna normalizada, tamanho, coluna de origem, é código)])
+TABLES = {
+    'insumos_index': (('origem', 'item_id'), [
+        ('descricao_norm', 500, 'descricao', False),
+        ('fabricante_norm', 255, 'fabricante', False),
+        ('tuss_norm', 50, 'tuss', True),
+        ('tiss_norm', 50, 'tiss', True),
+    ]),
+    'cbhpm_itens': (('id',), [
+        ('codigo_norm', 100, 'codigo', True),
+        ('procedimento_norm', 500, 'procedimento', False),
+    ]),
+    'procedimentos': (('id',), [
+        ('codigo_norm', 100, 'codigo', True),
+        ('descricao_norm', 500, 'descricao', False),
+    ]),
+}
+
+BACKFILL_BATCH_SIZE = 5000
+
+MYSQL_CATALOGS = {
+    'mv_catalogo_vigente_brasindice': (
+        "CONCAT_WS(' ', produto_nome, apresentacao_descricao)", 'laboratorio_nome', 'idx_mv_bras', 500, 255,
+    ),
+    'mv_catalogo_vigente_simpro': ('descricao', 'fabricante', 'idx_mv_simpro', 255, 80),
+}
+
+
+def _backfill(bind, table, pk, columns):
+    """Preenche as colunas *_norm em lotes de BACKFILL_BATCH_SIZE linhas, paginando pela chave primária."""
+    sources = ', '.join(source for _, _, source, _ in columns)
+    keys = ', '.join(pk)
+    assignments = ', '.join(f'{target} = :{target}' for target, _, _, _ in columns)
+    where = ' AND '.join(f'{column} = :pk_{column}' for column in pk)
+    after = f"({keys}) > ({', '.join(f':last_{column}' for column in pk)})"
+    select = f'SELECT {keys}, {sources} FROM {table}'
+    last = None
+    while True:
+        if last is None:
+            stmt = sa.text(f'{select} ORDER BY {keys} LIMIT :limit')
+            params = {'limit': BACKFILL_BATCH_SIZE}
+        else:
+            stmt = sa.text(f'{select} WHERE {after} ORDER BY {keys} LIMIT :limit')
+            params = {'limit': BACKFILL_BATCH_SIZE, **{f'last_{column}': last[column] for column in pk}}
+        rows = bind.execute(stmt, params).mappings().all()
+        if not rows:
+            return
+        payload = []
+        for row in rows:
+            entry = {
+                target: (_normalize_search_code if code else _normalize_search_text)(row[source])
+                for target, _, source, code in columns
+            }
+            entry.update({f'pk_{column}': row[column] for column in pk})
+            payload.append(entry)
+        bind.execute(sa.text(f'UPDATE {table} SET {assignments} WHERE {where}'), payload)
+        if len(rows) < BACKFILL_BATCH_SIZE:
+            return
+        last = rows[-1]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    for table, (pk, columns) in TABLES.items():
+        for target, length, _, _ in columns:
+            op.add_column(table, sa.Column(target, sa.String(length=length), nullable=True))
+            op.create_index(f'ix_{table}_{target}', table, [target], unique=False)
+        _backfill(bind, table, pk, columns)
+
+    # No PostgreSQL os catálogos são materialized views: recrie-as com sql/aliquota_catalog_postgres.sql.
+    if bind.dialect.name != 'mysql':
+        return
+    for table, (descricao, fabricante, prefix, descricao_len, fabricante_len) in MYSQL_CATALOGS.items():
+        table_type = bind.execute(
+            sa.text(
+                'SELECT TABLE_TYPE FROM information_schema.TABLES '
+                'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :name'
+            ),
+            {'name': table},
+        ).scalar()
+        if table_type != 'BASE TABLE':
+            continue
+        op.execute(
+            f'ALTER TABLE {table} '
+            f'ADD COLUMN descricao_norm VARCHAR({descricao_len}) NULL, '
+            f'ADD COLUMN fabricante_norm VARCHAR({fabricante_len}) NULL, '
+            f'ADD KEY {prefix}_descricao_norm (descricao_norm), '
+            f'ADD KEY {prefix}_fabricante_norm (fabricante_norm)'
+        )
+        op.execute(
+            f'UPDATE {table} SET descricao_norm = {_sql_search_norm(descricao)}, '
+            f'fabricante_norm = {_sql_search_norm(fabricante)}'
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'mysql':
+        for table, (_, _, prefix, _, _) in MYSQL_CATALOGS.items():
+            op.execute(
+                f'ALTER TABLE {table} DROP KEY {prefix}_descricao_norm, DROP KEY {prefix}_fabricante_norm, '
+                'DROP COLUMN descricao_norm, DROP COLUMN fabricante_norm'
+            )
+    for table, (_, columns) in TABLES.items():
+        for target, _, _, _ in columns:
+            op.drop_index(f'ix_{table}_{target}', table_name=table)
+            op.drop_column(table, target)
@@ -0,0 +1,38 @@
+"""Precomputed neighbours for insumo detail (insumo_similar)
+
+Revision ID: 20241018_01_insumo_similar
+Revises: 20241017_01_search_norm_columns
+Create Date: 2024-10-18 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20241018_01_insumo_similar'
+down_revision: Union[str, None] = '20241017_01_search_norm_columns'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'insumo_similar',
+        sa.Column('origem', sa.Enum('BRAS', 'SIMPRO', name='insumo_origem', create_type=False), nullable=False),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('posicao', sa.SmallInteger(), nullable=False),
+        sa.Column('similar_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Integer(), nullable=False),
+        sa.Column('justificativas', sa.String(length=1000), nullable=True),
+        sa.Column('calculado_em', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('origem', 'item_id', 'posicao'),
+    )
+    op.create_index('idx_insumo_similar_vizinho', 'insumo_similar', ['origem', 'similar_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_insumo_similar_vizinho', table_name='insumo_similar')
+    op.drop_table('insumo_similar')
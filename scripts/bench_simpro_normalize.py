@@ -0,0 +1,179 @@
+"""Microbenchmark da normalização SIMPRO: mapa dinâmico x plano compilado.
+
+Uso: python scripts/bench_simpro_normalize.py [linhas] [repeticoes]
+"""
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+
+from app import (
+    _SIMPRO_NORM_INSERT_COLUMNS,
+    _apply_simpro_postprocess,
+    _auto_scale_decimal,
+    _build_simpro_payload,
+    _coerce_decimal,
+    _compile_simpro_column_plan,
+    _enrich_tuss_from_ean,
+    _ensure_tuss_field,
+    _ensure_tuss_from_line,
+    _normalize_simpro_line,
+    _parse_fixed_date,
+    _resolve_simpro_field_map,
+    _sanitize_numeric,
+)
+
+MAP_CONFIG = {
+    "decimal_divisor": 100,
+    "columns": [
+        {"name": "codigo_interno", "start": 1, "length": 10},
+        {"name": "codigo_alternativo", "start": 16, "length": 10},
+        {"name": "descricao_completa", "start": 30, "length": 92},
+        {"name": "data_vigencia", "start": 123, "length": 8, "type": "date", "date_fmt": "DDMMYYYY"},
+        {"name": "tipo_registro", "start": 131, "length": 1},
+        {"name": "preco_pf", "start": 132, "length": 12, "type": "decimal"},
+        {"name": "preco_pmc", "start": 144, "length": 12, "type": "decimal"},
+        {"name": "preco_ph", "start": 156, "length": 12, "type": "decimal"},
+        {"name": "preco_outro", "start": 168, "length": 12, "type": "decimal"},
+        {"name": "unidade_comercial", "start": 200, "length": 8},
+        {"name": "qtd_unidade", "start": 209, "length": 6, "type": "int"},
+        {"name": "fabricante", "start": 230, "length": 24},
+        {"name": "registro_anvisa", "start": 280, "length": 20},
+        {"name": "validade_anvisa", "start": 301, "length": 8, "type": "date", "date_fmt": "DDMMYYYY"},
+        {"name": "ean", "start": 310, "length": 16, "strip": ["+"]},
+        {"name": "situacao", "start": 330, "length": 20},
+        {"name": "sufixo_livre", "start": 350, "length": 200, "rtrim": True},
+    ],
+    "postprocess": {
+        "extract": [
+            {
+                "from": "sufixo_livre",
+                "regex": "(?:[#\\-\\s]?)(N[SNRA])\\s*([0-9]{6,12})",
+                "fields": {"tuss_prefix": 1, "tuss_numero": 2},
+            },
+            {"from": "sufixo_livre", "regex": "([A-Z]{2})\\s*$", "fields": {"status_final": 1}},
+        ],
+        "derive": [
+            {"name": "tuss", "expr": "tuss_prefix && tuss_numero ? tuss_prefix + tuss_numero : null"},
+        ],
+        "cleanup": ["sufixo_livre"],
+    },
+}
+
+
+def _build_line(idx: int) -> str:
+    chars = [' '] * 600
+
+    def place(start: int, length: int, value: str) -> None:
+        chars[start - 1:start - 1 + length] = list(str(value)[:length].ljust(length))
+
+    place(1, 10, f'{idx:010d}')
+    place(16, 10, f'ALT{idx:07d}')
+    place(30, 92, f'Produto SIMPRO de teste numero {idx}')
+    place(123, 8, '15032025')
+    place(131, 1, '1')
+    place(132, 12, f'{idx * 7:012d}')
+    place(144, 12, f'{idx * 11:012d}')
+    place(156, 12, '000000000000')
+    place(168, 12, f'{idx * 3:012d}')
+    place(200, 8, 'CX10')
+    place(209, 6, '000010')
+    place(230, 24, 'FABRICANTE TESTE')
+    place(280, 20, f'ANV{idx:016d}')
+    place(301, 8, '31122026')
+    place(310, 16, f'{idx:06d}#NN{idx:07d}')
+    place(330, 20, 'ATIVO')
+    place(350, 200, f'   NS{idx:08d}   NN')
+    return ''.join(chars).rstrip()
+
+
+def _legacy_normalize(line: str, base: dict, map_config: dict) -> dict:
+    """Cópia do laço por linha usado antes do plano compilado."""
+    columns_cfg = map_config.get('columns') or []
+    try:
+        decimal_divisor = Decimal(str(map_config.get('decimal_divisor') or '1'))
+    except (InvalidOperation, ValueError):
+        decimal_divisor = Decimal('1')
+    postprocess_cfg = map_config.get('postprocess')
+    field_map = _resolve_simpro_field_map(map_config)
+
+    record = dict(base)
+    for cfg in columns_cfg:
+        name = (cfg.get('name') or '').strip()
+        start = max(int(cfg.get('start', 1)) - 1, 0)
+        length = max(int(cfg.get('length', 0)), 0)
+        if length <= 0:
+            record[name] = None
+            continue
+        raw_value = line[start:start + length]
+        if cfg.get('strip') and isinstance(cfg['strip'], (list, tuple)):
+            for ch in cfg['strip']:
+                raw_value = raw_value.replace(str(ch), '')
+        if cfg.get('rtrim'):
+            raw_value = raw_value.rstrip()
+        value = raw_value.strip()
+        if not value:
+            record[name] = None
+            continue
+        value_type = (cfg.get('type') or '').strip().lower()
+        if value_type == 'decimal':
+            coerced = _coerce_decimal(_sanitize_numeric(value))
+            if coerced is None:
+                record[name] = None
+            else:
+                divisor = Decimal(str(cfg.get('divide_by', decimal_divisor) or '1'))
+                scaled = Decimal(coerced) / divisor
+                if scaled >= Decimal('10000000'):
+                    adjusted = scaled / Decimal('1000000')
+                    if adjusted >= Decimal('0.01'):
+                        scaled = adjusted
+                record[name] = _auto_scale_decimal(scaled)
+        elif value_type == 'date':
+            record[name] = _parse_fixed_date(value, cfg.get('date_fmt'))
+        elif value_type == 'int':
+            digits = ''.join(ch for ch in value if ch.isdigit() or ch == '-')
+            record[name] = int(digits) if digits else None
+        else:
+            record[name] = value
+
+    _apply_simpro_postprocess(record, postprocess_cfg)
+    _enrich_tuss_from_ean(record)
+    _ensure_tuss_from_line(record, line)
+    _ensure_tuss_field(record)
+    payload = dict(base)
+    payload.update(_build_simpro_payload(record, field_map))
+    return payload
+
+
+def main() -> None:
+    total_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    lines = [_build_line(idx) for idx in range(1, total_lines + 1)]
+    base = {'id': 1, 'arquivo': 'BENCH', 'linha_num': 1, 'versao': '2025-09', 'uf_referencia': 'SP', 'imported_at': None}
+
+    plan = _compile_simpro_column_plan(MAP_CONFIG)
+    for line in lines[:50]:
+        legacy = _legacy_normalize(line, base, MAP_CONFIG)
+        compiled = _normalize_simpro_line(plan, line, base)
+        compiled_map = dict(zip(_SIMPRO_NORM_INSERT_COLUMNS, compiled))
+        expected = {key: legacy.get(key) for key in _SIMPRO_NORM_INSERT_COLUMNS}
+        assert compiled_map == expected, (compiled_map, expected)
+
+    def _best(fn) -> float:
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    legacy_time = _best(lambda: [_legacy_normalize(line, base, MAP_CONFIG) for line in lines])
+    compiled_time = _best(lambda: [_normalize_simpro_line(plan, line, base) for line in lines])
+
+    print(f'linhas: {total_lines} | repetições: {repeats}')
+    print(f'mapa dinâmico : {legacy_time:.3f}s ({total_lines / legacy_time:,.0f} linhas/s)')
+    print(f'plano compilado: {compiled_time:.3f}s ({total_lines / compiled_time:,.0f} linhas/s)')
+    print(f'ganho: {legacy_time / compiled_time:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -5,12 +5,15 @@
 SET NAMES utf8mb4 COLLATE utf8mb4_unicode_ci;
 SET FOREIGN_KEY_CHECKS = 0;
 
-DROP VIEW IF EXISTS mv_catalogo_vigente_simpro;
-DROP VIEW IF EXISTS mv_catalogo_vigente_brasindice;
+-- Os catálogos vigentes são tabelas físicas reconstruídas pelo app (tabela sombra + RENAME TABLE).
+-- Em bases antigas, onde ainda eram views, rode antes: DROP VIEW mv_catalogo_vigente_simpro, mv_catalogo_vigente_brasindice;
+DROP TABLE IF EXISTS mv_catalogo_vigente_simpro;
+DROP TABLE IF EXISTS mv_catalogo_vigente_brasindice;
 DROP VIEW IF EXISTS vw_canon_simpro;
 DROP VIEW IF EXISTS vw_canon_brasindice;
 DROP VIEW IF EXISTS vw_aliquota_vigente;
 DROP VIEW IF EXISTS vw_cadastro_aliquota;
+DROP TABLE IF EXISTS catalogo_versao;
 DROP TABLE IF EXISTS linha_hash;
 DROP TABLE IF EXISTS publicacao;
 DROP TABLE IF EXISTS lote;
@@ -61,6 +64,21 @@ CREATE TABLE publicacao (
     CONSTRAINT fk_publicacao_lote FOREIGN KEY (lote_id) REFERENCES lote(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+CREATE TABLE catalogo_versao (
+    fornecedor            VARCHAR(50)  NOT NULL,
+    versao_publicada      INT          NOT NULL DEFAULT 0,
+    versao_materializada  INT          NOT NULL DEFAULT 0,
+    etag_publicado        VARCHAR(255) NULL,
+    etag_materializado    VARCHAR(255) NULL,
+    publicado_em          DATETIME     NULL,
+    materializado_em      DATETIME     NULL,
+    PRIMARY KEY (fornecedor)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Linhas semeadas: o app trava a linha (SELECT ... FOR UPDATE) ao incrementar a versão.
+INSERT IGNORE INTO catalogo_versao (fornecedor)
+VALUES ('BRASINDICE'), ('SIMPRO'), ('INSUMOS_INDEX'), ('PROCEDIMENTOS');
+
 CREATE TABLE linha_hash (
     id               BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
     lote_id          BIGINT UNSIGNED NOT NULL,
@@ -154,59 +172,117 @@ WHERE p.fornecedor = CAST('SIMPRO' AS CHAR CHARACTER SET utf8mb4) COLLATE utf8mb
            AND p2.aliquota_bp = p.aliquota_bp
     );
 
-CREATE OR REPLACE VIEW mv_catalogo_vigente_brasindice AS
+CREATE TABLE mv_catalogo_vigente_brasindice (
+    uf CHAR(2) NOT NULL,
+    aliquota_bp INT NOT NULL,
+    valid_from DATE NULL,
+    valid_to DATE NULL,
+    periodo CHAR(6) NULL,
+    sequencia SMALLINT NULL,
+    etag_versao VARCHAR(128) NULL,
+    item_id BIGINT NOT NULL,
+    produto_codigo VARCHAR(50) NULL,
+    apresentacao_codigo VARCHAR(50) NULL,
+    produto_nome VARCHAR(255) NULL,
+    apresentacao_descricao VARCHAR(255) NULL,
+    ean VARCHAR(20) NULL,
+    registro_anvisa VARCHAR(50) NULL,
+    preco_pmc_unit DECIMAL(15,4) NULL,
+    preco_pfb_unit DECIMAL(15,4) NULL,
+    preco_pmc_pacote DECIMAL(15,4) NULL,
+    preco_pfb_pacote DECIMAL(15,4) NULL,
+    laboratorio_nome VARCHAR(255) NULL,
+    edicao VARCHAR(50) NULL,
+    imported_at DATETIME NULL,
+    etag_catalogo VARCHAR(255) NULL,
+    descricao_norm VARCHAR(500) NULL,
+    fabricante_norm VARCHAR(255) NULL,
+    KEY idx_mv_bras_uf_item (uf, item_id),
+    KEY idx_mv_bras_nome (produto_nome, item_id),
+    KEY idx_mv_bras_uf_nome (uf, produto_nome, item_id),
+    KEY idx_mv_bras_produto (produto_codigo),
+    KEY idx_mv_bras_apresentacao (apresentacao_codigo),
+    KEY idx_mv_bras_anvisa (registro_anvisa),
+    KEY idx_mv_bras_aliquota (aliquota_bp),
+    KEY idx_mv_bras_periodo (periodo),
+    KEY idx_mv_bras_descricao_norm (descricao_norm),
+    KEY idx_mv_bras_fabricante_norm (fabricante_norm),
+    FULLTEXT KEY ft_mv_catalogo_vigente_brasindice (produto_nome, apresentacao_descricao, ean, registro_anvisa) WITH PARSER ngram
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE mv_catalogo_vigente_simpro (
+    uf CHAR(2) NOT NULL,
+    aliquota_bp INT NOT NULL,
+    valid_from DATE NULL,
+    valid_to DATE NULL,
+    periodo CHAR(6) NULL,
+    sequencia SMALLINT NULL,
+    etag_versao VARCHAR(128) NULL,
+    item_id BIGINT NOT NULL,
+    codigo VARCHAR(20) NULL,
+    codigo_alt VARCHAR(20) NULL,
+    descricao VARCHAR(255) NULL,
+    data_ref DATE NULL,
+    preco1 DECIMAL(15,4) NULL,
+    preco2 DECIMAL(15,4) NULL,
+    preco3 DECIMAL(15,4) NULL,
+    preco4 DECIMAL(15,4) NULL,
+    qtd_unidade INT NULL,
+    fabricante VARCHAR(80) NULL,
+    anvisa VARCHAR(20) NULL,
+    validade_anvisa DATE NULL,
+    ean VARCHAR(32) NULL,
+    situacao VARCHAR(40) NULL,
+    imported_at DATETIME NULL,
+    etag_catalogo VARCHAR(255) NULL,
+    descricao_norm VARCHAR(255) NULL,
+    fabricante_norm VARCHAR(80) NULL,
+    KEY idx_mv_simpro_uf_item (uf, item_id),
+    KEY idx_mv_simpro_desc (descricao, item_id),
+    KEY idx_mv_simpro_uf_desc (uf, descricao, item_id),
+    KEY idx_mv_simpro_codigo (codigo),
+    KEY idx_mv_simpro_codigo_alt (codigo_alt),
+    KEY idx_mv_simpro_anvisa (anvisa),
+    KEY idx_mv_simpro_aliquota (aliquota_bp),
+    KEY idx_mv_simpro_periodo (periodo),
+    KEY idx_mv_simpro_descricao_norm (descricao_norm),
+    KEY idx_mv_simpro_fabricante_norm (fabricante_norm),
+    FULLTEXT KEY ft_mv_catalogo_vigente_simpro (descricao, codigo, ean) WITH PARSER ngram
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Carga inicial; depois disso publicar_lote e /insumos/aliquotas reconstroem as tabelas.
+-- As colunas *_norm usam a mesma dobra de app._sql_search_norm (maiúsculas, sem acentos,
+-- pontuação colapsada em um espaço).
+INSERT INTO mv_catalogo_vigente_brasindice (
+    uf, aliquota_bp, valid_from, valid_to, periodo, sequencia, etag_versao, item_id,
+    produto_codigo, apresentacao_codigo, produto_nome, apresentacao_descricao, ean, registro_anvisa,
+    preco_pmc_unit, preco_pfb_unit, preco_pmc_pacote, preco_pfb_pacote, laboratorio_nome, edicao,
+    imported_at, etag_catalogo, descricao_norm, fabricante_norm
+)
 SELECT
-    ua.uf,
-    c.aliquota_bp,
-    ua.valid_from,
-    ua.valid_to,
-    c.periodo,
-    c.sequencia,
-    c.etag_versao,
-    c.item_id,
-    c.produto_codigo,
-    c.apresentacao_codigo,
-    c.produto_nome,
-    c.apresentacao_descricao,
-    c.ean,
-    c.registro_anvisa,
-    c.preco_pmc_unit,
-    c.preco_pfb_unit,
-    c.preco_pmc_pacote,
-    c.preco_pfb_pacote,
-    c.laboratorio_nome,
-    c.edicao,
+    ua.uf, c.aliquota_bp, ua.valid_from, ua.valid_to, c.periodo, c.sequencia, c.etag_versao, c.item_id,
+    c.produto_codigo, c.apresentacao_codigo, c.produto_nome, c.apresentacao_descricao, c.ean, c.registro_anvisa,
+    c.preco_pmc_unit, c.preco_pfb_unit, c.preco_pmc_pacote, c.preco_pfb_pacote, c.laboratorio_nome, c.edicao,
     c.imported_at,
-    CONCAT(CAST('BRASINDICE:' AS CHAR CHARACTER SET utf8mb4) COLLATE utf8mb4_unicode_ci, ua.uf, ':', c.etag_versao) AS etag_catalogo
+    CONCAT(CAST('BRASINDICE:' AS CHAR CHARACTER SET utf8mb4) COLLATE utf8mb4_unicode_ci, ua.uf, ':', c.etag_versao),
+    NULLIF(TRIM(REGEXP_REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(UPPER(CONCAT_WS(' ', c.produto_nome, c.apresentacao_descricao)), 'Á', 'A'), 'À', 'A'), 'Â', 'A'), 'Ã', 'A'), 'Ä', 'A'), 'É', 'E'), 'È', 'E'), 'Ê', 'E'), 'Ë', 'E'), 'Í', 'I'), 'Ì', 'I'), 'Î', 'I'), 'Ï', 'I'), 'Ó', 'O'), 'Ò', 'O'), 'Ô', 'O'), 'Õ', 'O'), 'Ö', 'O'), 'Ú', 'U'), 'Ù', 'U'), 'Û', 'U'), 'Ü', 'U'), 'Ç', 'C'), 'Ñ', 'N'), '[^A-Z0-9]+', ' ')), ''),
+    NULLIF(TRIM(REGEXP_REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(UPPER(c.laboratorio_nome), 'Á', 'A'), 'À', 'A'), 'Â', 'A'), 'Ã', 'A'), 'Ä', 'A'), 'É', 'E'), 'È', 'E'), 'Ê', 'E'), 'Ë', 'E'), 'Í', 'I'), 'Ì', 'I'), 'Î', 'I'), 'Ï', 'I'), 'Ó', 'O'), 'Ò', 'O'), 'Ô', 'O'), 'Õ', 'O'), 'Ö', 'O'), 'Ú', 'U'), 'Ù', 'U'), 'Û', 'U'), 'Ü', 'U'), 'Ç', 'C'), 'Ñ', 'N'), '[^A-Z0-9]+', ' ')), '')
 FROM vw_aliquota_vigente ua
 JOIN vw_canon_brasindice c ON c.aliquota_bp = ua.aliquota_bp;
 
-CREATE OR REPLACE VIEW mv_catalogo_vigente_simpro AS
+INSERT INTO mv_catalogo_vigente_simpro (
+    uf, aliquota_bp, valid_from, valid_to, periodo, sequencia, etag_versao, item_id,
+    codigo, codigo_alt, descricao, data_ref, preco1, preco2, preco3, preco4, qtd_unidade,
+    fabricante, anvisa, validade_anvisa, ean, situacao, imported_at, etag_catalogo,
+    descricao_norm, fabricante_norm
+)
 SELECT
-    ua.uf,
-    c.aliquota_bp,
-    ua.valid_from,
-    ua.valid_to,
-    c.periodo,
-    c.sequencia,
-    c.etag_versao,
-    c.item_id,
-    c.codigo,
-    c.codigo_alt,
-    c.descricao,
-    c.data_ref,
-    c.preco1,
-    c.preco2,
-    c.preco3,
-    c.preco4,
-    c.qtd_unidade,
-    c.fabricante,
-    c.anvisa,
-    c.validade_anvisa,
-    c.ean,
-    c.situacao,
-    c.imported_at,
-    CONCAT(CAST('SIMPRO:' AS CHAR CHARACTER SET utf8mb4) COLLATE utf8mb4_unicode_ci, ua.uf, ':', c.etag_versao) AS etag_catalogo
+    ua.uf, c.aliquota_bp, ua.valid_from, ua.valid_to, c.periodo, c.sequencia, c.etag_versao, c.item_id,
+    c.codigo, c.codigo_alt, c.descricao, c.data_ref, c.preco1, c.preco2, c.preco3, c.preco4, c.qtd_unidade,
+    c.fabricante, c.anvisa, c.validade_anvisa, c.ean, c.situacao, c.imported_at,
+    CONCAT(CAST('SIMPRO:' AS CHAR CHARACTER SET utf8mb4) COLLATE utf8mb4_unicode_ci, ua.uf, ':', c.etag_versao),
+    NULLIF(TRIM(REGEXP_REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(UPPER(c.descricao), 'Á', 'A'), 'À', 'A'), 'Â', 'A'), 'Ã', 'A'), 'Ä', 'A'), 'É', 'E'), 'È', 'E'), 'Ê', 'E'), 'Ë', 'E'), 'Í', 'I'), 'Ì', 'I'), 'Î', 'I'), 'Ï', 'I'), 'Ó', 'O'), 'Ò', 'O'), 'Ô', 'O'), 'Õ', 'O'), 'Ö', 'O'), 'Ú', 'U'), 'Ù', 'U'), 'Û', 'U'), 'Ü', 'U'), 'Ç', 'C'), 'Ñ', 'N'), '[^A-Z0-9]+', ' ')), ''),
+    NULLIF(TRIM(REGEXP_REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(UPPER(c.fabricante), 'Á', 'A'), 'À', 'A'), 'Â', 'A'), 'Ã', 'A'), 'Ä', 'A'), 'É', 'E'), 'È', 'E'), 'Ê', 'E'), 'Ë', 'E'), 'Í', 'I'), 'Ì', 'I'), 'Î', 'I'), 'Ï', 'I'), 'Ó', 'O'), 'Ò', 'O'), 'Ô', 'O'), 'Õ', 'O'), 'Ö', 'O'), 'Ú', 'U'), 'Ù', 'U'), 'Û', 'U'), 'Ü', 'U'), 'Ç', 'C'), 'Ñ', 'N'), '[^A-Z0-9]+', ' ')), '')
 FROM vw_aliquota_vigente ua
 JOIN vw_canon_simpro c ON c.aliquota_bp = ua.aliquota_bp;
 
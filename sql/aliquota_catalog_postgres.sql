@@ -55,6 +55,21 @@ CREATE TABLE IF NOT EXISTS publicacao (
     CONSTRAINT uq_publicacao_identidade UNIQUE (fornecedor, aliquota_bp, periodo, sequencia)
 );
 
+CREATE TABLE IF NOT EXISTS catalogo_versao (
+    fornecedor            VARCHAR(50)  PRIMARY KEY,
+    versao_publicada      INTEGER      NOT NULL DEFAULT 0,
+    versao_materializada  INTEGER      NOT NULL DEFAULT 0,
+    etag_publicado        VARCHAR(255),
+    etag_materializado    VARCHAR(255),
+    publicado_em          TIMESTAMPTZ,
+    materializado_em      TIMESTAMPTZ
+);
+
+-- Linhas semeadas: o app trava a linha (SELECT ... FOR UPDATE) ao incrementar a versão.
+INSERT INTO catalogo_versao (fornecedor)
+VALUES ('BRASINDICE'), ('SIMPRO'), ('INSUMOS_INDEX'), ('PROCEDIMENTOS')
+ON CONFLICT (fornecedor) DO NOTHING;
+
 CREATE TABLE IF NOT EXISTS linha_hash (
     id               BIGSERIAL    PRIMARY KEY,
     lote_id          BIGINT       NOT NULL REFERENCES lote(id) ON DELETE CASCADE,
@@ -362,29 +377,49 @@ BEGIN
             v_lote.id, concat_ws('-', v_fornecedor, p_periodo, p_sequencia))
     RETURNING id INTO v_publicacao_id;
 
-    PERFORM _refresh_materialized_catalogs(v_fornecedor);
+    INSERT INTO catalogo_versao (fornecedor, versao_publicada, etag_publicado, publicado_em)
+    VALUES (v_fornecedor, 1, concat_ws('-', v_fornecedor, p_periodo, p_sequencia), now())
+    ON CONFLICT (fornecedor) DO UPDATE
+       SET versao_publicada = catalogo_versao.versao_publicada + 1,
+           etag_publicado = EXCLUDED.etag_publicado,
+           publicado_em = EXCLUDED.publicado_em;
+
+    -- O refresh é síncrono: se todas as views foram atualizadas, a versão publicada já está materializada.
+    IF _refresh_materialized_catalogs(v_fornecedor) THEN
+        UPDATE catalogo_versao
+           SET versao_materializada = versao_publicada,
+               etag_materializado = etag_publicado,
+               materializado_em = now()
+         WHERE fornecedor = v_fornecedor;
+    END IF;
     RETURN v_publicacao_id;
 END;
 $$;
 
+-- O tipo de retorno mudou de VOID para BOOLEAN; CREATE OR REPLACE não troca o tipo.
+DROP FUNCTION IF EXISTS _refresh_materialized_catalogs(TEXT);
+
 CREATE OR REPLACE FUNCTION _refresh_materialized_catalogs(p_fornecedor TEXT)
-RETURNS VOID
+RETURNS BOOLEAN
 LANGUAGE plpgsql
 AS $$
 DECLARE
     v_view TEXT;
+    v_ok   BOOLEAN := TRUE;
 BEGIN
     FOR v_view IN SELECT unnest(ARRAY[
         CASE WHEN upper(p_fornecedor) = 'BRASINDICE' THEN 'mv_catalogo_vigente_brasindice' END,
         CASE WHEN upper(p_fornecedor) = 'SIMPRO' THEN 'mv_catalogo_vigente_simpro' END
     ]) LOOP
-        EXIT WHEN v_view IS NULL;
+        CONTINUE WHEN v_view IS NULL;
         BEGIN
-            EXECUTE format('REFRESH MATERIALIZED VIEW IF EXISTS %I', v_view);
+            EXECUTE format('REFRESH MATERIALIZED VIEW %I', v_view);
         EXCEPTION WHEN OTHERS THEN
             RAISE WARNING 'Falha ao atualizar %: %', v_view, SQLERRM;
+            v_ok := FALSE;
         END;
     END LOOP;
+    RETURN v_ok;
 END;
 $$;
 
@@ -466,8 +501,28 @@ SELECT
 FROM simpro_item_norm s
 JOIN last_pub lp ON lp.arquivo_label = s.arquivo;
 
+-- ---------------------------------------------------------------------------
+-- Normalização de busca (mesma regra de app._normalize_search_text):
+-- maiúsculas, sem acentos e pontuação colapsada em um espaço.
+-- ---------------------------------------------------------------------------
+
+CREATE OR REPLACE FUNCTION fn_busca_norm(p_valor TEXT)
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT NULLIF(
+        btrim(regexp_replace(
+            translate(upper(p_valor), 'ÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑ', 'AAAAAEEEEIIIIOOOOOUUUUCN'),
+            '[^A-Z0-9]+', ' ', 'g'
+        )),
+        ''
+    );
+$$;
+
 -- ---------------------------------------------------------------------------
 -- Catálogo vigente por UF (materialized views) – carregar com REFRESH
+-- Bases anteriores às colunas *_norm: DROP MATERIALIZED VIEW das duas views antes de rodar.
 -- ---------------------------------------------------------------------------
 
 CREATE MATERIALIZED VIEW IF NOT EXISTS mv_catalogo_vigente_brasindice AS
@@ -491,11 +546,18 @@ SELECT
     b.laboratorio_nome,
     b.edicao,
     b.imported_at,
-    concat('BRASINDICE', ':', ua.uf, ':', b.etag_versao) AS etag_catalogo
+    concat('BRASINDICE', ':', ua.uf, ':', b.etag_versao) AS etag_catalogo,
+    fn_busca_norm(concat_ws(' ', b.produto_nome, b.apresentacao_descricao)) AS descricao_norm,
+    fn_busca_norm(b.laboratorio_nome) AS fabricante_norm
 FROM vw_aliquota_vigente ua
 JOIN vw_canon_brasindice b ON b.aliquota_bp = ua.aliquota_bp
 WITH NO DATA;
 
+-- Índice único exigido por REFRESH MATERIALIZED VIEW CONCURRENTLY.
+CREATE UNIQUE INDEX IF NOT EXISTS uq_mv_catalogo_vigente_brasindice ON mv_catalogo_vigente_brasindice (uf, item_id);
+CREATE INDEX IF NOT EXISTS idx_mv_bras_descricao_norm ON mv_catalogo_vigente_brasindice (descricao_norm text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_mv_bras_fabricante_norm ON mv_catalogo_vigente_brasindice (fabricante_norm text_pattern_ops);
+
 CREATE MATERIALIZED VIEW IF NOT EXISTS mv_catalogo_vigente_simpro AS
 SELECT
     ua.uf,
@@ -519,11 +581,17 @@ SELECT
     s.ean,
     s.situacao,
     s.imported_at,
-    concat('SIMPRO', ':', ua.uf, ':', s.etag_versao) AS etag_catalogo
+    concat('SIMPRO', ':', ua.uf, ':', s.etag_versao) AS etag_catalogo,
+    fn_busca_norm(s.descricao) AS descricao_norm,
+    fn_busca_norm(s.fabricante) AS fabricante_norm
 FROM vw_aliquota_vigente ua
 JOIN vw_canon_simpro s ON s.aliquota_bp = ua.aliquota_bp
 WITH NO DATA;
 
+CREATE UNIQUE INDEX IF NOT EXISTS uq_mv_catalogo_vigente_simpro ON mv_catalogo_vigente_simpro (uf, item_id);
+CREATE INDEX IF NOT EXISTS idx_mv_simpro_descricao_norm ON mv_catalogo_vigente_simpro (descricao_norm text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_mv_simpro_fabricante_norm ON mv_catalogo_vigente_simpro (fabricante_norm text_pattern_ops);
+
 -- ---------------------------------------------------------------------------
 -- Dados iniciais de UF → alíquota (ajuste conforme necessidade)
 -- ---------------------------------------------------------------------------
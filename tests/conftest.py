@@ -2,6 +2,14 @@ import importlib
 import sys
 
 import pytest
+from sqlalchemy import BigInteger
+from sqlalchemy.ext.compiler import compiles
+
+
+@compiles(BigInteger, 'sqlite')
+def _sqlite_bigint(type_, compiler, **kw):
+    # No SQLite só "INTEGER PRIMARY KEY" recebe autoincremento (as tabelas de stage usam BigInteger).
+    return 'INTEGER'
 
 
 @pytest.fixture
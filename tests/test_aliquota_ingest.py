@@ -1,5 +1,7 @@
+import hashlib
+import json
 from decimal import Decimal
-from datetime import datetime
+from datetime import date, datetime
 
 import pytest
 
@@ -80,3 +82,372 @@ def test_ingestir_e_publicar_lote_bras(app_ctx):
 ])
 def test_normalize_aliquota_bp_variants(app_ctx, aliquota_in, expected):
     assert app_ctx._normalize_aliquota_bp(aliquota_in) == expected
+
+
+def test_apply_import_delta_bras(app_ctx):
+    db = app_ctx.db
+    BrasItem = app_ctx.BrasItemNormalized
+    label = 'BRAS_DELTA'
+    staging = label + app_ctx.IMPORT_DELTA_LABEL_SUFFIX
+
+    def _item(item_id, arquivo, linha_num, produto, preco):
+        return BrasItem(
+            id=item_id,
+            arquivo=arquivo,
+            linha_num=linha_num,
+            produto_codigo=produto,
+            apresentacao_codigo='AP',
+            ean=f'789{produto}',
+            produto_nome=f'Produto {produto}',
+            preco_pmc_unit=Decimal(preco),
+        )
+
+    db.session.add_all([
+        _item(1, label, 1, 'P1', '10.00'),
+        _item(2, label, 2, 'P2', '20.00'),
+        _item(3, label, 3, 'P3', '30.00'),
+        _item(11, staging, 2, 'P1', '10.00'),
+        _item(12, staging, 1, 'P2', '25.00'),
+        _item(14, staging, 3, 'P4', '40.00'),
+    ])
+    db.session.add(app_ctx.InsumoIndex(origem='BRAS', item_id=3, descricao='Produto P3'))
+    db.session.commit()
+
+    metrics = {}
+    counts, item_ids = app_ctx._apply_import_delta(
+        app_ctx._SUPPLIER_CONFIGS['BRASINDICE'],
+        arquivo_label=label,
+        staging_label=staging,
+        stage_tables=('bras_raw',),
+        metrics=metrics,
+    )
+
+    assert counts == {'inserted': 1, 'updated': 1, 'deleted': 1, 'unchanged': 1}
+    assert sorted(item_ids) == [2, 14]
+    assert metrics['delta'][label]['unchanged'] == 1
+
+    db.session.expire_all()
+    rows = {row.id: row for row in BrasItem.query.all()}
+    assert sorted(rows) == [1, 2, 14]
+    assert {row.arquivo for row in rows.values()} == {label}
+    assert rows[1].linha_num == 2
+    assert rows[2].preco_pmc_unit == Decimal('25.00')
+    assert rows[2].linha_num == 1
+    assert app_ctx.InsumoIndex.query.count() == 0
+
+
+def test_apply_import_delta_compares_all_columns_and_keeps_lotes(app_ctx):
+    db = app_ctx.db
+    BrasItem = app_ctx.BrasItemNormalized
+    config = app_ctx._SUPPLIER_CONFIGS['BRASINDICE']
+    previous = 'BRAS_2025_01_SP'
+    target = 'BRAS_2025_02_SP'
+    staging = target + app_ctx.IMPORT_DELTA_LABEL_SUFFIX
+
+    def _item(item_id, arquivo, produto, nome, quantidade=1):
+        return BrasItem(
+            id=item_id,
+            arquivo=arquivo,
+            linha_num=item_id % 10,
+            produto_codigo=produto,
+            apresentacao_codigo='AP',
+            ean=f'789{produto}',
+            produto_nome=nome,
+            quantidade_embalagem=quantidade,
+            preco_pmc_unit=Decimal('10.00'),
+        )
+
+    db.session.add_all([
+        _item(1, target, 'P1', 'Produto 1'),
+        _item(2, target, 'P2', 'Produto 2'),
+        _item(3, target, 'P3', 'Produto 3'),
+        _item(4, previous, 'P1', 'Produto 1'),
+        _item(11, staging, 'P1', 'Produto 1'),
+        _item(12, staging, 'P2', 'Produto 2 novo nome'),
+        _item(13, staging, 'P3', 'Produto 3', quantidade=10),
+        app_ctx.Lote(
+            id=1,
+            fornecedor='BRASINDICE',
+            aliquota_bp=1800,
+            periodo='202501',
+            sequencia=1,
+            arquivo_label=previous,
+            status=app_ctx.LoteStatus.PUBLICADO,
+            publicado_em=datetime.utcnow(),
+        ),
+    ])
+    db.session.commit()
+
+    counts, item_ids = app_ctx._apply_import_delta(
+        config,
+        arquivo_label=target,
+        staging_label=staging,
+        stage_tables=('bras_raw',),
+    )
+
+    assert counts == {'inserted': 0, 'updated': 2, 'deleted': 0, 'unchanged': 1}
+    assert sorted(item_ids) == [2, 3]
+
+    db.session.expire_all()
+    rows = {row.id: row for row in BrasItem.query.all()}
+    assert sorted(rows) == [1, 2, 3, 4]
+    assert rows[4].arquivo == previous
+    assert {rows[item_id].arquivo for item_id in (1, 2, 3)} == {target}
+    assert rows[2].produto_nome == 'Produto 2 novo nome'
+    assert rows[3].quantidade_embalagem == 10
+    # O delta nunca reescreve lotes: o publicado anterior continua no próprio rótulo.
+    assert db.session.get(app_ctx.Lote, 1).arquivo_label == previous
+
+
+def test_find_unchanged_import_matches_published_hash(app_ctx):
+    db = app_ctx.db
+    label = 'BRAS_2025_01_SP'
+    db.session.add(app_ctx.BrasItemNormalized(id=1, arquivo=label, linha_num=1, produto_codigo='P1'))
+    db.session.add(app_ctx.Lote(
+        id=1,
+        fornecedor='BRASINDICE',
+        aliquota_bp=1700,
+        periodo='202501',
+        sequencia=1,
+        arquivo_label=label,
+        hash_arquivo='abc123',
+        status=app_ctx.LoteStatus.PUBLICADO,
+        publicado_em=datetime.utcnow(),
+    ))
+    db.session.commit()
+
+    labels = app_ctx._import_target_labels('BRAS', 'BRAS_2025_01', uf_default='sp', uf_values=['SP'])
+    assert labels == [label]
+    assert app_ctx._import_target_labels('SIMPRO', 'SIMPRO_ED', uf_default=None, uf_values=['sp', 'RJ']) == ['SIMPRO_ED']
+    assert app_ctx._import_target_labels('SIMPRO', 'SIMPRO_ED', uf_default='rj', uf_values=None) == ['SIMPRO_ED_RJ']
+
+    def _lookup(hash_arquivo, aliquota='17', arquivo_labels=labels):
+        return app_ctx._find_unchanged_import(
+            'BRAS',
+            hash_arquivo,
+            versao='2025-01',
+            aliquota_value=Decimal(aliquota),
+            arquivo_labels=arquivo_labels,
+        )
+
+    assert _lookup('abc123').id == 1
+    assert _lookup('outro-hash') is None
+    assert _lookup('abc123', aliquota='12') is None
+    assert _lookup('abc123', arquivo_labels=['BRAS_2025_01_RJ']) is None
+
+
+def test_purge_legacy_simpro_uf_labels_keeps_current_publications(app_ctx):
+    db = app_ctx.db
+    for item_id, label in ((1, 'SIMPRO_ED_SP'), (2, 'SIMPRO_ED_RJ'), (3, 'SIMPRO_ED')):
+        db.session.add(app_ctx.SimproItemNormalized(
+            id=item_id, arquivo=label, linha_num=1, codigo=str(item_id), descricao=f'Item {item_id}',
+        ))
+    publicacoes = (
+        (1, 1800, 'SIMPRO_ED_SP', datetime(2025, 1, 1)),
+        (2, 1900, 'SIMPRO_ED_RJ', datetime(2025, 1, 1)),
+        (3, 1900, 'SIMPRO_ED', datetime(2025, 2, 1)),
+    )
+    for lote_id, aliquota_bp, label, publicado_em in publicacoes:
+        db.session.add(app_ctx.Lote(
+            id=lote_id,
+            fornecedor='SIMPRO',
+            aliquota_bp=aliquota_bp,
+            periodo='202501',
+            sequencia=lote_id,
+            arquivo_label=label,
+            status=app_ctx.LoteStatus.PUBLICADO,
+            publicado_em=publicado_em,
+        ))
+        db.session.add(app_ctx.Publicacao(
+            fornecedor='SIMPRO',
+            aliquota_bp=aliquota_bp,
+            periodo='202501',
+            sequencia=lote_id,
+            lote_id=lote_id,
+            publicado_em=publicado_em,
+            etag_versao=f'SIMPRO:202501:{lote_id}',
+        ))
+    db.session.commit()
+
+    assert app_ctx._current_published_labels('SIMPRO') == {'SIMPRO_ED_SP', 'SIMPRO_ED'}
+    removed = app_ctx._purge_legacy_simpro_uf_labels('SIMPRO_ED', ['SP', 'RJ'])
+
+    assert 'SIMPRO_ED_SP' not in removed and 'SIMPRO_ED_RJ' in removed
+    labels = {row.arquivo for row in app_ctx.SimproItemNormalized.query.all()}
+    assert labels == {'SIMPRO_ED_SP', 'SIMPRO_ED'}
+
+
+def test_catalog_refresh_follows_published_version(app_ctx, monkeypatch):
+    refreshed = []
+    monkeypatch.setattr(app_ctx, '_refresh_materialized_catalogs', refreshed.append)
+
+    app_ctx._catalogo_search(app_ctx._extract_insumo_filters({'q': 'inexistente'}), 1, 10)
+    assert refreshed == []
+
+    app_ctx._bump_catalogo_versao('SIMPRO', 'SIMPRO:202501:1')
+    app_ctx._bump_catalogo_versao('SIMPRO', 'SIMPRO:202501:2')
+    app_ctx.db.session.commit()
+
+    assert app_ctx._refresh_catalog_if_stale('SIMPRO') is True
+    assert app_ctx._refresh_catalog_if_stale('SIMPRO') is False
+    assert app_ctx._refresh_catalog_if_stale('BRASINDICE') is False
+    assert refreshed == ['SIMPRO']
+
+    versao = app_ctx.db.session.get(app_ctx.CatalogoVersao, 'SIMPRO', populate_existing=True)
+    assert versao.versao_publicada == versao.versao_materializada == 2
+    assert versao.etag_materializado == 'SIMPRO:202501:2'
+
+
+def test_publicar_lote_refreshes_catalog_after_commit(app_ctx, monkeypatch):
+    db = app_ctx.db
+    refreshed = []
+    monkeypatch.setattr(app_ctx, '_refresh_materialized_catalogs', refreshed.append)
+    db.session.add(app_ctx.BrasItemNormalized(arquivo='BRAS_2025_01', linha_num=1, produto_codigo='P1'))
+    db.session.commit()
+    for sequencia in (1, 2):
+        app_ctx.ingestir_arquivo(
+            fornecedor='BRASINDICE', origem='BRAS', aliquota_bp=1700, periodo='202501',
+            sequencia=sequencia, arquivo_label='BRAS_2025_01',
+        )
+
+    # Sem linha em catalogo_versao: _bump_catalogo_versao cria a linha antes de travá-la.
+    assert db.session.get(app_ctx.CatalogoVersao, 'BRASINDICE') is None
+    app_ctx.publicar_lote('BRASINDICE', 1700, '202501', 1, commit=False)
+    assert refreshed == []
+    db.session.rollback()
+    db.session.commit()
+    assert refreshed == []
+
+    app_ctx.publicar_lote('BRASINDICE', 1700, '202501', 2, commit=False)
+    assert refreshed == []
+    db.session.commit()
+    # Fora de uma requisição a chamada espera a reconstrução.
+    assert refreshed == ['BRASINDICE']
+    versao = db.session.get(app_ctx.CatalogoVersao, 'BRASINDICE', populate_existing=True)
+    assert versao.versao_publicada == versao.versao_materializada == 1
+    assert versao.etag_materializado == 'BRASINDICE:202501:2'
+
+
+def test_cli_import_records_file_hash_and_skips_repeat(app_ctx, monkeypatch, tmp_path):
+    db = app_ctx.db
+    calls = []
+
+    def _fake_import_bras(**kwargs):
+        calls.append(kwargs)
+        label = f"{kwargs['versao']}_{kwargs['uf_default']}"
+        db.session.add(app_ctx.BrasItemNormalized(arquivo=label, linha_num=len(calls), produto_codigo='P1'))
+        db.session.commit()
+        return {'arquivo': label, 'linhas_raw': 1, 'linhas_materializadas': 1}
+
+    monkeypatch.setattr(app_ctx, '_import_bras', _fake_import_bras)
+    monkeypatch.setattr(app_ctx, '_schedule_catalog_refresh', lambda *args, **kwargs: None)
+    monkeypatch.setattr(app_ctx, '_mark_catalogs_stale', lambda *args, **kwargs: None)
+    csv_file = tmp_path / 'bras.csv'
+    csv_file.write_text('codigo;produto\n1;PRODUTO\n', encoding='utf-8')
+    args = ['bras:import', '--file', str(csv_file), '--versao', 'BRAS_2025_01', '--uf', 'SP', '--aliquota', '18']
+
+    runner = app_ctx.app.test_cli_runner()
+    dry = runner.invoke(args=args)
+    assert dry.exit_code == 0, dry.output
+    assert app_ctx.Lote.query.count() == 0
+
+    first = runner.invoke(args=[*args, '--publicar'])
+    assert first.exit_code == 0, first.output
+    lote = app_ctx.Lote.query.one()
+    assert lote.hash_arquivo == app_ctx._compute_file_hash(csv_file)
+    assert lote.status == app_ctx.LoteStatus.PUBLICADO
+
+    second = runner.invoke(args=args)
+    assert second.exit_code == 0, second.output
+    assert 'Nenhuma alteração' in second.output
+    assert len(calls) == 2
+
+
+def test_upsert_linha_hashes_keeps_unchanged_rows(app_ctx):
+    db = app_ctx.db
+    LinhaHash = app_ctx.LinhaHash
+    lote = app_ctx.Lote(
+        fornecedor='BRASINDICE', aliquota_bp=1700, periodo='202501', sequencia=1, arquivo_label='BRAS_HASH'
+    )
+    db.session.add(lote)
+    db.session.commit()
+
+    metrics = {}
+    total = app_ctx._upsert_linha_hashes(
+        lote, [('A', 'h1', '{}'), ('B', 'h2', '{}'), ('C', 'h3', '{}')], metrics=metrics
+    )
+    db.session.commit()
+    assert total == 3
+    assert metrics['linha_hash']['BRAS_HASH']['itens'] == 3
+    before = {row.item_chave: row for row in LinhaHash.query.all()}
+    old_stamp = datetime(2020, 1, 1)
+    LinhaHash.query.update({'updated_at': old_stamp})
+    db.session.commit()
+
+    total = app_ctx._upsert_linha_hashes(lote, iter([('A', 'h1', '{}'), ('B', 'h2x', '{"v": 1}'), ('D', 'h4', '{}')]))
+    db.session.commit()
+
+    after = {row.item_chave: row for row in LinhaHash.query.all()}
+    assert total == 3
+    assert sorted(after) == ['A', 'B', 'D']
+    assert after['A'].id == before['A'].id and after['A'].updated_at == old_stamp
+    assert after['B'].id == before['B'].id and after['B'].updated_at != old_stamp
+    assert (after['B'].hash_linha, after['B'].payload_snapshot) == ('h2x', '{"v": 1}')
+
+
+@pytest.mark.parametrize('dialect_name,conflict,drop', [
+    ('mysql', 'ON DUPLICATE KEY UPDATE', 'DROP TEMPORARY TABLE IF EXISTS'),
+    ('postgresql', 'ON CONFLICT (lote_id, item_chave) DO UPDATE', 'DROP TABLE IF EXISTS'),
+])
+def test_linha_hash_upsert_sql_per_dialect(app_ctx, dialect_name, conflict, drop):
+    statements = app_ctx._linha_hash_upsert_sql(dialect_name)
+
+    assert set(statements) == {'create', 'drop', 'load', 'upsert'}
+    assert statements['drop'].startswith(drop)
+    assert conflict in statements['upsert']
+    assert statements['upsert'].startswith('INSERT INTO linha_hash (lote_id, item_chave, hash_linha, payload_snapshot)')
+    assert f'FROM {app_ctx._LINHA_HASH_TMP_TABLE} t' in statements['upsert']
+    # Só atualiza updated_at quando o hash muda.
+    if dialect_name == 'mysql':
+        assert 'IF(linha_hash.hash_linha = VALUES(hash_linha), linha_hash.updated_at' in statements['upsert']
+    else:
+        assert statements['upsert'].endswith('WHERE linha_hash.hash_linha <> excluded.hash_linha')
+
+
+def test_ingestir_streamed_hash_matches_full_materialization(app_ctx):
+    db = app_ctx.db
+    Simpro = app_ctx.SimproItemNormalized
+    label = 'SIMPRO_2025_01_SP'
+    db.session.add_all([
+        Simpro(id=7, arquivo=label, linha_num=3, codigo='C3', descricao='Cateter', preco1=Decimal('1.5000'),
+               data_ref=date(2025, 1, 10), validade_anvisa=date(2030, 5, 1)),
+        Simpro(id=2, arquivo=label, linha_num=1, codigo='C1', ean='7890001', descricao='Seringa 10 ml',
+               preco1=Decimal('0.3500'), preco4=Decimal('0')),
+        Simpro(id=5, arquivo=label, linha_num=2, codigo='C2', descricao='Agulha ção', fabricante=None),
+        Simpro(id=9, arquivo='OUTRO', linha_num=1, codigo='X', descricao='Fora do rótulo'),
+    ])
+    db.session.commit()
+
+    # Referência: o cálculo anterior, que materializava todas as linhas do rótulo como objetos ORM.
+    config = app_ctx._SUPPLIER_CONFIGS['SIMPRO']
+    aggregator = hashlib.sha256()
+    expected_lines = {}
+    for row in Simpro.query.filter(Simpro.arquivo == label).order_by(Simpro.id).all():
+        payload = app_ctx._serialize_row(row, config.hash_fields)
+        payload['linha_num'] = row.linha_num
+        payload['arquivo'] = row.arquivo
+        payload_json = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=app_ctx._json_default)
+        line_hash = hashlib.sha256(payload_json.encode('utf-8')).hexdigest()
+        item_key = app_ctx._build_item_key(row, config.item_key_fields)
+        aggregator.update(item_key.encode('utf-8'))
+        aggregator.update(line_hash.encode('utf-8'))
+        expected_lines[item_key] = (line_hash, payload_json)
+
+    lote = app_ctx.ingestir_arquivo(
+        fornecedor='SIMPRO', origem='SIMPRO', aliquota_bp=1800, periodo='202501', sequencia=1, arquivo_label=label,
+    )
+
+    assert lote.hash_arquivo == aggregator.hexdigest()
+    assert lote.total_itens == 3
+    stored = {row.item_chave: (row.hash_linha, row.payload_snapshot) for row in app_ctx.LinhaHash.query.all()}
+    assert stored == expected_lines
@@ -1,6 +1,12 @@
-from datetime import date, datetime
+import json
+import threading
+import time
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 
+import click
+import pytest
+
 
 def test_insumos_search_filters(app_ctx):
     session = app_ctx.db.session
@@ -276,3 +282,567 @@ def test_simpro_fixed_postprocess_pipeline(app_ctx):
     assert item_sn.tuss_prefix == 'SN'
     assert item_sn.tuss_numero == '90434668'
     assert item_sn.ean == '7896004710471'
+
+
+def test_bras_csv_fallback_streams_in_batches(app_ctx, tmp_path):
+    csv_file = tmp_path / 'bras.csv'
+    csv_file.write_text(
+        'codigo;produto;laboratorio\n' + ''.join(f'{idx};PRODUTO {idx};LAB\n' for idx in range(1, 26)),
+        encoding='utf-8',
+    )
+
+    metrics: dict = {}
+    inserted = app_ctx._bras_csv_fallback(
+        file_path=csv_file,
+        delimiter=';',
+        quotechar='"',
+        skip_header=True,
+        encoding='utf-8',
+        arquivo_label='BRAS_STREAM',
+        batch_size=10,
+        metrics=metrics,
+    )
+
+    assert inserted == 25
+    assert [batch['rows'] for batch in metrics['stage_batches']] == [10, 10, 5]
+    rows = (
+        app_ctx.BrasRaw.query.filter_by(arquivo='BRAS_STREAM')
+        .order_by(app_ctx.BrasRaw.linha_num)
+        .all()
+    )
+    assert [row.linha_num for row in rows] == list(range(1, 26))
+    assert (rows[0].col01, rows[0].col02, rows[-1].col02) == ('1', 'PRODUTO 1', 'PRODUTO 25')
+
+    broken_file = tmp_path / 'broken.csv'
+    broken_file.write_bytes(''.join(f'{idx};ITEM {idx}\n' for idx in range(1, 26)).encode('utf-8') + b'26;\xff\n')
+    with pytest.raises(click.ClickException):
+        app_ctx._bras_csv_fallback(
+            file_path=broken_file,
+            delimiter=';',
+            quotechar='"',
+            skip_header=False,
+            encoding='utf-8',
+            arquivo_label='BRAS_BROKEN',
+            batch_size=10,
+            metrics=metrics,
+        )
+    assert app_ctx.BrasRaw.query.filter_by(arquivo='BRAS_BROKEN').count() == 0
+    assert 'stage_batches' not in metrics
+
+
+def test_detect_file_encoding_single_pass(app_ctx, tmp_path):
+    utf8_file = tmp_path / 'utf8.txt'
+    utf8_file.write_bytes('Seringa descartável\n'.encode('utf-8'))
+    bom_file = tmp_path / 'bom.txt'
+    bom_file.write_bytes(b'\xef\xbb\xbf' + 'Agulha\n'.encode('utf-8'))
+    cp1252_file = tmp_path / 'cp1252.txt'
+    cp1252_file.write_bytes(('A' * 200000 + '\n').encode('ascii') + '“Luva” estéril\n'.encode('cp1252'))
+    latin1_file = tmp_path / 'latin1.txt'
+    latin1_file.write_bytes('Cateter útil\n'.encode('latin-1') + b'\x81\n')
+
+    metrics: dict = {}
+    assert app_ctx._detect_file_encoding(utf8_file, metrics=metrics) == 'utf-8'
+    assert metrics['encoding']['codec'] == 'utf-8'
+    assert 'detect_seconds' in metrics['encoding']
+    assert app_ctx._detect_file_encoding(bom_file) == 'utf-8-sig'
+    assert app_ctx._detect_file_encoding(cp1252_file) == 'cp1252'
+    assert app_ctx._detect_file_encoding(latin1_file) == 'latin-1'
+    assert app_ctx._detect_file_encoding(cp1252_file, 'latin-1') == 'latin-1'
+    assert app_ctx._detect_file_encoding(latin1_file, 'utf-8') == 'latin-1'
+
+
+def test_simpro_column_plan_normalizes_line(app_ctx):
+    map_config = {
+        "decimal_divisor": 100,
+        "columns": [
+            {"name": "codigo_interno", "start": 1, "length": 10},
+            {"name": "descricao_completa", "start": 12, "length": 30},
+            {"name": "data_vigencia", "start": 43, "length": 8, "type": "date", "date_fmt": "DDMMYYYY"},
+            {"name": "preco_pf", "start": 52, "length": 12, "type": "decimal"},
+            {"name": "preco_ph", "start": 52, "length": 12, "type": "decimal", "divide_by": 10},
+            {"name": "qtd_unidade", "start": 65, "length": 6, "type": "int"},
+            {"name": "ean", "start": 72, "length": 16, "strip": ["+"]},
+            {"name": "vazio", "start": 90, "length": 0},
+            {"name": "sufixo_livre", "start": 90, "length": 20, "rtrim": True},
+        ],
+        "postprocess": {
+            "extract": [
+                {"from": "sufixo_livre", "regex": "([A-Z]{2})\\s*$", "fields": {"status_final": 1}},
+                {"from": "sufixo_livre", "regex": "(", "fields": {"ignorado": 1}},
+            ],
+            "derive": [
+                {"name": "tuss", "expr": "tuss_prefix && tuss_numero ? tuss_prefix + tuss_numero : null"},
+            ],
+            "cleanup": ["sufixo_livre"],
+        },
+    }
+    line = (
+        '1234567890 '
+        + 'Cateter venoso central'.ljust(31)
+        + '15032025 '
+        + '000000012345 '
+        + '000010 '
+        + '580076#NN782760+ '
+        + '  ATIVO NN'
+    )
+
+    plan = app_ctx._compile_simpro_column_plan(map_config)
+    base = {'id': 7, 'arquivo': 'SIMPRO_TESTE', 'linha_num': 1, 'versao': '2025-09', 'uf_referencia': 'RJ', 'imported_at': None}
+    values = app_ctx._normalize_simpro_line(plan, line, base)
+    item = dict(zip(app_ctx._SIMPRO_NORM_INSERT_COLUMNS, values))
+
+    assert item['id'] == 7
+    assert item['codigo_interno'] == '1234567890'
+    assert item['descricao'] == 'Cateter venoso central'
+    assert item['data_ref'] == date(2025, 3, 15)
+    assert item['preco1'] == Decimal('123.45')
+    assert item['preco3'] == Decimal('1234.5')
+    assert item['qtd_unidade'] == 10
+    assert item['ean'] == '580076'
+    assert item['tuss_prefix'] == 'NN'
+    assert item['tuss_numero'] == '782760'
+    assert item['codigo'] == '782760'
+    assert item['status_final'] == 'NN'
+    assert item['uf_referencia'] == 'RJ'
+
+
+def test_simpro_multi_uf_import_keeps_single_copy(app_ctx, tmp_path, monkeypatch):
+    map_config = {
+        "decimal_divisor": 100,
+        "columns": [
+            {"name": "codigo_interno", "start": 1, "length": 10},
+            {"name": "descricao_completa", "start": 12, "length": 30},
+            {"name": "preco_pf", "start": 43, "length": 12, "type": "decimal"},
+        ],
+    }
+    simpro_file = tmp_path / 'simpro.txt'
+    simpro_file.write_text(
+        ''.join(f'{idx:010d} {"Item " + str(idx):<30} {idx * 100:012d}\n' for idx in (1, 2, 3)),
+        encoding='utf-8',
+    )
+    session = app_ctx.db.session
+    session.add(app_ctx.SimproFixedStage(arquivo='SIMPRO_ED_SP', linha_num=1, linha='antigo'))
+    session.commit()
+
+    synced = []
+    monkeypatch.setattr(
+        app_ctx, '_sync_simpro_insumo_index',
+        lambda label, **kwargs: synced.append((label, kwargs['uf_default'], list(kwargs['uf_values']))),
+    )
+
+    def run_import(ufs):
+        return app_ctx._import_simpro_multi_uf(
+            file_path=simpro_file,
+            versao='2025-09',
+            fmt='fixed',
+            map_config=map_config,
+            encoding='utf-8',
+            truncate=False,
+            base_label='SIMPRO_ED',
+            target_ufs=ufs,
+            aliquota_default=None,
+        )
+
+    result = run_import(['sp', 'RJ', 'SP'])
+    assert (result['arquivo'], result['ufs'], result['linhas_materializadas']) == ('SIMPRO_ED', ['SP', 'RJ'], 3)
+    norm = app_ctx.SimproItemNormalized
+    labels = dict(session.query(norm.arquivo, app_ctx.db.func.count()).group_by(norm.arquivo).all())
+    assert labels == {'SIMPRO_ED': 3}
+    # A cópia por UF antiga só sai depois da publicação do rótulo compartilhado.
+    assert app_ctx.SimproFixedStage.query.filter_by(arquivo='SIMPRO_ED_SP').count() == 1
+    assert 'SIMPRO_ED_SP' in app_ctx._purge_legacy_simpro_uf_labels('SIMPRO_ED', result['ufs'])
+    assert app_ctx.SimproFixedStage.query.filter_by(arquivo='SIMPRO_ED_SP').count() == 0
+    assert {row.uf_referencia for row in norm.query.all()} == {None}
+    assert synced == [('SIMPRO_ED', None, ['SP', 'RJ'])]
+
+    synced.clear()
+    result = run_import(['RJ'])
+    assert (result['arquivo'], result['ufs']) == ('SIMPRO_ED_RJ', ['RJ'])
+    assert norm.query.filter_by(arquivo='SIMPRO_ED_RJ', uf_referencia='RJ').count() == 3
+    assert synced == [('SIMPRO_ED_RJ', 'RJ', ['RJ'])]
+
+
+def test_simpro_parallel_shards_match_serial(app_ctx):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    map_config = {
+        "decimal_divisor": 100,
+        "columns": [
+            {"name": "codigo_interno", "start": 1, "length": 10},
+            {"name": "descricao_completa", "start": 12, "length": 30},
+            {"name": "preco_pf", "start": 43, "length": 12, "type": "decimal"},
+            {"name": "ean", "start": 56, "length": 20},
+        ],
+    }
+    rows = [
+        (idx, 'SIMPRO_TESTE', idx, f'{idx:010d} {"Item " + str(idx):<30} {idx * 37:012d} {idx:06d}#NN{idx:07d}', None)
+        for idx in range(1, 41)
+    ]
+    plan = app_ctx._compile_simpro_column_plan(map_config)
+    serial = list(app_ctx._normalize_simpro_rows(plan, rows, '2025-09', 'SP'))
+
+    with ProcessPoolExecutor(
+        max_workers=2,
+        mp_context=multiprocessing.get_context('fork'),
+        initializer=app_ctx._init_simpro_normalize_worker,
+        initargs=(map_config,),
+    ) as pool:
+        shards = [rows[:15], rows[15:30], rows[30:]]
+        parallel = [item for result in pool.map(app_ctx._normalize_simpro_shard, shards, ['2025-09'] * 3, ['SP'] * 3) for item in result]
+
+    assert parallel == serial
+    assert serial[0][app_ctx._SIMPRO_NORM_INSERT_COLUMNS.index('tuss_numero')] == '0000001'
+
+
+def test_insumo_fulltext_ranks_matches(app_ctx):
+    session = app_ctx.db.session
+    for item_id, descricao, fabricante in (
+        (1, 'Cateter venoso central', 'ACME'),
+        (2, 'Seringa descartável 5ml', 'Cateter Brasil'),
+        (3, 'Cateter cateter uretral', 'Medicorp'),
+    ):
+        session.add(app_ctx.InsumoIndex(
+            origem='SIMPRO',
+            item_id=item_id,
+            descricao=descricao,
+            fabricante=fabricante,
+            updated_at=datetime.utcnow(),
+        ))
+    session.commit()
+
+    query = app_ctx._apply_insumo_filters(app_ctx.InsumoIndex.query, {'tokens': ['cateter']})
+    ids = [row.item_id for row in query.all()]
+    assert sorted(ids) == [1, 2, 3]
+    assert ids[0] == 3
+
+    query = app_ctx._apply_insumo_filters(app_ctx.InsumoIndex.query, {'tokens': ['cateter', 'uretral']})
+    assert [row.item_id for row in query.all()] == [3]
+
+    session.query(app_ctx.InsumoIndex).filter_by(item_id=3).delete()
+    session.commit()
+    query = app_ctx._apply_insumo_filters(app_ctx.InsumoIndex.query, {'tokens': ['uretral']})
+    assert query.count() == 0
+
+
+def test_serialize_insumo_indexes_batches_price_lookups(app_ctx):
+    from sqlalchemy import event
+
+    session = app_ctx.db.session
+    for idx in range(1, 6):
+        session.add(app_ctx.BrasRaw(id=idx, arquivo='BRAS_T', linha_num=idx, col07=f'{idx}0.50', col08=f'{idx}0.25'))
+        session.add(app_ctx.BrasItemNormalized(id=idx, arquivo='BRAS_T', linha_num=idx, imported_at=datetime.utcnow()))
+        session.add(app_ctx.SimproItemNormalized(
+            id=idx, arquivo='SIMPRO_T', linha_num=idx, codigo=f'C{idx}', descricao=f'Item {idx}',
+            preco1=Decimal('1.00'), preco2=None if idx % 2 else Decimal(f'{idx}.75'),
+        ))
+        for origem in ('BRAS', 'SIMPRO'):
+            session.add(app_ctx.InsumoIndex(
+                origem=origem, item_id=idx, descricao=f'{origem} {idx}', preco=Decimal('9.99'),
+                updated_at=datetime.utcnow(),
+            ))
+    session.commit()
+
+    rows = app_ctx.InsumoIndex.query.order_by(app_ctx.InsumoIndex.origem, app_ctx.InsumoIndex.item_id).all()
+    expected = [app_ctx._serialize_insumo_index(row) for row in rows]
+    session.expire_all()
+    rows = app_ctx.InsumoIndex.query.order_by(app_ctx.InsumoIndex.origem, app_ctx.InsumoIndex.item_id).all()
+
+    statements = []
+    engine = app_ctx.db.engine
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        batched = app_ctx._serialize_insumo_indexes(rows)
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+
+    assert batched == expected
+    assert len(statements) == 3
+    assert batched[0]['origem'] == 'BRAS' and batched[0]['preco_pmc'] != batched[0]['preco']
+    assert {item['preco'] for item in batched if item['origem'] == 'SIMPRO'} == {'1', '2.75', '4.75'}
+
+
+def test_catalogo_search_cursor_matches_offset_pages(app_ctx):
+    session = app_ctx.db.session
+    for item_id, descricao in enumerate(['Luva', 'Agulha', None, 'Luva', 'Cateter', 'Agulha', 'Sonda'], start=1):
+        session.add(app_ctx.InsumoIndex(
+            origem='SIMPRO', item_id=item_id, descricao=descricao, updated_at=datetime.utcnow(),
+        ))
+    session.commit()
+
+    filters = app_ctx._extract_insumo_filters({'origem': 'SIMPRO'})
+    offset_ids = []
+    for page in (1, 2, 3):
+        payload = app_ctx._catalogo_search(filters, page, 3)
+        offset_ids.extend(item['item_id'] for item in payload['items'])
+
+    cursor_ids = []
+    cursor = ''
+    pages = 0
+    while cursor is not None:
+        payload = app_ctx._catalogo_search(filters, 1, 3, cursor=cursor, total_mode='cached')
+        cursor_ids.extend(item['item_id'] for item in payload['items'])
+        assert payload['pagination']['total'] == 7
+        cursor = payload['pagination']['next_cursor']
+        pages += 1
+
+    assert pages == 3
+    assert cursor_ids == offset_ids == [3, 2, 6, 5, 1, 4, 7]
+
+    payload = app_ctx._catalogo_search(filters, 1, 10, cursor='', total_mode='none')
+    assert payload['pagination']['total'] is None
+    assert payload['pagination']['has_more'] is False
+    assert payload['pagination']['reset'] is False
+
+    seek_sql = str(app_ctx._seek_query(app_ctx.InsumoIndex.query, 'SIMPRO_INDEX', [None, 3]))
+    assert 'coalesce' not in seek_sql.lower()
+    stale_cursor = app_ctx._encode_search_cursor('BRAS_INDEX', app_ctx.InsumoIndex(descricao='Luva', item_id=1))
+    payload = app_ctx._catalogo_search(filters, 1, 3, cursor=stale_cursor, total_mode='none')
+    assert payload['pagination']['reset'] is True
+    assert [item['item_id'] for item in payload['items']] == [3, 2, 6]
+
+    # Com termos a busca ignora o cursor e pagina por página (ordem por relevância).
+    termo = app_ctx._extract_insumo_filters({'origem': 'SIMPRO', 'q': 'luva'})
+    payload = app_ctx._catalogo_search(termo, 1, 1, cursor='', total_mode='none')
+    assert payload['pagination']['page'] == 1 and 'next_cursor' not in payload['pagination']
+    assert payload['pagination']['total'] == 2
+
+
+def test_catalogo_search_cache_keyed_by_catalog_version(app_ctx):
+    session = app_ctx.db.session
+    session.add(app_ctx.InsumoIndex(origem='SIMPRO', item_id=1, descricao='Gaze', updated_at=datetime.utcnow()))
+    session.commit()
+
+    filters = app_ctx._extract_insumo_filters({'origem': 'SIMPRO'})
+    first = app_ctx._catalogo_search(filters, 1, 10)
+    session.add(app_ctx.InsumoIndex(origem='SIMPRO', item_id=2, descricao='Luva', updated_at=datetime.utcnow()))
+    session.commit()
+
+    assert app_ctx._catalogo_search(filters, 1, 10) is first
+    stats = app_ctx.search_cache.stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+
+    app_ctx._bump_catalogo_versao('SIMPRO', 'SIMPRO:202502:1')
+    session.commit()
+    refreshed = app_ctx._catalogo_search(filters, 1, 10)
+    assert refreshed['pagination']['total'] == 2
+    assert app_ctx.search_cache.stats()['misses'] == 2
+
+
+def test_insumos_etag_tracks_catalog_version(app_ctx):
+    application = app_ctx.app
+    with application.test_request_context('/insumos/search', query_string={'q': 'luva', 'uf': 'SP'}):
+        etag = app_ctx._insumos_etag()
+        assert app_ctx._insumos_not_modified(etag) is None
+
+    with application.test_request_context(
+        '/insumos/search', query_string={'q': 'luva', 'uf': 'SP'}, headers={'If-None-Match': f'"{etag}"'}
+    ):
+        response = app_ctx._insumos_not_modified(app_ctx._insumos_etag())
+        assert response.status_code == 304
+        assert response.headers['ETag'] == f'"{etag}"'
+        assert response.headers['Cache-Control'] == 'private, no-cache'
+
+    app_ctx._bump_catalogo_versao('BRASINDICE', 'BRASINDICE:202502:1')
+    app_ctx.db.session.commit()
+    with application.test_request_context(
+        '/insumos/search', query_string={'q': 'luva', 'uf': 'SP'}, headers={'If-None-Match': f'"{etag}"'}
+    ):
+        assert app_ctx._insumos_not_modified(app_ctx._insumos_etag()) is None
+
+
+def test_insumo_uf_filter_uses_membership_table(app_ctx):
+    session = app_ctx.db.session
+    for item_id, ufs in ((1, '|SP|RJ|'), (2, 'rj'), (3, None), (4, '|MG|')):
+        session.add(app_ctx.InsumoIndex(
+            origem='BRAS', item_id=item_id, descricao=f'Item {item_id}', uf_referencia=ufs,
+            updated_at=datetime.utcnow(),
+        ))
+    session.commit()
+
+    def _ids(uf):
+        query = app_ctx._apply_insumo_filters(app_ctx.InsumoIndex.query, {'uf_referencia': uf})
+        return sorted(row.item_id for row in query.all())
+
+    assert _ids('RJ') == [1, 2]
+    assert _ids('SP') == [1]
+
+    row = app_ctx.db.session.get(app_ctx.InsumoIndex, ('BRAS', 4))
+    row.uf_referencia = '|SP|'
+    session.commit()
+    assert _ids('SP') == [1, 4]
+    assert _ids('MG') == []
+
+    session.execute(app_ctx.text("UPDATE insumos_index SET uf_referencia = '|BA|' WHERE item_id = 3"))
+    assert app_ctx._rebuild_insumo_index_ufs('BRAS') == 5
+    assert _ids('BA') == [3]
+
+
+def test_insumo_filters_use_normalized_columns(app_ctx):
+    session = app_ctx.db.session
+    rows = (
+        (1, 'CATÉTER venoso 2,5mm', 'Farmacêutica São João', '1.01.02-3'),
+        (2, 'cateter VENOSO central', 'FARMACEUTICA SAO JOAO', '10102'),
+        (3, 'Séringa 10 ml', 'Outro Lab', None),
+    )
+    for item_id, descricao, fabricante, tuss in rows:
+        session.add(app_ctx.InsumoIndex(
+            origem='BRAS', item_id=item_id, descricao=descricao, fabricante=fabricante, tuss=tuss,
+            updated_at=datetime.utcnow(),
+        ))
+    session.commit()
+
+    first = session.get(app_ctx.InsumoIndex, ('BRAS', 1))
+    assert first.descricao_norm == 'CATETER VENOSO 2 5MM'
+    assert first.fabricante_norm == 'FARMACEUTICA SAO JOAO'
+    assert first.tuss_norm == '101023'
+
+    def _ids(filters):
+        query = app_ctx._apply_insumo_filters(app_ctx.InsumoIndex.query, filters)
+        return sorted(row.item_id for row in query.all())
+
+    assert _ids({'fabricante': 'farmacêutica são'}) == [1, 2]
+    # Token curto (abaixo do trigram) cai no LIKE sobre as colunas normalizadas.
+    assert _ids({'tokens': ['sé']}) == [3]
+
+    session.execute(app_ctx.text("UPDATE insumos_index SET descricao_norm = NULL, tuss_norm = NULL"))
+    session.commit()
+    assert app_ctx._backfill_search_norm(app_ctx.InsumoIndex, batch_size=2) == 3
+    assert session.get(app_ctx.InsumoIndex, ('BRAS', 2)).tuss_norm == '10102'
+    assert _ids({'tokens': ['5m']}) == [1]
+
+
+def test_insumo_similar_table_matches_live_suggestions(app_ctx, monkeypatch):
+    monkeypatch.setenv('INSUMOS_SIMILAR_REBUILD', 'off')
+    session = app_ctx.db.session
+    items = (
+        (1, 'SERINGA DESCARTAVEL 10ML', '12345001', '100'),
+        (2, 'SERINGA DESCARTAVEL 20ML', '12345002', '200'),
+        (3, 'AGULHA HIPODERMICA', '12345003', '100'),
+        (4, 'LUVA CIRURGICA', '99999000', '400'),
+    )
+    for item_id, descricao, tuss, anvisa in items:
+        session.add(app_ctx.SimproItemNormalized(
+            id=item_id, arquivo='SIM', linha_num=item_id, codigo=tuss, descricao=descricao, anvisa=anvisa,
+        ))
+        session.add(app_ctx.InsumoIndex(
+            origem='SIMPRO', item_id=item_id, descricao=descricao, tuss=tuss, anvisa=anvisa,
+            updated_at=datetime(2024, 1, 1),
+        ))
+    session.commit()
+
+    assert app_ctx._rebuild_insumo_similar('SIMPRO') > 0
+    item = session.get(app_ctx.SimproItemNormalized, 1)
+    live = app_ctx._suggest_similar_items('SIMPRO', item)
+    stored = app_ctx._load_similar_items('SIMPRO', 1)
+    assert [(row['item_id'], row['similaridade_score']) for row in stored] == \
+        [(row['item_id'], row['similaridade_score']) for row in live]
+    assert stored[0]['item_id'] == 3 and 'Registro ANVISA compartilhado' in stored[0]['justificativas']
+
+    def _versao_indice():
+        row = session.get(app_ctx.CatalogoVersao, app_ctx.CATALOGO_VERSAO_INDEX, populate_existing=True)
+        return row.versao_publicada if row else 0
+
+    # Recalcular sem mudança nas listas de vizinhos não invalida o cache do índice.
+    versao = _versao_indice()
+    app_ctx._rebuild_insumo_similar('SIMPRO', full=True)
+    assert _versao_indice() == versao
+
+    # Incremental: só o item alterado e quem compartilha ANVISA/código com ele.
+    assert app_ctx._changed_similar_items('SIMPRO') == []
+    row = session.get(app_ctx.InsumoIndex, ('SIMPRO', 4))
+    row.anvisa = '200'
+    row.updated_at = datetime.utcnow() + timedelta(days=1)
+    session.commit()
+    assert app_ctx._changed_similar_items('SIMPRO') == [2, 4]
+    app_ctx._rebuild_insumo_similar('SIMPRO')
+    assert app_ctx._load_similar_items('SIMPRO', 2)[0]['item_id'] == 4
+
+    # EAN compartilhado (lido da tabela normalizada) também entra no recálculo.
+    for item_id in (1, 4):
+        session.get(app_ctx.SimproItemNormalized, item_id).ean = '7891000000001'
+    session.commit()
+    assert app_ctx._changed_similar_items('SIMPRO') == [1, 2, 4]
+
+    # Item removido do índice: some de insumo_similar e quem o tinha como vizinho é recalculado.
+    versao = _versao_indice()
+    session.delete(session.get(app_ctx.InsumoIndex, ('SIMPRO', 3)))
+    session.commit()
+    app_ctx._rebuild_insumo_similar('SIMPRO')
+    similar = app_ctx.InsumoSimilar
+    assert similar.query.filter((similar.item_id == 3) | (similar.similar_id == 3)).count() == 0
+    assert [row['item_id'] for row in app_ctx._load_similar_items('SIMPRO', 1)][0] == 4
+    assert _versao_indice() == versao + 1
+
+
+def test_schedule_similar_rebuild_never_overlaps(app_ctx, monkeypatch):
+    monkeypatch.setenv('INSUMOS_SIMILAR_REBUILD', 'background')
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def _fake_rebuild(origem, *, full=False):
+        calls.append(origem)
+        started.set()
+        release.wait(5)
+        return 0
+
+    monkeypatch.setattr(app_ctx, '_rebuild_insumo_similar', _fake_rebuild)
+    app_ctx._schedule_similar_rebuild('SIMPRO')
+    assert started.wait(5)
+    # Pedidos durante a execução viram uma única nova rodada, sem sobrepor a atual.
+    app_ctx._schedule_similar_rebuild('SIMPRO')
+    app_ctx._schedule_similar_rebuild('SIMPRO')
+    assert calls == ['SIMPRO']
+    release.set()
+    for _ in range(100):
+        if 'SIMPRO' not in app_ctx._similar_rebuild_pending:
+            break
+        time.sleep(0.05)
+    assert calls == ['SIMPRO', 'SIMPRO']
+    assert 'SIMPRO' not in app_ctx._similar_rebuild_pending
+
+
+def test_insumo_lsh_index_finds_cross_source_equivalents(app_ctx, tmp_path, monkeypatch):
+    rows = [
+        ('BRAS', 1, 'DIPIRONA SODICA 500MG ML SOL INJ CX 100 AMP X 2ML'),
+        ('SIMPRO', 7, 'DIPIRONA SODICA 500MG ML SOL INJ CX 100 AMP 2ML'),
+        ('SIMPRO', 8, 'LUVA CIRURGICA ESTERIL TAMANHO 7 5'),
+        ('BRAS', 2, 'DIPIRONA SODICA 500MG ML SOL INJ CX 100 AMP X 2 ML'),
+    ]
+    index = app_ctx.InsumoLSHIndex.build(rows, versao=3)
+
+    outra = index.candidates('BRAS', 1)
+    assert [(origem, item_id) for origem, item_id, _ in outra] == [('SIMPRO', 7)]
+    assert outra[0][2] >= 0.5
+    assert [item_id for _, item_id, _ in index.candidates('BRAS', 1, escopo='mesma')] == [2]
+    assert index.candidates('SIMPRO', 8, escopo='todas') == []
+
+    path = str(tmp_path / 'lsh.bin')
+    index.save(path)
+    with open(path, 'rb') as fh:
+        assert json.loads(fh.readline())['format'] == app_ctx.InsumoLSHIndex.FORMAT
+    loaded = app_ctx.InsumoLSHIndex.load(path)
+    assert loaded.versao == 3 and len(loaded) == 4
+    assert loaded.candidates('BRAS', 1, escopo='todas') == index.candidates('BRAS', 1, escopo='todas')
+
+    # Pedidos em sequência (jobs de importação) viram uma única reconstrução em segundo plano.
+    monkeypatch.setenv('INSUMOS_LSH_REBUILD', 'background')
+    monkeypatch.setattr(app_ctx, 'INSUMOS_LSH_DEBOUNCE', 0.2)
+    rebuilds = []
+    monkeypatch.setattr(app_ctx, '_rebuild_insumo_lsh_index', lambda *args, **kwargs: rebuilds.append(1))
+    for _ in range(3):
+        app_ctx._schedule_insumo_lsh_rebuild()
+    assert rebuilds == []
+    for _ in range(100):
+        if not app_ctx._insumo_lsh_rebuild['scheduled']:
+            break
+        time.sleep(0.05)
+    assert rebuilds == [1]
+
+    # A leitura nunca constrói o índice: sem arquivo válido, o endpoint responde 503.
+    monkeypatch.setattr(app_ctx, 'INSUMOS_LSH_PATH', str(tmp_path / 'ausente.bin'))
+    assert app_ctx._get_insumo_lsh_index() is None
+    (tmp_path / 'ausente.bin').write_bytes(b'lixo')
+    assert app_ctx._get_insumo_lsh_index() is None
@@ -1,5 +1,8 @@
+from datetime import date
 from decimal import Decimal
 
+import pytest
+
 
 def test_simulacao_cbhpm_teto_alert(app_ctx):
     session = app_ctx.db.session
@@ -54,3 +57,248 @@ def test_simulacao_cbhpm_teto_alert(app_ctx):
     item_payload = payload['itens'][0]
     assert item_payload['teto_valor_total'] == '120.00'
     assert item_payload['teto_excedido'] is True
+
+
+def test_procedimento_suggest_index(app_ctx):
+    session = app_ctx.db.session
+    operadora = app_ctx.Operadora(nome='Teste', status='Ativa')
+    session.add(operadora)
+    session.flush()
+    tabela = app_ctx.Tabela(nome='CBHPM 2024', tipo_tabela='cbhpm', id_operadora=operadora.id, uf='SP')
+    session.add(tabela)
+    session.flush()
+    for codigo, descricao in (
+        ('10101020', 'Consulta domiciliar'),
+        ('10101012', 'Consulta em consultório'),
+        ('20101015', 'Avaliação clínica'),
+        ('30201010', 'Sutura 2º plano'),
+    ):
+        session.add(app_ctx.CBHPMItem(codigo=codigo, procedimento=descricao, id_tabela=tabela.id))
+    session.commit()
+
+    index = app_ctx._get_suggest_index('cbhpm', tabela.id)
+    assert [item['codigo'] for item in index.search('consul')] == ['10101012', '10101020']
+    assert [item['codigo'] for item in index.search('2010')] == ['20101015']
+    assert [item['codigo'] for item in index.search('AVALIACAO')] == ['20101015']
+    assert [item['codigo'] for item in index.search('ta', limit=2)] == ['10101012', '10101020']
+    assert [item['codigo'] for item in index.search('ca')] == ['20101015']
+    assert index.search('consul', uf='RJ') == []
+    # Índice em memória e coluna *_norm usam a mesma dobra (º → O).
+    assert [item['codigo'] for item in index.search('2º plano')] == ['30201010']
+    assert [item['codigo'] for item in index.search('sutura 2o')] == ['30201010']
+    assert [item['codigo'] for item in app_ctx._suggest_cbhpm_all('2º plano')] == ['30201010']
+    assert app_ctx._get_suggest_index('cbhpm', tabela.id) is index
+
+    session.add(app_ctx.CBHPMItem(codigo='30101010', procedimento='Consulta pré-anestésica', id_tabela=tabela.id))
+    session.commit()
+    refreshed = app_ctx._get_suggest_index('cbhpm', tabela.id)
+    assert refreshed is not index
+    assert [item['codigo'] for item in refreshed.search('consul')][-1] == '30101010'
+    geral = app_ctx._suggest_cbhpm_all('cons')
+    assert [item['codigo'] for item in geral] == ['10101012', '10101020', '30101010']
+    assert geral[0]['caminho'] == 'CBHPM 2024'
+    assert [item['codigo'] for item in app_ctx._suggest_cbhpm_all('2010')] == ['20101015']
+    assert app_ctx._suggest_cbhpm_all('cons', uf='RJ') == []
+
+
+def test_simulacao_cbhpm_resolve_codigos_em_lote(app_ctx):
+    session = app_ctx.db.session
+    operadora = app_ctx.Operadora(nome='Teste', status='Ativa')
+    session.add(operadora)
+    session.flush()
+    tabela = app_ctx.Tabela(nome='CBHPM 2024', tipo_tabela='cbhpm', id_operadora=operadora.id)
+    antiga = app_ctx.Tabela(nome='Porte 2020', tipo_tabela='porte', id_operadora=operadora.id, data_vigencia=date(2020, 1, 1))
+    recente = app_ctx.Tabela(nome='Porte 2024', tipo_tabela='porte', id_operadora=operadora.id, data_vigencia=date(2024, 1, 1))
+    anest = app_ctx.Tabela(nome='AN 2024', tipo_tabela='porte_anestesico', id_operadora=operadora.id)
+    session.add_all([tabela, antiga, recente, anest])
+    session.flush()
+    session.add_all([
+        app_ctx.CBHPMItem(codigo='1.01.01.01-2', procedimento='Consulta', porte='2A', porte_anestesico='1', id_tabela=tabela.id),
+        app_ctx.CBHPMItem(codigo='10101020', procedimento='Consulta domiciliar', porte='3B', id_tabela=tabela.id),
+        app_ctx.CBHPMItem(codigo='20101015', procedimento='Avaliação', porte='9Z', id_tabela=tabela.id),
+        app_ctx.PorteValorItem(porte='2A', valor=Decimal('50.00'), id_tabela=recente.id),
+        app_ctx.PorteValorItem(porte='3B', valor=Decimal('70.00'), id_tabela=antiga.id),
+        app_ctx.PorteValorItem(porte='3B', valor=Decimal('80.00'), id_tabela=recente.id),
+        app_ctx.PorteValorItem(porte='9Z', valor=Decimal('99.00'), id_tabela=antiga.id),
+        app_ctx.PorteAnestesicoValorItem(porte_an='1', valor=Decimal('15.00'), id_tabela=anest.id),
+    ])
+    session.commit()
+
+    codigos = ['10101012', '1010102', '2010', '99999', '1.01', '10.1']
+    resolvidos = app_ctx._resolve_cbhpm_itens(codigos, versao='CBHPM 2024')
+    for codigo in codigos:
+        esperado = (
+            session.query(app_ctx.CBHPMItem)
+            .filter(app_ctx._code_prefix_filter(app_ctx.CBHPMItem.codigo, app_ctx.CBHPMItem.codigo_norm, codigo))
+            .order_by(app_ctx.CBHPMItem.id)
+            .first()
+        )
+        obtido = resolvidos.get(codigo)
+        assert (obtido[0].id if obtido else None) == (esperado.id if esperado else None)
+
+    assert resolvidos['1.01'][0].codigo == '1.01.01.01-2'
+    # Com separador o prefixo é no código bruto: "10.1" não casa "1.01.01.01-2" nem "10101020".
+    assert '10.1' not in resolvidos
+
+    for codigo in ('2A', '3B', '9Z', 'X'):
+        lote = app_ctx._lookup_porte_valores_lote(operadora.id, None, 'Porte 2020', [codigo])
+        assert lote.get(codigo) == app_ctx._lookup_porte_valor(operadora.id, None, 'Porte 2020', codigo)
+
+    payload, status = app_ctx._compute_simulacao_cbhpm({
+        'codigos': ['10101012', '1010102'],
+        'versao': 'CBHPM 2024',
+        'porte_tab': 'Porte 2024',
+    })
+    assert status == 200
+    totais = {item['codigo']: item for item in payload['itens']}
+    reducao = [regra for regra in totais['10101012']['applied_rules'] if regra['rule'] == 'reducoes_simultaneos']
+    assert Decimal(reducao[0]['reduzido_de']) == Decimal('50.00')
+    assert Decimal(totais['1010102']['total_porte']) == Decimal('80.00')
+    assert Decimal(totais['10101012']['total_porte_an']) == Decimal('15.00')
+    assert totais['1010102']['descricao'] == 'Consulta domiciliar'
+
+
+def test_procedimentos_versao_ignores_untouched_rows(app_ctx):
+    session = app_ctx.db.session
+    operadora = app_ctx.Operadora(nome='Teste', status='Ativa')
+    session.add(operadora)
+    session.flush()
+    tabela = app_ctx.Tabela(nome='CBHPM 2024', tipo_tabela='cbhpm', id_operadora=operadora.id, uco_valor=Decimal('10.00'))
+    session.add(tabela)
+    session.flush()
+    session.add(app_ctx.CBHPMItem(codigo='10101012', procedimento='Consulta', uco=Decimal('1'), id_tabela=tabela.id))
+    session.commit()
+
+    def _versao():
+        row = session.get(app_ctx.CatalogoVersao, app_ctx.CATALOGO_VERSAO_PROCEDIMENTOS, populate_existing=True)
+        return row.versao_publicada if row else 0
+
+    inicial = _versao()
+    tabela.nome = tabela.nome
+    session.commit()
+    assert _versao() == inicial
+
+    payload, status = app_ctx._compute_simulacao_cbhpm({
+        'codigo': '10101012', 'versao': 'CBHPM 2024', 'uco_valor': '25.00',
+    })
+    assert status == 200
+    assert payload['uco_valor'] == '25.00'
+    assert tabela not in session.dirty
+    session.commit()
+    assert _versao() == inicial
+    assert session.get(app_ctx.Tabela, tabela.id, populate_existing=True).uco_valor == Decimal('10.00')
+
+    tabela.uco_valor = Decimal('12.00')
+    session.commit()
+    assert _versao() == inicial + 1
+
+    # Várias escritas na mesma transação contam uma vez, no commit.
+    tabela.nome = 'CBHPM 2025'
+    session.flush()
+    session.add(app_ctx.CBHPMItem(codigo='10101020', procedimento='Visita', id_tabela=tabela.id))
+    session.flush()
+    session.commit()
+    assert _versao() == inicial + 2
+
+
+def test_porte_resolucao_cache(app_ctx):
+    session = app_ctx.db.session
+    operadora = app_ctx.Operadora(nome='Teste', status='Ativa')
+    session.add(operadora)
+    session.flush()
+    antiga = app_ctx.Tabela(nome='Porte 2020', tipo_tabela='porte', id_operadora=operadora.id, data_vigencia=date(2020, 1, 1))
+    session.add(antiga)
+    session.flush()
+    session.add_all([
+        app_ctx.PorteValorItem(porte='1A', valor=Decimal('10.00'), id_tabela=antiga.id),
+        app_ctx.PorteValorItem(porte='2A', valor=Decimal('20.00'), id_tabela=antiga.id),
+    ])
+    session.commit()
+    app_ctx._invalidate_porte_cache()
+
+    assert app_ctx._resolve_porte(operadora.id, None, 'Porte 2020', '2A') == (Decimal('20.00'), 'Porte 2020')
+    assert app_ctx._resolve_porte(operadora.id, None, 'Porte 2020', 'X') == (None, None)
+    candidatas = app_ctx._porte_tabelas_candidatas(operadora.id, None, 'Porte 2020', 'porte')
+    assert app_ctx._porte_tabelas_candidatas(operadora.id, None, 'Porte 2020', 'porte') is candidatas
+
+    recente = app_ctx.Tabela(nome='Porte 2024', tipo_tabela='porte', id_operadora=operadora.id, data_vigencia=date(2024, 1, 1))
+    session.add(recente)
+    session.flush()
+    session.add(app_ctx.PorteValorItem(porte='3A', valor=Decimal('30.00'), id_tabela=recente.id))
+    session.commit()
+
+    assert app_ctx._porte_tabelas_candidatas(operadora.id, None, 'Porte 2020', 'porte') is not candidatas
+    assert app_ctx._lookup_porte_valor(operadora.id, None, 'Porte 2020', '3A') == Decimal('30.00')
+    assert app_ctx._resolve_porte_tabela_nome(operadora.id, None, 'Porte 2020', '3A') == 'Porte 2024'
+    assert app_ctx._resolve_porte_tabela_nome(operadora.id, None, 'Porte 2020', '1A') == 'Porte 2020'
+
+
+def test_cbhpm_ruleset_cache(app_ctx):
+    session = app_ctx.db.session
+    ruleset = app_ctx.CBHPMRuleSet(
+        nome='Regras 2024',
+        ativo=True,
+        regras={
+            'porte': {'reducoes_simultaneos': [100, 50, 'x'], 'multiplicador': 1.2},
+            'auxiliares': {'percentuais': [30, 0.2], 'max_por_porte': {'1': 0, 'default': '2'}},
+        },
+    )
+    session.add(ruleset)
+    session.commit()
+    app_ctx._invalidate_cbhpm_ruleset_cache()
+
+    regras = app_ctx._get_active_cbhpm_ruleset()
+    assert app_ctx._get_active_cbhpm_ruleset() is regras
+    assert regras.reducoes_simultaneos == (Decimal('1'), Decimal('0.5'), None)
+    assert regras.aux_percentuais == (Decimal('0.3'), Decimal('0.2'))
+    assert regras.aux_max('1') == 0 and regras.aux_max('9') == 2
+    assert regras.multiplicadores == (('total_porte', 'porte', Decimal('1.2')),)
+    assert regras['porte']['reducoes_simultaneos'] == (100, 50, 'x')
+    with pytest.raises(TypeError):
+        regras['porte']['multiplicador'] = 2
+
+    item = app_ctx.CBHPMItem(codigo='1', procedimento='X', porte='3')
+    breakdown = {'total_porte': Decimal('100')}
+    assert app_ctx._apply_ruleset_to_breakdown(item, None, breakdown, regras) == \
+        app_ctx._apply_ruleset_to_breakdown(item, None, breakdown, dict(ruleset.regras))
+
+    ruleset.regras = {'porte': {'multiplicador': 2}}
+    session.commit()
+    atualizadas = app_ctx._get_active_cbhpm_ruleset()
+    assert atualizadas is not regras
+    assert atualizadas.multiplicadores == (('total_porte', 'porte', Decimal('2')),)
+
+
+def test_cbhpm_ruleset_metadata_cached_by_revisao(app_ctx):
+    session = app_ctx.db.session
+    ruleset = app_ctx.CBHPMRuleSet(
+        nome='Regras A', versao='2024', ativo=True, regras={'porte': {'multiplicador': 1.5}},
+    )
+    session.add(ruleset)
+    session.commit()
+    app_ctx._invalidate_cbhpm_ruleset_cache()
+
+    regras, info = app_ctx._get_active_cbhpm_ruleset(return_model=True)
+    assert info == app_ctx.CBHPMRuleSetInfo(id=ruleset.id, nome='Regras A', versao='2024', descricao=None)
+    assert ruleset.revisao == 1
+    with app_ctx.app.test_request_context('/simulacao'):
+        assert app_ctx._get_active_cbhpm_ruleset(return_model=True) == (regras, info)
+        assert app_ctx.g.cbhpm_ruleset == (regras, info)
+        assert app_ctx._get_active_cbhpm_ruleset() is regras
+
+    # Mesmo atualizado_em (MySQL guarda só os segundos): a revisão ainda invalida o cache.
+    carimbo = ruleset.atualizado_em
+    ruleset.nome = 'Regras B'
+    ruleset.regras = {'porte': {'multiplicador': 2}}
+    session.commit()
+    session.execute(
+        app_ctx.CBHPMRuleSet.__table__.update()
+        .where(app_ctx.CBHPMRuleSet.id == ruleset.id)
+        .values(atualizado_em=carimbo)
+    )
+    session.commit()
+    assert ruleset.revisao == 2
+
+    atualizadas, info_b = app_ctx._get_active_cbhpm_ruleset(return_model=True)
+    assert info_b.nome == 'Regras B'
+    assert atualizadas.multiplicadores == (('total_porte', 'porte', Decimal('2')),)